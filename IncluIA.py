@@ -1,12 +1,18 @@
 import streamlit as st
-import os
-import io
-import tempfile
-import textstat
-from textstat import flesch_reading_ease, flesch_kincaid_grade, smog_index
-import google.generativeai as genai
+import hashlib
+import time
 import auth_utils
-import subprocess
+import aquecimento
+import context_cache
+import conversion_utils
+import libreoffice_pool
+import page_cache
+import pdf_nativo
+import llm_cache
+import llm_utils
+import nlp_utils
+from nlp_utils import metricas_NLP
+from prompts import system_instruction_text, nee_details, montar_prompt_usuario
 
 # --- Configurações Iniciais da Página ---
 st.set_page_config(
@@ -15,9 +21,6 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Linguagem das métricas de NLP
-#textstat.set_lang("pt")
-
 # --- CSS CUSTOMIZADO PARA MODO CLARO E ESCURO ---
 st.markdown("""
     <style>
@@ -35,6 +38,9 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+# --- AQUECIMENTO DO SERVIDOR (uma vez por processo, em segundo plano) ---
+aquecimento.iniciar()
+
 # --- BLOCO DE AUTENTICAÇÃO ---
 auth_successful = auth_utils.authenticate_user()
 if not auth_successful:
@@ -47,11 +53,18 @@ if "output_adaptado" not in st.session_state:
     st.session_state.output_adaptado = ""
 if "output_justificativas" not in st.session_state:
     st.session_state.output_justificativas = ""
+if "resultados_multi_nee" not in st.session_state:
+    st.session_state.resultados_multi_nee = {}
 
 # --- Funções de Conversão dos Documentos ---
 
-def convert_pdf_bytes_to_image_bytes(pdf_bytes, dpi=300):
-    """Converte bytes de um PDF para uma lista de bytes de imagens (uma por página) usando a biblioteca Fitz."""
+def convert_pdf_bytes_to_pages(pdf_bytes, dpi=300, usar_camada_texto=True, adaptativo=True, filtrar=True, paginas_selecionadas=None):
+    """
+    Converte bytes de um PDF em páginas de texto (quando há camada de texto utilizável) ou de imagem.
+    Com `adaptativo`, as imagens usam resolução (até `dpi`), cor e formato ajustados ao orçamento da requisição.
+    Com `filtrar`, as páginas em branco e as repetidas são descartadas.
+    Com `paginas_selecionadas` (números a partir de 1), só essas páginas são convertidas.
+    """
     try:
         import fitz
         from PIL import Image
@@ -59,87 +72,221 @@ def convert_pdf_bytes_to_image_bytes(pdf_bytes, dpi=300):
         st.error("Bibliotecas 'Fitz' ou 'PIL' não encontradas. Não foi possível ler o documento.")
         return []
 
-    image_bytes_list = []
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            zoom = dpi / 72.0
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-
-            img_pil = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            
-            byte_arr = io.BytesIO()
-            img_pil.save(byte_arr, format='JPEG', quality=95)
-            image_bytes_list.append(byte_arr.getvalue())
-        
-        doc.close()
-        return image_bytes_list
-    
+        return conversion_utils.converter_pdf_em_paginas(
+            pdf_bytes, dpi=dpi, usar_camada_texto=usar_camada_texto, adaptativo=adaptativo, filtrar=filtrar,
+            paginas_selecionadas=paginas_selecionadas
+        )
+    except conversion_utils.MemoriaExcedida as e:
+        st.error(f"{e} Escolha um intervalo menor em \"Páginas enviadas à IA\".")
+        return []
     except Exception as e:
         st.error(f"Erro na conversão do documento. Não foi possível ler o documento: {e}")
         return []
 
-def convert_docx_bytes_to_image_bytes(docx_bytes, dpi=300):
-    """Converte bytes de um DOCX para uma lista de bytes de imagens, usando LibreOffice e Fitz."""
+def pdf_do_docx_memorizado(docx_bytes):
+    """PDF já convertido nesta sessão para o DOCX (o último arquivo enviado), ou None."""
+    memorizado = st.session_state.get("pdf_do_docx")
+    if memorizado and memorizado[0] == hashlib.sha256(docx_bytes).hexdigest():
+        return memorizado[1]
+    return None
+
+def descartar_pdf_do_docx(arquivo):
+    """Libera o PDF memorizado quando o arquivo enviado agora não é o DOCX de que ele veio (ou não há arquivo)."""
+    memorizado = st.session_state.get("pdf_do_docx")
+    if memorizado and (arquivo is None or memorizado[0] != hashlib.sha256(arquivo.getvalue()).hexdigest()):
+        del st.session_state["pdf_do_docx"]
+
+def convert_docx_bytes_to_pdf_bytes(docx_bytes):
+    """Converte bytes de um DOCX para bytes de PDF usando o pool de conversores LibreOffice. Retorna None em caso de erro."""
     # A biblioteca docx2pdf foi removida pois não funciona em Linux sem MS Word.
-    
-    tmp_docx_path = None
-    tmp_pdf_path = None
-    
+    pdf_bytes = pdf_do_docx_memorizado(docx_bytes)
+    if pdf_bytes:
+        return pdf_bytes
     try:
-        # 1. Salva o DOCX enviado em um arquivo temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp_docx:
-            tmp_docx.write(docx_bytes)
-            tmp_docx_path = tmp_docx.name
-
-        # 2. Define o diretório de saída e o nome do arquivo PDF esperado
-        output_dir = os.path.dirname(tmp_docx_path)
-        tmp_pdf_path = os.path.splitext(tmp_docx_path)[0] + ".pdf"
-        
-        # 3. Executa o comando do LibreOffice para converter o DOCX em PDF
-        command = f"libreoffice --headless --convert-to pdf --outdir {output_dir} {tmp_docx_path}"
-        
-        process = subprocess.run(
-            command, 
-            shell=True, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE,
-            timeout=60 # Adiciona um timeout de 60 segundos para evitar que o processo trave
-        )
-
-        # 4. Verifica se a conversão foi bem-sucedida e se o PDF foi criado
-        if process.returncode != 0:
-            # Se o comando falhou, mostra o erro do LibreOffice
-            st.error(f"Erro na conversão com LibreOffice. Detalhes:")
-            st.code(process.stderr.decode('utf-8', 'ignore'))
-            return []
-
-        if not os.path.exists(tmp_pdf_path):
-            st.error("Erro na conversão: o arquivo PDF não foi encontrado após a execução do LibreOffice.")
-            return []
-
-        # 5. Lê os bytes do PDF recém-criado
-        with open(tmp_pdf_path, "rb") as f_pdf:
-            pdf_bytes_from_docx = f_pdf.read()
-        
-        # 6. Chama a sua outra função para converter os bytes do PDF em imagens
-        image_bytes_list = convert_pdf_bytes_to_image_bytes(pdf_bytes_from_docx, dpi=dpi)
-        return image_bytes_list
-        
-    except subprocess.TimeoutExpired:
+        pdf_bytes = libreoffice_pool.converter_docx_em_pdf(docx_bytes)
+        # A escolha de páginas e a adaptação usam o mesmo PDF: o LibreOffice roda uma vez por arquivo
+        st.session_state.pdf_do_docx = (hashlib.sha256(docx_bytes).hexdigest(), pdf_bytes)
+        return pdf_bytes
+    except libreoffice_pool.TempoEsgotadoConversao:
         st.error("Erro: A conversão do documento demorou muito e foi interrompida.")
-        return []
+    except libreoffice_pool.ErroConversao as e:
+        st.error(f"Erro na conversão com LibreOffice: {e}")
+        if e.detalhes:
+            st.code(e.detalhes)
     except Exception as e:
         st.error(f"Erro no processo de conversão do documento: {e}")
+    return None
+
+def convert_docx_bytes_to_pages(docx_bytes, dpi=300, usar_camada_texto=True, adaptativo=True, filtrar=True, paginas_selecionadas=None):
+    """Converte bytes de um DOCX em páginas de texto ou de imagem, passando pelo PDF gerado no LibreOffice."""
+    pdf_bytes_from_docx = convert_docx_bytes_to_pdf_bytes(docx_bytes)
+    if not pdf_bytes_from_docx:
         return []
-    finally:
-        # 7. Limpa os arquivos temporários criados (DOCX e PDF)
-        if tmp_docx_path and os.path.exists(tmp_docx_path):
-            os.remove(tmp_docx_path)
-        if tmp_pdf_path and os.path.exists(tmp_pdf_path):
-            os.remove(tmp_pdf_path)
+    return convert_pdf_bytes_to_pages(pdf_bytes_from_docx, dpi=dpi, usar_camada_texto=usar_camada_texto, adaptativo=adaptativo, filtrar=filtrar,
+                                      paginas_selecionadas=paginas_selecionadas)
+
+def rasterizar_pdf(pdf_bytes, usar_camada_texto=True, filtrar=True, paginas_selecionadas=None):
+    """Partes das páginas convertidas de um PDF, usadas quando a IA recusa o PDF original. Não usa o Streamlit."""
+    parametros_conversao = {"tipo": "application/pdf", "dpi": 300, "usar_camada_texto": usar_camada_texto, "adaptativo": True, "hibrido": True, "filtrar": filtrar,
+                            "paginas": paginas_selecionadas}
+    paginas = page_cache.obter_cache().obter_ou_converter(
+        pdf_bytes, parametros_conversao,
+        lambda: conversion_utils.converter_pdf_em_paginas(pdf_bytes, usar_camada_texto=usar_camada_texto, filtrar=filtrar,
+                                                          paginas_selecionadas=paginas_selecionadas)
+    )
+    if not paginas:
+        raise RuntimeError("Não foi possível converter as páginas do documento.")
+    return conversion_utils.paginas_para_partes(paginas)
+
+def pdf_para_escolha_paginas(arquivo):
+    """
+    PDF do arquivo enviado para a escolha de páginas. O DOCX só é convertido (uma vez) se tiver mais de
+    uma página e o professor pedir para escolher as páginas; senão retorna None.
+    """
+    dados = arquivo.getvalue()
+    if arquivo.type == "application/pdf":
+        return dados
+    total_paginas = conversion_utils.contar_paginas_docx(dados)
+    if total_paginas is not None and total_paginas < 2:
+        return None
+    rotulo = "Escolher as páginas do documento Word enviadas à IA"
+    if total_paginas:
+        rotulo += f" ({total_paginas} páginas)"
+    if not st.toggle(rotulo, key=f"escolher_paginas_docx_{hashlib.sha256(dados).hexdigest()[:16]}"):
+        return None
+    pdf_bytes = pdf_do_docx_memorizado(dados)
+    if pdf_bytes is None:
+        try:
+            with st.spinner("Preparando a escolha de páginas..."):
+                pdf_bytes = libreoffice_pool.converter_docx_em_pdf(dados)
+        except Exception:
+            st.warning("Não foi possível preparar a escolha de páginas do documento Word; ele será enviado inteiro.")
+            return None
+        st.session_state.pdf_do_docx = (hashlib.sha256(dados).hexdigest(), pdf_bytes)
+    return pdf_bytes
+
+def mostrar_miniaturas(pdf_bytes, numeros, colunas=6):
+    """Exibe as miniaturas das páginas `numeros`, geradas em baixa resolução e guardadas no cache de conversões."""
+    parametros = {"tipo": "miniaturas", "dpi": conversion_utils.DPI_MINIATURA, "paginas": list(numeros)}
+    miniaturas = page_cache.obter_cache().obter_ou_converter(
+        pdf_bytes, parametros, lambda: conversion_utils.gerar_miniaturas(pdf_bytes, numeros)
+    )
+    for inicio in range(0, len(miniaturas), colunas):
+        for coluna, miniatura in zip(st.columns(colunas), miniaturas[inicio:inicio + colunas]):
+            coluna.image(miniatura["imagem"], caption=f"Página {miniatura['pagina']}", use_column_width=True)
+
+def escolher_paginas(arquivo):
+    """
+    Intervalo de páginas do arquivo a enviar à IA, com miniaturas sob demanda (em lotes).
+    Retorna a lista de páginas escolhidas, ou None para o arquivo inteiro.
+    """
+    try:
+        pdf_bytes = pdf_para_escolha_paginas(arquivo)
+        total_paginas = conversion_utils.contar_paginas_pdf(pdf_bytes) if pdf_bytes else 0
+    except Exception:
+        return None
+    if total_paginas < 2:
+        return None
+
+    # As chaves dos widgets dependem do arquivo: um novo envio começa com o documento inteiro
+    id_arquivo = hashlib.sha256(pdf_bytes).hexdigest()[:16]
+    with st.expander(f"Páginas enviadas à IA ({total_paginas} no arquivo)"):
+        inicio, fim = st.slider(
+            "Intervalo de páginas", 1, total_paginas, (1, total_paginas), key=f"intervalo_paginas_{id_arquivo}",
+            help="Só as páginas escolhidas são convertidas e enviadas. Útil para adaptar algumas questões de uma avaliação longa."
+        )
+        if st.toggle("Mostrar miniaturas das páginas", key=f"miniaturas_{id_arquivo}"):
+            numeros = list(range(inicio, fim + 1))
+            lotes = [numeros[i:i + conversion_utils.MINIATURAS_POR_LOTE] for i in range(0, len(numeros), conversion_utils.MINIATURAS_POR_LOTE)]
+            lote = 0
+            if len(lotes) > 1:
+                lote = st.selectbox(
+                    "Miniaturas", range(len(lotes)), format_func=lambda i: f"Páginas {lotes[i][0]} a {lotes[i][-1]}",
+                    key=f"lote_miniaturas_{id_arquivo}"
+                )
+            mostrar_miniaturas(pdf_bytes, lotes[lote])
+    if (inicio, fim) == (1, total_paginas):
+        return None
+    return list(range(inicio, fim + 1))
+
+def mostrar_relatorio_paginas(paginas):
+    """Mostra como cada página do arquivo foi enviada para a IA (texto extraído, texto com figuras recortadas, imagem ou não enviada)."""
+    paginas_texto = sum(1 for pagina in paginas if pagina["modo"] in ("texto", "misto"))
+    paginas_descartadas = sum(1 for pagina in paginas if pagina["modo"] == "descartada")
+    kb_imagens = sum(conversion_utils.bytes_imagens(pagina) for pagina in paginas) // 1024
+    rotulo = f"Envio do arquivo: {paginas_texto} de {len(paginas)} página(s) como texto, {kb_imagens} KB em imagens"
+    if paginas_descartadas:
+        rotulo += f", {paginas_descartadas} em branco ou repetida(s) não enviada(s)"
+    parecidas = [pagina for pagina in paginas if "parecida_com" in pagina]
+    if parecidas:
+        st.info(
+            "Estas páginas parecem repetir páginas anteriores e foram enviadas mesmo assim (confira se são cópias): "
+            + ", ".join(f"{pagina['pagina']} (parecida com a {pagina['parecida_com']})" for pagina in parecidas)
+            + ". Para deixá-las de fora, escolha o intervalo em \"Páginas enviadas à IA\"."
+        )
+    with st.expander(rotulo):
+        st.table([
+            {
+                "Página": pagina["pagina"],
+                "Enviada como": {
+                    "texto": "Texto",
+                    "misto": f"Texto + {sum(1 for s in pagina.get('segmentos', ()) if s['tipo'] == 'figura')} figura(s)",
+                    "descartada": "Não enviada",
+                }.get(pagina["modo"], "Imagem"),
+                "Motivo": pagina["motivo"] + (f"; parecida com a página {pagina['parecida_com']}" if "parecida_com" in pagina else ""),
+                "Codificação": pagina.get("codificacao", "-"),
+            }
+            for pagina in paginas
+        ])
+        estatisticas_cache = page_cache.obter_cache().resumo()
+        st.caption(
+            f"Cache de conversões: {estatisticas_cache['acertos_memoria'] + estatisticas_cache['acertos_disco']} acerto(s), "
+            f"{estatisticas_cache['falhas']} falha(s), {estatisticas_cache['itens_memoria']} documento(s) em memória."
+        )
+
+def linha_legibilidade(rotulo, paginas, texto, metricas):
+    """Linha da tabela de legibilidade de um trecho do arquivo, com as mesmas faixas das métricas do texto."""
+    linha = {rotulo: paginas, "Palavras": len(texto.split())}
+    if isinstance(metricas, dict):
+        linha.update({
+            "Facilidade (Flesch)": f"{metricas['facilidade_leitura_val']} ({metricas['facilidade_leitura_desc']})",
+            "Série (Flesch-Kincaid)": f"{metricas['serie_aprox_val']} ({metricas['serie_aprox_desc']})",
+            "Nível (SMOG)": f"{metricas['nivel_escolar_val']} ({metricas['nivel_escolar_desc']})",
+            "Variedade Lexical": f"{metricas['variedade_lexical_val']} ({metricas['variedade_lexical_desc']})",
+        })
+    else:
+        linha["Observação"] = metricas or "Página sem texto digital (digitalizada)."
+    return linha
+
+def preencher_tabela(placeholder, linhas_geradas):
+    """Exibe as linhas na tabela do placeholder à medida que são geradas (atualizando a cada 0,3 s)."""
+    linhas, ultima_exibicao = [], 0.0
+    for linha in linhas_geradas:
+        linhas.append(linha)
+        if time.perf_counter() - ultima_exibicao > 0.3:
+            placeholder.dataframe(linhas, hide_index=True, use_container_width=True)
+            ultima_exibicao = time.perf_counter()
+    placeholder.dataframe(linhas, hide_index=True, use_container_width=True)
+
+def mostrar_legibilidade_documento(paginas):
+    """Mostra as métricas de legibilidade do arquivo por questão e por página."""
+    paginas_texto = [(pagina["pagina"], pagina.get("texto", "")) for pagina in paginas if pagina.get("modo") != "descartada"]
+    if not any(texto for _, texto in paginas_texto):
+        return
+    with st.expander("Legibilidade do arquivo por questão e por página"):
+        aba_questoes, aba_paginas = st.tabs(["Por questão", "Por página"])
+        with aba_questoes:
+            preencher_tabela(st.empty(), (
+                dict({"Questão": questao["questao"]}, **linha_legibilidade("Página(s)", questao["paginas"], questao["texto"], metricas_NLP(questao["texto"])))
+                for questao in nlp_utils.segmentar_questoes(paginas_texto)
+            ))
+        with aba_paginas:
+            preencher_tabela(st.empty(), (
+                linha_legibilidade("Página", numero, texto, metricas if texto else None)
+                for numero, texto, metricas in nlp_utils.metricas_por_pagina(paginas_texto)
+            ))
+        st.caption("Trechos com menos de 20 palavras não têm métricas. Páginas digitalizadas não entram na análise.")
 
 # --- Funções Auxiliares ---
 
@@ -150,74 +297,6 @@ def adicionar_sugestao(sugestao):
     else:
         st.session_state["instrucoes_adicionais"] = sugestao
 
-def metricas_NLP(texto):
-    if not texto or not texto.strip():
-        return "Texto inválido para análise de legibilidade."
-
-    palavras = texto.split()
-    if not palavras or len(palavras) < 20:
-        return "Texto muito curto para análise de legibilidade (mínimo 20 palavras)."
-
-    # Cálculo de variedade lexical:
-    variedade_lexical_calc = lambda t: (
-        len(set(t.split())) / len(t.split())
-        if t.strip() and len(t.split()) > 0 else 0
-    )
-
-    facilidade_leitura = round(flesch_reading_ease(texto), 2)
-    serie_aprox = round(flesch_kincaid_grade(texto), 2)
-    nivel_escolar = round(smog_index(texto), 2)
-    variedade_lexical = round(variedade_lexical_calc(texto), 2)
-
-
-    # Interpretação de Facilidade de Leitura (Flesch Reading-Ease):
-    if facilidade_leitura >= 90:
-        fl_desc = "Muito fácil 🟢"
-    elif 70 <= facilidade_leitura < 90:
-        fl_desc = "Fácil 🟢"
-    elif 50 <= facilidade_leitura < 70:
-        fl_desc = "Médio 🟡"
-    else:
-        fl_desc = "Difícil 🔴"
-
-    # Interpretação de Série Aproximada (Flesch-Kincaid Grade Level)
-    if serie_aprox < 6:
-        sa_desc = "Fundamental I 🟢"
-    elif serie_aprox < 9:
-        sa_desc = "Fundamental II 🟢"
-    elif serie_aprox <= 12:
-        sa_desc = "Ensino Médio 🟡"
-    else:
-        sa_desc = "Ensino Superior 🔴"
-
-    # Interpretação de Nível Escolar (SMOG Index)
-    if nivel_escolar < 9:
-        ne_desc = "Fundamental 🟢"
-    elif nivel_escolar <= 12:
-        ne_desc = "Ensino Médio 🟡"
-    else:
-        ne_desc = "Ensino Superior 🔴"
-
-    # Interpretação Variedade Lexical
-    if variedade_lexical > 0.7:
-        vl_desc = "Alta 🟡"
-    elif 0.5 <= variedade_lexical <= 0.7:
-        vl_desc = "Média 🟢"
-    else:
-        vl_desc = "Baixa 🟢"
-
-
-    return {
-        "facilidade_leitura_val": facilidade_leitura,
-        "facilidade_leitura_desc": fl_desc,
-        "serie_aprox_val": serie_aprox,
-        "serie_aprox_desc": sa_desc,
-        "nivel_escolar_val": nivel_escolar,
-        "nivel_escolar_desc": ne_desc,
-        "variedade_lexical_val": variedade_lexical,
-        "variedade_lexical_desc": vl_desc,
-    }
-
 # Modelo de IA generativa
 modelo_txt = "gemini-2.5-flash"
 
@@ -262,7 +341,7 @@ with st.sidebar:
     st.subheader("Nível Escolar (SMOG Index)")
     st.write(
         "Outra estimativa do **nível escolar** de entendimento. "
-        "Foca em palavras com 3 ou mais sílabas. Quanto mais 'palavras difíceis', maior o nível escolar exigido."
+        "Foca em palavras com 4 ou mais sílabas (critério do português). Quanto mais 'palavras difíceis', maior o nível escolar exigido."
     )
     st.markdown("""
         | Pontuação | Nível Escolar Sugerido |
@@ -310,6 +389,26 @@ else:
 
 # Campo de upload de arquivo:
 campo_upload = st.file_uploader(label='Ou faça upload da avaliação (PDF ou Word)', type=['pdf', 'docx'], key="campo_upload")
+st.toggle(
+    "Enviar o arquivo original para a IA, sem converter as páginas em imagens (mais rápido)",
+    value=pdf_nativo.HABILITADO,
+    key="envio_pdf_nativo",
+    help="A IA lê o texto e as figuras direto do PDF (arquivos Word são convertidos em PDF antes). Se ela recusar o arquivo, as páginas são convertidas como antes."
+)
+st.toggle(
+    "Enviar como texto as páginas que já possuem texto digital (mais rápido)",
+    value=True,
+    key="usar_camada_texto",
+    help="Páginas digitalizadas ou com figuras relevantes continuam sendo enviadas como imagem. Com o envio do arquivo original, vale para a conversão usada se a IA recusar o arquivo."
+)
+st.toggle(
+    "Ignorar páginas em branco e repetidas",
+    value=True,
+    key="filtrar_paginas",
+    help="Versos em branco e cópias exatas de páginas anteriores não são enviados à IA. Páginas apenas parecidas (como uma capa digitalizada duas vezes) são enviadas e apontadas no relatório do envio. Com o envio do arquivo original, vale para a conversão usada se a IA recusar o arquivo."
+)
+descartar_pdf_do_docx(campo_upload)
+paginas_selecionadas = escolher_paginas(campo_upload) if campo_upload is not None else None
 
 # Lista de NEEs (Necessidades Educativas Especiais)
 adversidades = [
@@ -324,7 +423,11 @@ adversidades = [
     'Altas Habilidades/Superdotação'
 ]
 
-selectbox_adv = st.selectbox(label='Insira a adversidade do aluno:', placeholder='Escolha uma opção', options=adversidades, key="selectbox_adv")
+st.toggle("Adaptar para várias NEEs de uma vez", key="modo_multi_nee", help="O documento é processado uma vez e as adaptações são geradas em paralelo, cada uma em sua aba.")
+if st.session_state.modo_multi_nee:
+    st.multiselect(label='Insira as adversidades dos alunos:', placeholder='Escolha uma ou mais opções', options=adversidades, key="multiselect_adv")
+else:
+    selectbox_adv = st.selectbox(label='Insira a adversidade do aluno:', placeholder='Escolha uma opção', options=adversidades, key="selectbox_adv")
 
 # Instruções Adicionais:
 sugestoes = [
@@ -345,154 +448,71 @@ for col, sugestao in zip(cols, sugestoes):
 
 st.markdown('---')
 
-# --- Instrução de Sistema para a IA ---
-
-system_instruction_text = """
-Você é IncluIA, um especialista em Design Universal para Aprendizagem (DUA) e na adaptação de materiais didáticos e avaliativos para alunos com Necessidades Educativas Especiais (NEEs). Sua missão é tornar o conteúdo educacional acessível e justo, removendo barreiras de aprendizagem que não estejam relacionadas ao conhecimento ou habilidade central que se deseja avaliar.
-
-**REGRAS DE IDIOMA (MUITO IMPORTANTE):**
-
-1.  **Idioma Padrão:** O idioma da questão adaptada DEVE ser o mesmo idioma da questão original. Se a questão original está em português, a adaptação DEVE ser em português.
-2.  **Exceção para Língua Estrangeira:** Se a disciplina for de língua estrangeira (inglês, espanhol, etc.), a questão adaptada DEVE permanecer no idioma estrangeiro. O objetivo é avaliar o conhecimento nesse idioma. Para facilitar a compreensão, você pode:
-    *   Escrever o enunciado da questão em português e manter as alternativas/respostas no idioma estrangeiro.
-    *   Usar português e a língua estrangeira juntos no enunciado para esclarecer comandos complexos.
-    *   NUNCA traduza o conteúdo principal (textos, alternativas) que avalia a proficiência no idioma para o português.
-
-**PROCESSO DE ADAPTAÇÃO:**
-
-Ao receber uma questão e a especificação de uma NEE, siga rigorosamente estes passos:
-
-1.  **Análise do Objetivo:** Primeiro, identifique qual é o objetivo de aprendizagem central da questão original. O que o aluno precisa saber ou fazer para respondê-la corretamente?
-2.  **Identificação de Barreiras:** Analise como a formatação, a linguagem ou a estrutura da questão original podem criar barreiras para um aluno com a NEE especificada, considerando também as `instrucoes_adicionais`.
-3.  **Aplicação da Adaptação:** Modifique a questão para remover as barreiras identificadas. Suas estratégias podem incluir, mas não se limitam a:
-    *   Simplificar a linguagem e o vocabulário.
-    *   Tornar os enunciados mais diretos e claros.
-    *   Dividir tarefas complexas em etapas menores e numeradas.
-    *   Mudar o formato da questão (ex: de múltipla escolha para completar lacunas).
-    *   Sugerir o uso de recursos de apoio (ex: banco de palavras, imagens, calculadora).
-4.  **Consideração das Instruções Adicionais:** As `instrucoes_adicionais` sobre o aluno são cruciais e devem sempre ser consideradas para personalizar a adaptação.
-
-**REGRA DE ADAPTAÇÃO DE TEXTO-BASE:**
-
-Por padrão, textos-base (enunciados longos, artigos, contos, etc.) que servem de apoio para as questões devem ser mantidos em sua forma original.
-**EXCEÇÃO:** Você SÓ DEVE adaptar o texto-base se as `instrucoes_adicionais` contiverem uma diretriz explícita para isso, como "Adaptar enunciado/texto" ou "Simplificar texto de apoio".
-Se a adaptação do texto for solicitada, você deve reescrevê-lo usando estratégias como: simplificação de vocabulário, divisão de frases complexas, uso de listas para organizar informações e, se necessário, adição de um pequeno glossário para termos-chave. O texto-base adaptado deve ser apresentado no início da sua resposta, antes das questões adaptadas.
-
-**REGRA DE SUBSTITUIÇÃO DE QUESTÃO:**
-
-Se a questão original for complexa a ponto de a adaptação descaracterizar completamente seu objetivo pedagógico, você DEVE criar uma NOVA questão. A nova questão precisa:
-a. Avaliar o mesmo conceito da original ou um pré-requisito essencial para ele.
-b. Ser totalmente acessível para a NEE e as `instrucoes_adicionais`.
-c. Na sua justificativa, explique por que a substituição foi necessária e como a nova questão se conecta ao tema.
-
-**PRINCÍPIOS ORIENTADORES:**
-*   **Foco na Acessibilidade:** O objetivo é remover barreiras, não diminuir o rigor do conteúdo dentro das possibilidades do aluno.
-*   **Justiça Avaliativa:** A adaptação deve garantir que a avaliação seja justa e meça o conhecimento do aluno sobre o tema, e não sua dificuldade com o formato da prova.
-
-**FORMATO DA RESPOSTA FINAL (OBRIGATÓRIO):**
-
-Sua resposta final deve seguir esta estrutura exata, sem exceções:
-
-1.  Se aplicável, o texto-base adaptado primeiro.
-2.  Todas as questões adaptadas (ou as novas questões), numeradas. Nunca indique qual a resposta correta na avaliação adaptada.
-3.  Em uma nova linha, insira o marcador `# Justificativas:` (exatamente assim).
-4.  Abaixo do marcador, liste suas justificativas detalhadas para cada adaptação ou substituição.
-5.  Se você criou uma nova questão, informe o gabarito dela na justificativa correspondente.
-6.  NÃO utilize formatações em markdown como negrito, itálico ou listas com marcadores (como '*' ou '-'). Use apenas texto puro e numeração simples.
-"""
-
-# --- Prompts Específicos para cada NEE ---
-# Estes prompts serão combinados com o texto do arquivo/campo_input antes de enviar para a IA.
-
-prompt_base_template = """
-Adapte a seguinte questão/avaliação para um aluno com {nee_type}.
-{nee_guidelines}
-
-Instruções Adicionais Específicas para este aluno com {nee_type_short}: "{instrucoes_adicionais_val}"
-
-Sua Adaptação:
-"""
-
-# Dicionário para mapear adversidades a guidelines e short_names
-nee_details = {
-    'Não especificado': {
-        'guidelines': "Aplicando princípios de Design Universal para Aprendizagem. Foque em clareza, objetividade, e remoção de barreiras comuns.",
-        'short_name': "Necessidades Educativas Especiais não especificadas"
-    },
-    'Transtorno do Espectro Autista (TEA)': {
-        'guidelines': """Priorize:
-- Linguagem literal, direta e objetiva. Evite ambiguidades, ironias ou linguagem figurada.
-- Instruções curtas, claras e sequenciais (passo a passo, se aplicável).
-- Redução de estímulos visuais excessivos ou distratores no texto.
-- Enunciados concisos.
-- Se houver elementos sociais implícitos, torne-os explícitos ou reformule.""",
-        'short_name': "TEA"
-    },
-    'Transtorno do Déficit de Atenção com Hiperatividade (TDAH)': {
-        'guidelines': """Priorize:
-- Instruções curtas, claras e diretas.
-- Destaque (ex: negrito, ou menção explícita) para palavras-chave ou comandos importantes.
-- Divisão de tarefas longas em partes menores e mais gerenciáveis.
-- Redução de distratores textuais.
-- Formato que facilite o foco (ex: uma questão por vez, se for uma lista).""",
-        'short_name': "TDAH"
-    },
-    'Deficiência Intelectual': {
-        'guidelines': """Priorize:
-- Linguagem extremamente simples, concreta e objetiva.
-- Uso de vocabulário familiar e frases curtas.
-- Instruções passo a passo, com exemplos concretos se possível.
-- Redução do número de elementos ou informações a serem processadas simultaneamente.
-- Foco nos conceitos e habilidades mais essenciais.
-- Se for múltipla escolha, reduza o número de alternativas e torne-as bem distintas.""",
-        'short_name': "DI"
-    },
-    'Deficiência Visual': {
-        'guidelines': """Priorize (considerando leitura via software leitor de tela ou transcrição para Braille):
-- Descrição textual detalhada de quaisquer imagens, gráficos ou tabelas essenciais para a compreensão.
-- Clareza na estrutura do texto para navegação sequencial.
-- Evitar informações que dependam exclusivamente de formatação visual (cores, layout complexo) sem alternativa textual.
-- Enunciados claros e diretos.""",
-        'short_name': "DV"
-    },
-    'Deficiência Auditiva': {
-        'guidelines': """Priorize (que pode ter Português como L2):
-- Linguagem clara, objetiva e direta, evitando estruturas frasais muito complexas, voz passiva excessiva ou inversões sintáticas desnecessárias.
-- Vocabulário acessível e preciso. Evite gírias ou expressões idiomáticas complexas.
-- Uso de recursos visuais textuais (ex: tópicos, listas) para organizar informações.
-- Frases mais curtas e com ordem direta (Sujeito-Verbo-Objeto), se possível.""",
-        'short_name': "DA"
-    },
-    'Dislexia': {
-        'guidelines': """Priorize:
-- Linguagem clara, objetiva e frases curtas.
-- Evitar blocos de texto muito densos; use parágrafos mais curtos e espaçamento.
-- Destaque para palavras-chave (ex: negrito, ou menção explícita).
-- Instruções segmentadas.
-- Evitar fontes ou formatações que dificultem a leitura (embora você não controle a fonte final, a estrutura do texto pode ajudar).
-- Se possível, transformar questões dissertativas longas em itens menores ou formatos alternativos (completar, associar, múltipla escolha clara).""",
-        'short_name': "Dislexia"
-    },
-    'Discalculia': {
-        'guidelines': """Priorize (especialmente se envolver matemática):
-- Clareza extrema nos enunciados de problemas matemáticos; decomponha-os em etapas lógicas.
-- Redução de informações numéricas irrelevantes.
-- Uso de linguagem simples e direta para descrever operações ou conceitos matemáticos.
-- Espaço visualmente organizado para cálculos (se for o caso de descrever um layout).
-- Sugestão de uso de recursos de apoio (tabuada, calculadora – se o objetivo não for avaliar o cálculo mental em si).
-- Foco no raciocínio matemático em detrimento de pura memorização de fatos numéricos, quando aplicável.""",
-        'short_name': "Discalculia"
-    },
-    'Altas Habilidades/Superdotação': {
-        'guidelines': """Priorize (visando maior desafio, profundidade e engajamento):
-- Aumento da complexidade conceitual ou do nível de abstração.
-- Questões que exijam pensamento crítico, criatividade, análise e síntese.
-- Transformação de questões fechadas em abertas, permitindo múltiplas soluções ou aprofundamento.
-- Propostas de investigação, conexão com outros temas ou aplicação do conhecimento em novos contextos.
-- Se a questão original for muito básica, sugira uma extensão ou um desafio complementar.""",
-        'short_name': "AH/SD"
-    }
-}
+# --- Geração para uma ou várias NEEs ---
+
+MAX_NEES_SIMULTANEAS = 4  # Limite de chamadas simultâneas à IA por sessão
+
+def gerar_resposta_nee(nee, chave_api, user_content_parts, instrucoes_adicionais_valor, cache_respostas, ignorar_cache, rasterizar=None):
+    """Gera (ou busca no cache) a resposta completa da IA para uma NEE. Não usa o Streamlit, pois roda em threads."""
+    return llm_utils.gerar_resposta(
+        chave_api, modelo_txt, system_instruction_text, user_content_parts, montar_prompt_usuario(nee, instrucoes_adicionais_valor),
+        cache_respostas=cache_respostas, ignorar_cache=ignorar_cache, rasterizar_pdf=rasterizar
+    )
+
+def resultado_da_resposta(full_response_text):
+    """Separa a resposta da IA em (texto adaptado, justificativas) como exibidos na interface."""
+    if not full_response_text:
+        return "Não foi possível gerar uma resposta. Tente novamente.", ""
+    adaptado, justificativas = llm_utils.dividir_resposta(full_response_text)
+    if justificativas is None:
+        justificativas = "Nenhuma justificativa explícita fornecida pela IA."
+    return adaptado, justificativas
+
+def mostrar_resultado_nee(nee, adaptado, justificativas):
+    """Exibe, no container atual, a adaptação e as justificativas geradas para uma NEE."""
+    nome_curto = nee_details.get(nee, nee_details['Não especificado'])['short_name']
+    st.text_area(
+        label=f'Texto Adaptado para {nome_curto} (A IncluIA pode cometer erros. Revise as respostas.):',
+        value=adaptado,
+        disabled=True,
+        height=350
+    )
+    exibir_metricas_adaptado(adaptado)
+    if justificativas:
+        st.text_area(label=f'Justificativas da Adaptação para {nome_curto}:', value=justificativas, disabled=True, height=250)
+
+def adaptar_varias_nees(nees, user_content_parts, instrucoes_adicionais_valor, cache_respostas, ignorar_cache, rasterizar=None):
+    """Gera as adaptações das NEEs em paralelo e exibe cada uma em sua aba assim que fica pronta."""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    placeholders = {}
+    for nee, aba in zip(nees, st.tabs(nees)):
+        with aba:
+            placeholders[nee] = st.empty()
+            placeholders[nee].info("Gerando adaptação com IA... Por favor, aguarde.")
+
+    st.session_state.resultados_multi_nee = {}
+    chave_api = st.session_state.profile.get('gemini_api_key')
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(len(nees), MAX_NEES_SIMULTANEAS)) as executor:
+        futuros = {
+            executor.submit(gerar_resposta_nee, nee, chave_api, user_content_parts, instrucoes_adicionais_valor, cache_respostas, ignorar_cache, rasterizar): nee
+            for nee in nees
+        }
+        for futuro in as_completed(futuros):
+            nee = futuros[futuro]
+            with placeholders[nee].container():
+                try:
+                    adaptado, justificativas = resultado_da_resposta(futuro.result())
+                except Exception as e:
+                    st.error(f"Ocorreu um erro ({type(e).__name__}) ao chamar a IA: {e}")
+                    if "503" in str(e) or "RESOURCE_EXHAUSTED" in str(e).upper():
+                        st.warning("O modelo da IA parece estar sobrecarregado ou você excedeu sua cota. Tente novamente mais tarde.")
+                    adaptado, justificativas = "Não foi possível processar a solicitação devido a um erro.", ""
+                st.session_state.resultados_multi_nee[nee] = (adaptado, justificativas)
+                mostrar_resultado_nee(nee, adaptado, justificativas)
+
+    st.caption(f"{len(nees)} adaptação(ões) concluída(s) em {time.perf_counter() - inicio:.1f} s.")
 
 
 # --- Botão de Geração ---
@@ -500,6 +520,9 @@ nee_details = {
 col1_btn, col2_btn, col3_btn = st.columns([1, 1, 1])
 with col2_btn:
     btn_adaptar = st.button(label='GERAR ADAPTAÇÃO')
+with col3_btn:
+    st.checkbox("Gerar nova resposta", key="ignorar_cache", help="Ignora adaptações idênticas já geradas e chama a IA novamente.")
+    st.checkbox("Exibir enquanto gera", value=True, key="modo_streaming", help="Mostra a adaptação à medida que a IA escreve.")
 
 # --- Lógica de Geração da IA e Exibição ---
 
@@ -507,67 +530,219 @@ output_adaptado_placeholder = st.empty()
 metricas_adaptado_placeholder = st.empty()
 output_justificativas_placeholder = st.empty()
 
+def exibir_metricas_adaptado(texto_adaptado):
+    """Exibe as métricas de legibilidade do texto adaptado no container atual."""
+    if len(texto_adaptado.split()) >= 20:
+        metric_results_adapted = metricas_NLP(texto_adaptado)
+        if isinstance(metric_results_adapted, dict):
+            col_ma1, col_ma2, col_ma3 = st.columns([1, 0.05, 1])
+            with col_ma1:
+                st.markdown(f"**Facilidade de Leitura (Flesch):** {metric_results_adapted['facilidade_leitura_val']} ({metric_results_adapted['facilidade_leitura_desc']})")
+                st.markdown(f"**Série Aprox. (Flesch-Kincaid):** {metric_results_adapted['serie_aprox_val']} ({metric_results_adapted['serie_aprox_desc']})")
+            with col_ma3:
+                st.markdown(f"**Nível Escolar (SMOG):** {metric_results_adapted['nivel_escolar_val']} ({metric_results_adapted['nivel_escolar_desc']})")
+                st.markdown(f"**Variedade Lexical:** {metric_results_adapted['variedade_lexical_val']} ({metric_results_adapted['variedade_lexical_desc']})")
+        else:
+            st.info(metric_results_adapted)
+    elif texto_adaptado:
+        st.warning("Texto adaptado muito curto ou vazio para análise de legibilidade (mínimo 20 palavras).")
+
+def mostrar_metricas_adaptado(texto_adaptado):
+    """Exibe as métricas de legibilidade do texto adaptado no placeholder de métricas."""
+    with metricas_adaptado_placeholder.container():
+        exibir_metricas_adaptado(texto_adaptado)
+
+def chamar_modelo(model, contents, **kwargs):
+    """Chama o modelo com os limites de taxa e as retentativas da chave da API do usuário."""
+    estatisticas = {}
+    response = llm_utils.chamar_com_limites(
+        st.session_state.profile.get('gemini_api_key'), model.generate_content, contents,
+        tokens_estimados=llm_utils.estimar_tokens(contents), estatisticas=estatisticas, **kwargs
+    )
+    if estatisticas["retentativas"] or estatisticas["espera_fila_s"] >= 1:
+        st.caption(
+            f"A IA estava ocupada: {estatisticas['retentativas']} nova(s) tentativa(s) e "
+            f"{estatisticas['espera_fila_s']:.1f} s na fila de requisições da sua chave."
+        )
+    return response
+
+def gerar_adaptacao_streaming(model, contents):
+    """
+    Gera a adaptação em streaming, exibindo o texto adaptado e depois as justificativas à medida que chegam.
+    As métricas de legibilidade são calculadas assim que a seção adaptada termina. Retorna o texto completo.
+    """
+    inicio = time.perf_counter()
+    with st.spinner("Gerando adaptação com IA... Por favor, aguarde."):
+        response = chamar_modelo(model, contents, stream=True)
+        tempo_primeiro_token = time.perf_counter() - inicio
+
+    divisor = llm_utils.DivisorResposta()
+    adaptado_exibido = justificativas_exibidas = None
+    for chunk in response:
+        try:
+            divisor.adicionar(chunk.text)
+        except ValueError:
+            continue  # Pedaço sem texto (ex: apenas metadados de finalização)
+
+        # Os rótulos "(gerando...)" evitam conflito de ID com as caixas exibidas ao final
+        if divisor.adaptado != adaptado_exibido:
+            adaptado_exibido = divisor.adaptado
+            output_adaptado_placeholder.text_area(
+                label='Texto Adaptado (gerando...):', value=adaptado_exibido, disabled=True, height=350
+            )
+            if divisor.adaptado_completo:
+                mostrar_metricas_adaptado(adaptado_exibido)
+        if divisor.justificativas and divisor.justificativas != justificativas_exibidas:
+            justificativas_exibidas = divisor.justificativas
+            output_justificativas_placeholder.text_area(
+                label='Justificativas da Adaptação (gerando...):', value=justificativas_exibidas, disabled=True, height=250
+            )
+
+    st.caption(f"Primeira resposta da IA em {tempo_primeiro_token:.1f} s; adaptação completa em {time.perf_counter() - inicio:.1f} s.")
+    return divisor.texto.strip()
+
+multi_nee_exibido = False
+
 if btn_adaptar:
     user_content_parts = []
+    pdf_recortados = {}  # PDF enviado nativamente com as páginas escolhidas -> (PDF completo, páginas)
     has_text_input = bool(st.session_state.campo_input and st.session_state.campo_input.strip())
 
     # 1. Processar arquivo carregado
     if st.session_state.campo_upload is not None:
         file_bytes = st.session_state.campo_upload.read()
-        converted_image_bytes_list = []
+        paginas_convertidas = []
+        pdf_original = None
+
+        usar_camada_texto = st.session_state.usar_camada_texto
+        filtrar = st.session_state.filtrar_paginas
+        parametros_conversao = {"tipo": st.session_state.campo_upload.type, "dpi": 300, "usar_camada_texto": usar_camada_texto, "adaptativo": True, "hibrido": True, "filtrar": filtrar,
+                                "paginas": paginas_selecionadas}
+        cache_paginas = page_cache.obter_cache()
 
         with st.spinner(f"Processando arquivo {st.session_state.campo_upload.name}..."):
-            if st.session_state.campo_upload.type == "application/pdf":
-                converted_image_bytes_list = convert_pdf_bytes_to_image_bytes(file_bytes)
+            if st.session_state.envio_pdf_nativo and st.session_state.campo_upload.type == "application/pdf":
+                pdf_original = file_bytes
+            elif st.session_state.envio_pdf_nativo and st.session_state.campo_upload.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+                pdf_original = convert_docx_bytes_to_pdf_bytes(file_bytes)
+            elif st.session_state.campo_upload.type == "application/pdf":
+                paginas_convertidas = cache_paginas.obter_ou_converter(
+                    file_bytes, parametros_conversao,
+                    lambda: convert_pdf_bytes_to_pages(file_bytes, usar_camada_texto=usar_camada_texto, filtrar=filtrar, paginas_selecionadas=paginas_selecionadas)
+                )
             elif st.session_state.campo_upload.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document": # DOCX
-                converted_image_bytes_list = convert_docx_bytes_to_image_bytes(file_bytes)
+                paginas_convertidas = cache_paginas.obter_ou_converter(
+                    file_bytes, parametros_conversao,
+                    lambda: convert_docx_bytes_to_pages(file_bytes, usar_camada_texto=usar_camada_texto, filtrar=filtrar, paginas_selecionadas=paginas_selecionadas)
+                )
             else:
                 st.error("Tipo de arquivo não suportado. Por favor, envie um PDF ou DOCX.")
 
-        if converted_image_bytes_list:
-            for img_bytes in converted_image_bytes_list:
-                user_content_parts.append({'mime_type': 'image/jpeg', 'data': img_bytes})
-        elif st.session_state.campo_upload.type in ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"] and not converted_image_bytes_list:
+        if pdf_original:
+            # O PDF vai inteiro (ou só com as páginas escolhidas) para a IA; as páginas só são convertidas se ela recusar o arquivo
+            pdf_enviado = pdf_original
+            if paginas_selecionadas:
+                try:
+                    pdf_enviado = conversion_utils.recortar_pdf(pdf_original, paginas_selecionadas)
+                    pdf_recortados[pdf_enviado] = (pdf_original, paginas_selecionadas)
+                    user_content_parts.append(
+                        f"[O PDF a seguir contém as páginas {paginas_selecionadas[0]} a {paginas_selecionadas[-1]} do arquivo]"
+                    )
+                except Exception:
+                    pdf_enviado = pdf_original
+            user_content_parts.append(pdf_nativo.parte_pdf(pdf_enviado))
+            try:
+                paginas_texto = conversion_utils.extrair_paginas_texto(pdf_original, paginas_selecionadas)
+            except Exception:
+                paginas_texto = []
+            st.caption(
+                f"Arquivo enviado à IA como PDF original: {len(pdf_enviado) // 1024} KB"
+                + (f", {len(paginas_texto)} página(s)." if paginas_texto else ".")
+            )
+            mostrar_legibilidade_documento(paginas_texto)
+        elif paginas_convertidas:
+            user_content_parts.extend(conversion_utils.paginas_para_partes(paginas_convertidas))
+            mostrar_relatorio_paginas(paginas_convertidas)
+            mostrar_legibilidade_documento(paginas_convertidas)
+        elif st.session_state.campo_upload.type in ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"] and not paginas_convertidas:
             st.warning("Não foi possível extrair conteúdo visual do arquivo.")
 
     # 2. Adicionar texto do campo_input se houver
     if has_text_input:
         user_content_parts.append(st.session_state.campo_input)
 
+    # Se a IA recusar o PDF original, as páginas são convertidas (com as opções de conversão escolhidas)
+    pdf_rasterizado = []
+    usar_camada_texto_alternativa = st.session_state.usar_camada_texto
+    filtrar_alternativa = st.session_state.filtrar_paginas
+
+    def rasterizar(pdf_bytes):
+        pdf_rasterizado.append(True)
+        # Um PDF recortado volta ao original, para as páginas convertidas manterem a numeração do arquivo
+        pdf_completo, selecao = pdf_recortados.get(pdf_bytes, (pdf_bytes, None))
+        return rasterizar_pdf(pdf_completo, usar_camada_texto=usar_camada_texto_alternativa, filtrar=filtrar_alternativa,
+                              paginas_selecionadas=selecao)
+
     # 3. Verificar se há conteúdo para enviar
     if not user_content_parts:
         st.warning('Insira um texto no campo ou faça upload de um arquivo para realizar a adaptação!')
+    elif st.session_state.modo_multi_nee:
+        st.session_state.output_adaptado = ""
+        st.session_state.output_justificativas = ""
+        adaptar_varias_nees(
+            st.session_state.multiselect_adv or ['Não especificado'],
+            user_content_parts,
+            st.session_state.get("instrucoes_adicionais", ""),
+            llm_cache.obter_cache_respostas(st.session_state.supabase_client, st.secrets.get("cache_respostas_tabela")),
+            st.session_state.ignorar_cache,
+            rasterizar
+        )
+        multi_nee_exibido = True
     else:
+        st.session_state.resultados_multi_nee = {}
         instrucoes_adicionais_valor = st.session_state.get("instrucoes_adicionais", "")
-        selected_nee_info = nee_details.get(st.session_state.selectbox_adv, nee_details['Não especificado'])
+        user_prompt_text_string = montar_prompt_usuario(st.session_state.selectbox_adv, instrucoes_adicionais_valor)
 
-        user_prompt_text_string = prompt_base_template.format(
-            nee_type=st.session_state.selectbox_adv,
-            nee_guidelines=selected_nee_info['guidelines'],
-            nee_type_short=selected_nee_info['short_name'],
-            instrucoes_adicionais_val=instrucoes_adicionais_valor if instrucoes_adicionais_valor else 'Nenhuma instrução adicional fornecida.'
+        cache_respostas = llm_cache.obter_cache_respostas(
+            st.session_state.supabase_client, st.secrets.get("cache_respostas_tabela")
         )
-
-        final_contents_for_api = [system_instruction_text] + user_content_parts + [user_prompt_text_string]
+        chave_cache = llm_cache.chave_resposta(modelo_txt, system_instruction_text, user_content_parts, user_prompt_text_string)
 
         try:
-            with st.spinner("Gerando adaptação com IA... Por favor, aguarde."):
-                model = genai.GenerativeModel(modelo_txt)
-                response = model.generate_content(final_contents_for_api)
-
-            full_response_text = response.text.strip()
+            full_response_text = None if st.session_state.ignorar_cache else cache_respostas.obter(chave_cache)
+            if full_response_text is not None:
+                st.caption("Adaptação idêntica encontrada no cache. Marque \"Gerar nova resposta\" para chamar a IA novamente.")
+            else:
+                # A instrução de sistema vai pelo cache de contexto do Gemini (ou inline, se indisponível)
+                # e o PDF original vai nativamente (ou convertido em páginas, se a IA recusá-lo)
+                chave_api = st.session_state.profile.get('gemini_api_key')
+                if st.session_state.modo_streaming:
+                    full_response_text = pdf_nativo.gerar_com_pdf(
+                        chave_api, user_content_parts,
+                        lambda partes: context_cache.gerar_com_instrucao(
+                            chave_api, modelo_txt, system_instruction_text, partes + [user_prompt_text_string], gerar_adaptacao_streaming
+                        ),
+                        rasterizar
+                    )
+                else:
+                    with st.spinner("Gerando adaptação com IA... Por favor, aguarde."):
+                        response = pdf_nativo.gerar_com_pdf(
+                            chave_api, user_content_parts,
+                            lambda partes: context_cache.gerar_com_instrucao(
+                                chave_api, modelo_txt, system_instruction_text, partes + [user_prompt_text_string], chamar_modelo
+                            ),
+                            rasterizar
+                        )
+                    full_response_text = response.text.strip()
+                if pdf_rasterizado:
+                    st.caption("A IA não aceitou o PDF original; as páginas foram convertidas e enviadas como antes.")
+
+                if full_response_text:
+                    cache_respostas.guardar(chave_cache, modelo_txt, full_response_text)
 
             if not full_response_text:
                 st.warning("A IA não gerou uma resposta de texto válida ou a resposta estava vazia.")
-                st.session_state.output_adaptado = "Não foi possível gerar uma resposta. Tente novamente."
-                st.session_state.output_justificativas = ""
-            elif "# Justificativas:" in full_response_text:
-                parts_split = full_response_text.split("# Justificativas:", 1)
-                st.session_state.output_adaptado = parts_split[0].strip()
-                st.session_state.output_justificativas = parts_split[1].strip()
-            else:
-                st.session_state.output_adaptado = full_response_text
-                st.session_state.output_justificativas = "Nenhuma justificativa explícita fornecida pela IA."
+            st.session_state.output_adaptado, st.session_state.output_justificativas = resultado_da_resposta(full_response_text)
 
         except Exception as e:
             st.error(f"Ocorreu um erro ({type(e).__name__}) ao chamar a IA: {e}")
@@ -587,22 +762,7 @@ if st.session_state.output_adaptado:
         height=350
     )
 
-    with metricas_adaptado_placeholder.container():
-        if len(st.session_state.output_adaptado.split()) >= 20:
-            metric_results_adapted = metricas_NLP(st.session_state.output_adaptado)
-            if isinstance(metric_results_adapted, dict):
-                col_ma1, col_ma2, col_ma3 = st.columns([1, 0.05, 1])
-                with col_ma1:
-                    st.markdown(f"**Facilidade de Leitura (Flesch):** {metric_results_adapted['facilidade_leitura_val']} ({metric_results_adapted['facilidade_leitura_desc']})")
-                    st.markdown(f"**Série Aprox. (Flesch-Kincaid):** {metric_results_adapted['serie_aprox_val']} ({metric_results_adapted['serie_aprox_desc']})")
-                with col_ma3:
-                    st.markdown(f"**Nível Escolar (SMOG):** {metric_results_adapted['nivel_escolar_val']} ({metric_results_adapted['nivel_escolar_desc']})")
-                    st.markdown(f"**Variedade Lexical:** {metric_results_adapted['variedade_lexical_val']} ({metric_results_adapted['variedade_lexical_desc']})")
-            else:
-                st.info(metric_results_adapted)
-        else:
-            if st.session_state.output_adaptado:
-                st.warning("Texto adaptado muito curto ou vazio para análise de legibilidade (mínimo 20 palavras).")
+    mostrar_metricas_adaptado(st.session_state.output_adaptado)
 
 if st.session_state.output_justificativas:
     output_justificativas_placeholder.text_area(
@@ -612,5 +772,11 @@ if st.session_state.output_justificativas:
         height=250
     )
 
+if st.session_state.resultados_multi_nee and not multi_nee_exibido:
+    nees_geradas = list(st.session_state.resultados_multi_nee)
+    for aba, nee in zip(st.tabs(nees_geradas), nees_geradas):
+        with aba:
+            mostrar_resultado_nee(nee, *st.session_state.resultados_multi_nee[nee])
+
 st.markdown('---')
 st.caption("A IncluIA é uma ferramenta de auxílio. Revise as respostas.")
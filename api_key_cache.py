@@ -0,0 +1,125 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+# --- CACHE DE VALIDAÇÃO DAS CHAVES DA API ---
+# Guarda, por processo do servidor, o resultado da última verificação de cada chave do Gemini,
+# indexado por um hash com sal (a chave em si nunca fica no cache). Chaves válidas são reaproveitadas
+# por algumas horas e chaves inválidas por alguns minutos, evitando uma chamada à API a cada login.
+
+TTL_VALIDA_S = float(os.environ.get("INCLUIA_VALIDACAO_CHAVE_TTL_MIN", 360)) * 60
+TTL_INVALIDA_S = float(os.environ.get("INCLUIA_VALIDACAO_CHAVE_NEGATIVA_TTL_MIN", 10)) * 60
+MENSAGEM_CHAVE_INVALIDA = "API key not valid"
+
+_SAL = os.environ.get("INCLUIA_SAL_CHAVES", "").encode("utf-8") or os.urandom(32)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class ChaveApiInvalida(Exception):
+    """A chave já foi recusada pela API recentemente (a mensagem segue o padrão do Gemini)."""
+
+
+def chave_erro_invalida(erro):
+    return MENSAGEM_CHAVE_INVALIDA in str(erro)
+
+
+def codigo_erro_api(erro):
+    """Código HTTP do erro da API (google.genai.errors.APIError ou google.api_core), ou None."""
+    codigo = getattr(erro, "code", None)
+    return int(codigo) if isinstance(codigo, int) else None
+
+
+def estado_erro_api(erro):
+    """Estado do erro da API (ex: "INVALID_ARGUMENT"), nos dois SDKs, ou "" se não for um erro da API."""
+    estado = getattr(erro, "status", None) or getattr(getattr(erro, "grpc_status_code", None), "name", None)
+    return str(estado or "").upper()
+
+
+class CacheValidacaoChaves:
+    """Resultado e horário da última verificação de cada chave, com TTL distinto para válidas e inválidas."""
+
+    def __init__(self, ttl_valida=TTL_VALIDA_S, ttl_invalida=TTL_INVALIDA_S, sal=_SAL):
+        self.ttl_valida = ttl_valida
+        self.ttl_invalida = ttl_invalida
+        self._sal = sal
+        self._itens = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {"acertos": 0, "falhas": 0, "verificacoes": 0, "invalidacoes": 0}
+
+    def _id(self, chave_api):
+        return hmac.new(self._sal, chave_api.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def consultar(self, chave_api):
+        """Retorna True/False se houver um resultado ainda válido para a chave, ou None."""
+        with self._lock:
+            item = self._itens.get(self._id(chave_api))
+            if item is not None:
+                valida, verificado_em = item
+                ttl = self.ttl_valida if valida else self.ttl_invalida
+                if time.time() - verificado_em < ttl:
+                    self.estatisticas["acertos"] += 1
+                    return valida
+            self.estatisticas["falhas"] += 1
+            return None
+
+    def registrar(self, chave_api, valida):
+        with self._lock:
+            self._itens[self._id(chave_api)] = (valida, time.time())
+
+    def invalidar(self, chave_api):
+        """Marca a chave como inválida (ex: uma chamada real retornou "API key not valid")."""
+        with self._lock:
+            self._itens[self._id(chave_api)] = (False, time.time())
+            self.estatisticas["invalidacoes"] += 1
+
+    def validar(self, chave_api):
+        """
+        Configura o Gemini com a chave e a valida, consultando a API só se não houver resultado recente.
+        Levanta a exceção da API (ou ChaveApiInvalida, se já recusada) quando a chave não é válida;
+        erros de rede não são guardados no cache.
+        """
+        import google.generativeai as genai
+        genai.configure(api_key=chave_api)
+        valida = self.consultar(chave_api)
+        if valida is False:
+            raise ChaveApiInvalida(f"{MENSAGEM_CHAVE_INVALIDA}. Please pass a valid API key.")
+        if valida:
+            return True
+
+        with self._lock:
+            self.estatisticas["verificacoes"] += 1
+        try:
+            next(iter(genai.list_models(page_size=1)), None)  # Uma chamada leve para testar a autenticação
+        except Exception as e:
+            if chave_erro_invalida(e):
+                self.registrar(chave_api, False)
+            raise
+        self.registrar(chave_api, True)
+        return True
+
+    def resumo(self):
+        with self._lock:
+            return dict(self.estatisticas, chaves=len(self._itens))
+
+
+def obter_cache():
+    """Retorna o cache de validação do processo do servidor, compartilhado por todas as sessões."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheValidacaoChaves()
+        return _cache
+
+
+def validar_chave_api(chave_api):
+    """Atalho para validar uma chave usando o cache compartilhado."""
+    return obter_cache().validar(chave_api)
+
+
+def invalidar_chave_api(chave_api):
+    if chave_api:
+        obter_cache().invalidar(chave_api)
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+
+# --- AQUECIMENTO DO SERVIDOR ---
+# Executado uma vez por processo do servidor, em segundo plano, a partir da primeira execução de
+# qualquer página (o Streamlit não oferece um gancho de inicialização do servidor). Enquanto o primeiro
+# professor faz login, as etapas abaixo rodam em paralelo e deixam prontos os recursos que, sem isso,
+# seriam inicializados pela primeira requisição. A falha de uma etapa fica registrada no resumo e não
+# impede as demais (nem a aplicação, que inicializa o recurso sob demanda como antes).
+
+HABILITADO = os.environ.get("INCLUIA_AQUECIMENTO", "1") != "0"
+CONEXOES_SUPABASE = int(os.environ.get("INCLUIA_AQUECIMENTO_CONEXOES", 2))
+
+logger = logging.getLogger(__name__)
+
+_pronto = threading.Event()
+_lock = threading.Lock()
+_iniciado = False
+_etapas = {}
+_tempos = {"inicio": None, "fim": None}
+
+
+def _pdf_minimo():
+    """PDF de uma página com texto e uma figura colorida, para exercitar a análise e a codificação."""
+    import fitz
+
+    with fitz.open() as doc:
+        pagina = doc.new_page(width=200, height=200)
+        pagina.insert_text((20, 40), "Questão 1. Aquecimento da IncluIA.", fontsize=9)
+        pagina.draw_rect(fitz.Rect(20, 60, 180, 180), color=(0.2, 0.4, 0.8), fill=(0.9, 0.6, 0.2))
+        return doc.tobytes()
+
+
+def _aquecer_pymupdf():
+    import conversion_utils
+
+    conversion_utils.converter_pdf_em_paginas(_pdf_minimo(), dpi=150, usar_camada_texto=False, workers=1)
+
+
+def _aquecer_pool_renderizacao():
+    import conversion_utils
+
+    if conversion_utils.RENDER_WORKERS <= 1:
+        return
+    # Uma única conversão: com 'spawn' o pool sobe os processos sob demanda, então só um worker é
+    # criado (com o PyMuPDF e o PIL carregados); os demais nascem quando um documento grande precisar
+    pdf = _pdf_minimo()
+    conversion_utils.obter_pool_processos().submit(conversion_utils._converter_paginas, pdf, [0], 150, False).result()
+
+
+def _aquecer_libreoffice():
+    import libreoffice_pool
+
+    libreoffice_pool.obter_pool().iniciar()
+
+
+def _aquecer_gemini():
+    # Os clientes dependem da chave de cada professor; o custo compartilhado é a importação dos SDKs
+    import google.generativeai  # noqa: F401
+    from google.genai import types  # noqa: F401
+
+
+def _aquecer_supabase():
+    import streamlit as st
+    import supabase_pool
+
+    try:
+        url, key = st.secrets["supabase_url"], st.secrets["supabase_key"]
+    except (KeyError, FileNotFoundError):
+        raise RuntimeError("Credenciais Supabase não configuradas.")
+    supabase_pool.aquecer(url, key, CONEXOES_SUPABASE)
+
+
+ETAPAS = {
+    "libreoffice": _aquecer_libreoffice,
+    "pymupdf": _aquecer_pymupdf,
+    "pool_renderizacao": _aquecer_pool_renderizacao,
+    "gemini": _aquecer_gemini,
+    "supabase": _aquecer_supabase,
+}
+
+
+def _executar_etapa(nome, funcao):
+    inicio = time.perf_counter()
+    erro = None
+    try:
+        funcao()
+    except Exception as e:
+        erro = f"{type(e).__name__}: {e}"
+        logger.warning("Aquecimento: etapa %s falhou (%s)", nome, erro)
+    with _lock:
+        _etapas[nome] = {"duracao_s": round(time.perf_counter() - inicio, 3), "erro": erro}
+
+
+def aquecer():
+    """Executa todas as etapas em paralelo e bloqueia até o fim. Chamado uma vez por processo."""
+    _tempos["inicio"] = time.perf_counter()
+    tarefas = [
+        threading.Thread(target=_executar_etapa, args=(nome, funcao), name=f"aquecimento-{nome}", daemon=True)
+        for nome, funcao in ETAPAS.items()
+    ]
+    for tarefa in tarefas:
+        tarefa.start()
+    for tarefa in tarefas:
+        tarefa.join()
+    _tempos["fim"] = time.perf_counter()
+    _pronto.set()
+    logger.info("Aquecimento concluído: %s", resumo())
+
+
+def iniciar():
+    """Dispara o aquecimento em segundo plano na primeira chamada do processo; as demais não fazem nada."""
+    global _iniciado
+    with _lock:
+        if _iniciado or not HABILITADO:
+            return
+        _iniciado = True
+    threading.Thread(target=aquecer, name="aquecimento", daemon=True).start()
+
+
+def pronto():
+    """Indica se o aquecimento terminou (com ou sem falhas em alguma etapa)."""
+    return _pronto.is_set()
+
+
+def aguardar(timeout=None):
+    """Espera o fim do aquecimento; retorna False se o tempo acabar antes."""
+    return _pronto.wait(timeout)
+
+
+def resumo():
+    """Estado do aquecimento, duração total e duração (e erro, se houver) de cada etapa."""
+    with _lock:
+        etapas = {nome: dict(dados) for nome, dados in _etapas.items()}
+    inicio, fim = _tempos["inicio"], _tempos["fim"]
+    return {
+        "pronto": pronto(),
+        "total_s": round(fim - inicio, 3) if inicio and fim else None,
+        "etapas": etapas,
+    }
+
+
+if __name__ == "__main__":
+    # Mede o aquecimento em um processo novo: python aquecimento.py
+    aquecer()
+    for nome, dados in resumo()["etapas"].items():
+        print(f"{nome:<20}{dados['duracao_s'] * 1000:9.1f} ms  {dados['erro'] or 'ok'}")
+    print(f"{'total':<20}{resumo()['total_s'] * 1000:9.1f} ms")
@@ -1,12 +1,189 @@
 import streamlit as st
-from supabase import create_client, Client
-import google.generativeai as genai
+import collections
+import os
 import re
+import threading
+import time
+
+import api_key_cache
+import supabase_pool
+
+# --- CACHE DE PERFIS ---
+# Perfis (username e chave da API) compartilhados entre as abas e páginas de um mesmo usuário no
+# processo do servidor. As atualizações feitas pela aplicação são gravadas no banco e no cache,
+# dispensando a consulta de confirmação.
+
+TTL_PERFIL_S = float(os.environ.get("INCLUIA_PERFIL_TTL_S", 300))
+
+_perfis = {}
+_perfis_lock = threading.Lock()
+_estatisticas_perfis = {"consultas_bd": 0, "consultas_evitadas": 0}
+
+
+def obter_perfil(supabase, user_id, atual=None):
+    """
+    Retorna o perfil do usuário: do cache, se recente; senão o `atual` da sessão, se houver; senão do banco.
+    Levanta a exceção do Supabase se o perfil não existir.
+    """
+    with _perfis_lock:
+        item = _perfis.get(user_id)
+        if item is not None and time.monotonic() - item[1] < TTL_PERFIL_S:
+            if atual is None:
+                _estatisticas_perfis["consultas_evitadas"] += 1
+            return dict(item[0])
+    if atual is not None:
+        return atual
+
+    res = supabase.table('profiles').select('username, gemini_api_key').eq('id', user_id).single().execute()
+    with _perfis_lock:
+        _estatisticas_perfis["consultas_bd"] += 1
+        _perfis[user_id] = (res.data, time.monotonic())
+    return dict(res.data)
+
+
+def atualizar_perfil(supabase, user_id, campos, perfil_atual):
+    """
+    Grava `campos` no banco e no cache (write-through) e retorna o perfil atualizado. Se o nome de
+    usuário mudar, o antigo sai do cache de e-mails do login (deixa de entrar e fica livre para cadastro).
+    """
+    supabase.table('profiles').update(campos).eq('id', user_id).execute()
+    username_antigo = (perfil_atual or {}).get('username')
+    if 'username' in campos and username_antigo and username_antigo != campos['username']:
+        _descartar_email(username_antigo)
+    perfil = dict(perfil_atual or {}, **campos)
+    agora = time.monotonic()
+    with _perfis_lock:
+        _estatisticas_perfis["consultas_evitadas"] += 1
+        _perfis[user_id] = (perfil, agora)
+        for chave, (_, guardado_em) in list(_perfis.items()):
+            if agora - guardado_em >= TTL_PERFIL_S:
+                del _perfis[chave]
+    return dict(perfil)
+
+
+def resumo_perfis():
+    """Consultas de perfil feitas ao banco e consultas evitadas pelo cache."""
+    with _perfis_lock:
+        return dict(_estatisticas_perfis, perfis=len(_perfis))
+
+
+# --- LOGIN POR NOME DE USUÁRIO ---
+# Com a Edge Function `login-usuario` publicada (supabase/functions/login-usuario) e o secret
+# `funcao_login_usuario`, o nome de usuário é resolvido e a senha verificada em uma única chamada;
+# a sessão é montada a partir da resposta do /token que a função repassa, sem outra ida ao Auth.
+# Sem ela, o e-mail vem da RPC `get_email_by_username`. Em ambos os casos o e-mail fica em um cache
+# local, e os logins seguintes do mesmo usuário vão direto ao sign_in_with_password.
+
+TTL_EMAIL_USUARIO_S = float(os.environ.get("INCLUIA_LOGIN_CACHE_TTL_S", 3600))
+
+_emails_por_usuario = {}
+_emails_lock = threading.Lock()
+_estatisticas_login = {"logins": 0, "chamadas_servidor": 0, "acertos_cache": 0}
+_tempos_login = collections.deque(maxlen=200)
+
+
+class UsuarioNaoEncontrado(Exception):
+    """Nenhuma conta com o nome de usuário informado."""
+
+
+def _email_em_cache(username):
+    with _emails_lock:
+        item = _emails_por_usuario.get(username)
+        if item is not None and time.monotonic() - item[1] < TTL_EMAIL_USUARIO_S:
+            return item[0]
+        return None
+
+
+def _guardar_email(username, email):
+    if email:
+        with _emails_lock:
+            _emails_por_usuario[username] = (email, time.monotonic())
+
+
+def _descartar_email(username):
+    with _emails_lock:
+        _emails_por_usuario.pop(username, None)
+
+
+def _contar_login(chamadas, acerto_cache=False):
+    with _emails_lock:
+        _estatisticas_login["chamadas_servidor"] += chamadas
+        _estatisticas_login["acertos_cache"] += int(acerto_cache)
+
+
+def _entrar_pela_funcao(supabase, funcao, username, password):
+    """
+    Resolve o usuário e autentica na Edge Function, que devolve a resposta do /auth/v1/token. A sessão
+    é instalada no cliente como faz o sign_in_with_password com essa mesma resposta (o set_session
+    público conferiria o token no Auth, uma chamada a mais).
+    """
+    from supabase_auth.helpers import model_validate
+    from supabase_auth.types import AuthResponse, Session
+
+    try:
+        conteudo = supabase.functions.invoke(funcao, {"body": {"username": username, "password": password}})
+    except Exception as e:
+        if getattr(e, "status", None) == 404:
+            raise UsuarioNaoEncontrado(username) from e
+        raise
+    sessao = model_validate(Session, conteudo)
+    supabase.auth._save_session(sessao)
+    supabase.auth._notify_all_subscribers("SIGNED_IN", sessao)
+    return AuthResponse(user=sessao.user, session=sessao)
+
+
+def entrar(supabase, identifier, password, funcao_login=None):
+    """Faz o login por e-mail ou nome de usuário, com o menor número de chamadas ao Supabase."""
+    inicio = time.perf_counter()
+    try:
+        if '@' in identifier:
+            _contar_login(1)
+            return supabase.auth.sign_in_with_password({"email": identifier, "password": password})
+
+        email = _email_em_cache(identifier)
+        if email:
+            _contar_login(1, acerto_cache=True)
+            try:
+                return supabase.auth.sign_in_with_password({"email": email, "password": password})
+            except Exception:
+                _descartar_email(identifier)  # O e-mail da conta pode ter mudado; a próxima tentativa consulta de novo
+                raise
+
+        if funcao_login:
+            _contar_login(1)
+            resp = _entrar_pela_funcao(supabase, funcao_login, identifier, password)
+        else:
+            _contar_login(2)
+            response = supabase.rpc('get_email_by_username', {'p_username': identifier}).execute()
+            if not response.data:
+                raise UsuarioNaoEncontrado(identifier)
+            resp = supabase.auth.sign_in_with_password({"email": response.data, "password": password})
+        if resp.user:
+            _guardar_email(identifier, resp.user.email)
+        return resp
+    finally:
+        duracao = time.perf_counter() - inicio
+        with _emails_lock:
+            _estatisticas_login["logins"] += 1
+            _tempos_login.append(duracao)
+
+
+def resumo_login():
+    """Logins, chamadas ao servidor, acertos do cache de e-mails e mediana do tempo de login (s)."""
+    with _emails_lock:
+        tempos = sorted(_tempos_login)
+        dados = dict(_estatisticas_login)
+    dados["mediana_s"] = round(tempos[len(tempos) // 2], 3) if tempos else None
+    return dados
+
 
 # --- FUNÇÕES AUXILIARES ---
 
-def init_supabase_client() -> Client:
-    """Inicializa e retorna o cliente Supabase usando variáveis de ambiente."""
+def init_supabase_client():
+    """
+    Inicializa e retorna o cliente Supabase da sessão usando variáveis de ambiente.
+    O login fica isolado por sessão; as conexões HTTP são compartilhadas pelo servidor (supabase_pool).
+    """
     try:
         url = st.secrets["supabase_url"]
         key = st.secrets["supabase_key"]
@@ -17,7 +194,16 @@ def init_supabase_client() -> Client:
     if not url or not key:
         st.error("As credenciais SUPABASE_URL e SUPABASE_KEY estão vazias. Verifique seu arquivo .env ou as configurações de ambiente.")
         st.stop()
-    return create_client(url, key)
+    return supabase_pool.criar_cliente(url, key)
+
+def obter_cliente_supabase():
+    """
+    Cliente Supabase da sessão, criado na primeira vez em que é usado. A tela de login aparece
+    sem carregar o SDK, que só é importado quando um dos formulários é enviado.
+    """
+    if 'supabase_client' not in st.session_state:
+        st.session_state.supabase_client = init_supabase_client()
+    return st.session_state.supabase_client
 
 def show_api_key_form(error_message=None):
     """Mostra o formulário para inserir/atualizar a chave da API."""
@@ -47,18 +233,15 @@ def show_api_key_form(error_message=None):
                 return
 
             try:
-                genai.configure(api_key=submitted_key)
-                genai.list_models()  # Uma chamada leve para testar a autenticação
+                api_key_cache.validar_chave_api(submitted_key)
 
                 supabase = st.session_state.supabase_client
                 user_id = st.session_state.user.id
-                supabase.table('profiles').update({
-                    'gemini_api_key': submitted_key
-                }).eq('id', user_id).execute()
+                st.session_state.profile = atualizar_perfil(
+                    supabase, user_id, {'gemini_api_key': submitted_key}, st.session_state.get('profile')
+                )
 
                 st.success("Chave válida salva com sucesso! Recarregando...")
-                if 'profile' in st.session_state:
-                    del st.session_state['profile']
                 if 'api_key_validated' in st.session_state:
                     del st.session_state['api_key_validated']
                 st.rerun()
@@ -87,15 +270,19 @@ def show_set_username_form():
             supabase = st.session_state.supabase_client
             user_id = st.session_state.user.id
             try:
+                if _email_em_cache(username):  # Nome usado em um login recente neste servidor: já está em uso
+                    st.error("Este nome de usuário já está em uso. Por favor, escolha outro.")
+                    return
                 existing_user = supabase.table('profiles').select('id', count='exact').eq('username', username).execute()
                 if existing_user.count > 0:
                     st.error("Este nome de usuário já está em uso. Por favor, escolha outro.")
                     return
 
-                supabase.table('profiles').update({'username': username}).eq('id', user_id).execute()
+                st.session_state.profile = atualizar_perfil(
+                    supabase, user_id, {'username': username}, st.session_state.get('profile')
+                )
+                _guardar_email(username, st.session_state.user.email)
                 st.success("Nome de usuário salvo! Recarregando...")
-                if 'profile' in st.session_state:
-                    del st.session_state['profile']
                 st.rerun()
             except Exception as e:
                 st.error(f"Ocorreu um erro ao salvar o nome de usuário: {e}")
@@ -108,10 +295,6 @@ def authenticate_user():
     Gerencia a autenticação, criação de perfil e validação da chave da API.
     Retorna True se o usuário está totalmente autenticado e configurado.
     """
-    if 'supabase_client' not in st.session_state:
-        st.session_state.supabase_client = init_supabase_client()
-    supabase = st.session_state.supabase_client
-
     if 'user' not in st.session_state:
         st.title("🧩 Bem-vindo à IncluIA")
         st.write("Faça login ou crie sua conta para continuar.")
@@ -123,23 +306,15 @@ def authenticate_user():
                 password = st.text_input("Senha", type="password")
                 if st.form_submit_button("Login"):
                     try:
-                        login_email = identifier
-                        
-                        if '@' not in identifier:
-                            response = supabase.rpc('get_email_by_username', {'p_username': identifier}).execute()
-                            
-                            if response.data:
-                                login_email = response.data
-                            else:
-                                st.error("Nome de usuário não encontrado.")
-                                return None
-                        
-                        resp = supabase.auth.sign_in_with_password({"email": login_email, "password": password})
+                        resp = entrar(obter_cliente_supabase(), identifier, password, st.secrets.get("funcao_login_usuario"))
                         if resp.user:
                             st.session_state.user = resp.user
                             st.rerun()
                         else:
                             st.error("Ocorreu um erro inesperado durante o login.")
+                    except UsuarioNaoEncontrado:
+                        st.error("Nome de usuário não encontrado.")
+                        return None
                     except Exception as e:
                         st.error(f"Falha no login: Verifique suas credenciais. {e}")
 
@@ -158,6 +333,7 @@ def authenticate_user():
                         return
 
                     try:
+                        supabase = obter_cliente_supabase()
                         resp = supabase.auth.sign_up({"email": email, "password": password})
                         if resp.user:
                             user = resp.user
@@ -166,6 +342,7 @@ def authenticate_user():
                                 'email': user.email,
                                 'username': username
                             }).execute()
+                            _guardar_email(username, user.email)
                             st.session_state.user = user
                             st.success("Conta criada com sucesso! Faça o login ou verifique seu e-mail para confirmação, se necessário.")
                             st.rerun()
@@ -180,20 +357,20 @@ def authenticate_user():
                             st.error(f"Erro ao criar conta: {e}")
         return None
 
-    if 'profile' not in st.session_state:
-        try:
-            profile_res = supabase.table('profiles').select('username, gemini_api_key').eq('id', st.session_state.user.id).single().execute()
-            st.session_state.profile = profile_res.data
-        except Exception as e:
-            if "JSON object requested, but no row found" in str(e):
-                st.error("Seu perfil não foi encontrado. Por favor, faça logout e tente criar a conta novamente.")
-                supabase.auth.sign_out()
-                for key in list(st.session_state.keys()):
-                    del st.session_state[key]
-                st.rerun()
-            else:
-                st.error(f"Não foi possível buscar o perfil no banco de dados: {e}")
-            return None
+    supabase = obter_cliente_supabase()
+    try:
+        # Sem consulta ao banco se a sessão já tem o perfil; uma atualização feita em outra aba chega pelo cache
+        st.session_state.profile = obter_perfil(supabase, st.session_state.user.id, st.session_state.get('profile'))
+    except Exception as e:
+        if "JSON object requested, but no row found" in str(e):
+            st.error("Seu perfil não foi encontrado. Por favor, faça logout e tente criar a conta novamente.")
+            supabase.auth.sign_out()
+            for key in list(st.session_state.keys()):
+                del st.session_state[key]
+            st.rerun()
+        else:
+            st.error(f"Não foi possível buscar o perfil no banco de dados: {e}")
+        return None
 
     if not st.session_state.profile.get('username'):
         show_set_username_form()
@@ -216,8 +393,7 @@ def authenticate_user():
         return None
 
     try:
-        genai.configure(api_key=key_from_db)
-        genai.list_models()
+        api_key_cache.validar_chave_api(key_from_db)  # Só consulta a API se não houver verificação recente
         st.session_state.api_key_validated = True
         st.rerun()
     except Exception as e:
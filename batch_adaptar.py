@@ -0,0 +1,160 @@
+"""
+Adaptação em lote, sem interface, de uma pasta de avaliações (PDF/DOCX).
+
+Usa as mesmas funções de conversão, instrução de sistema e prompts da página de adaptação e
+grava um resultado por arquivo e NEE em JSONL. Ao executar de novo com o mesmo arquivo de saída,
+os itens já concluídos são pulados.
+
+Exemplo:
+    GEMINI_API_KEY=... python batch_adaptar.py avaliacoes/ --saida resultados.jsonl \\
+        --nee "Dislexia" --nee "Transtorno do Espectro Autista (TEA)" --concorrencia 4 --rpm 30
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import conversion_utils
+import libreoffice_pool
+import llm_utils
+from prompts import system_instruction_text, nee_details, montar_prompt_usuario
+
+MODELO_PADRAO = "gemini-2.5-flash"
+EXTENSOES = {".pdf", ".docx"}
+
+logger = logging.getLogger("batch_adaptar")
+
+
+def listar_arquivos(pasta):
+    """Lista os PDFs e DOCX da pasta (e subpastas), em ordem."""
+    arquivos = []
+    for raiz, _, nomes in os.walk(pasta):
+        for nome in nomes:
+            if os.path.splitext(nome)[1].lower() in EXTENSOES:
+                arquivos.append(os.path.join(raiz, nome))
+    return sorted(arquivos)
+
+
+def carregar_concluidos(caminho_saida):
+    """Lê o JSONL de saída e retorna as chaves (arquivo, sha256, nee) já adaptadas com sucesso."""
+    concluidos = set()
+    if not os.path.exists(caminho_saida):
+        return concluidos
+    with open(caminho_saida, encoding="utf-8") as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                continue  # Linha truncada por uma execução interrompida
+            if registro.get("status") == "ok":
+                concluidos.add((registro["arquivo"], registro["sha256"], registro["nee"]))
+    return concluidos
+
+
+def converter_arquivo(caminho, dados, usar_camada_texto):
+    """Converte o arquivo nas partes de conteúdo enviadas à IA."""
+    if caminho.lower().endswith(".docx"):
+        dados = libreoffice_pool.converter_docx_em_pdf(dados)
+    paginas = conversion_utils.converter_pdf_em_paginas(dados, usar_camada_texto=usar_camada_texto)
+    return conversion_utils.paginas_para_partes(paginas), len(paginas)
+
+
+def processar_arquivo(caminho, pasta, nees, args, concluidos, gravar):
+    """Converte um arquivo uma única vez e gera a adaptação de cada NEE pendente."""
+    with open(caminho, "rb") as f:
+        dados = f.read()
+    arquivo = os.path.relpath(caminho, pasta)
+    sha256 = hashlib.sha256(dados).hexdigest()
+    pendentes = [nee for nee in nees if (arquivo, sha256, nee) not in concluidos]
+    if not pendentes:
+        return
+
+    base = {"arquivo": arquivo, "sha256": sha256}
+    inicio = time.perf_counter()
+    try:
+        partes, num_paginas = converter_arquivo(caminho, dados, not args.sem_camada_texto)
+    except Exception as e:
+        for nee in pendentes:
+            gravar(dict(base, nee=nee, status="erro", erro=f"Conversão: {type(e).__name__}: {e}"))
+        return
+    tempo_conversao = time.perf_counter() - inicio
+
+    for nee in pendentes:
+        registro = dict(base, nee=nee, paginas=num_paginas, tempo_conversao_s=round(tempo_conversao, 3))
+        inicio = time.perf_counter()
+        try:
+            resposta = llm_utils.gerar_resposta(
+                args.api_key, args.modelo, system_instruction_text, partes, montar_prompt_usuario(nee, args.instrucoes)
+            )
+            adaptado, justificativas = llm_utils.dividir_resposta(resposta)
+            registro.update(status="ok" if resposta else "erro", adaptado=adaptado, justificativas=justificativas)
+            if not resposta:
+                registro["erro"] = "A IA não gerou uma resposta de texto."
+        except Exception as e:
+            registro.update(status="erro", erro=f"{type(e).__name__}: {e}")
+        registro["tempo_geracao_s"] = round(time.perf_counter() - inicio, 3)
+        gravar(registro)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adapta em lote uma pasta de avaliações (PDF/DOCX) com a IncluIA.")
+    parser.add_argument("pasta", help="Pasta com as avaliações (subpastas incluídas).")
+    parser.add_argument("--saida", default="resultados.jsonl", help="Arquivo JSONL de resultados (padrão: resultados.jsonl).")
+    parser.add_argument("--nee", action="append", choices=list(nee_details), help="NEE para adaptar (pode repetir; padrão: Não especificado).")
+    parser.add_argument("--instrucoes", default="", help="Instruções adicionais aplicadas a todas as adaptações.")
+    parser.add_argument("--modelo", default=MODELO_PADRAO, help=f"Modelo do Gemini (padrão: {MODELO_PADRAO}).")
+    parser.add_argument("--concorrencia", type=int, default=4, help="Arquivos processados ao mesmo tempo (padrão: 4).")
+    parser.add_argument("--rpm", type=float, default=llm_utils.LIMITE_RPM, help=f"Máximo de chamadas à IA por minuto (padrão: {llm_utils.LIMITE_RPM:g}).")
+    parser.add_argument("--tpm", type=float, default=llm_utils.LIMITE_TPM, help=f"Máximo de tokens enviados por minuto (padrão: {llm_utils.LIMITE_TPM:g}).")
+    parser.add_argument("--sem-camada-texto", action="store_true", help="Envia todas as páginas como imagem.")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"), help="Chave da API Gemini (padrão: $GEMINI_API_KEY).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(asctime)s %(message)s")
+    logger.setLevel(logging.INFO)
+
+    if not args.api_key:
+        parser.error("Informe a chave da API com --api-key ou pela variável GEMINI_API_KEY.")
+    import google.generativeai as genai
+    genai.configure(api_key=args.api_key)
+
+    nees = args.nee or ['Não especificado']
+    arquivos = listar_arquivos(args.pasta)
+    concluidos = carregar_concluidos(args.saida)
+    llm_utils.definir_limites(args.api_key, rpm=args.rpm, tpm=args.tpm)
+    logger.info("%d arquivo(s), %d NEE(s), %d item(ns) já concluído(s)", len(arquivos), len(nees), len(concluidos))
+
+    lock_saida = threading.Lock()
+    contagem = {"ok": 0, "erro": 0}
+    with open(args.saida, "a", encoding="utf-8") as saida:
+        def gravar(registro):
+            registro["concluido_em"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            with lock_saida:
+                saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                saida.flush()
+                contagem[registro["status"]] += 1
+            logger.info("[%s] %s / %s", registro["status"], registro["arquivo"], registro["nee"])
+
+        with ThreadPoolExecutor(max_workers=max(1, args.concorrencia)) as executor:
+            futuros = [
+                executor.submit(processar_arquivo, caminho, args.pasta, nees, args, concluidos, gravar)
+                for caminho in arquivos
+            ]
+            for futuro in as_completed(futuros):
+                futuro.result()
+
+    estatisticas = llm_utils.metricas()
+    logger.info(
+        "Concluído: %d adaptação(ões) com sucesso, %d com erro; %d retentativa(s), %.1f s de espera na fila",
+        contagem["ok"], contagem["erro"], estatisticas["retentativas"], estatisticas["espera_fila_s"],
+    )
+    return 1 if contagem["erro"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Substituto local do subconjunto da API REST do Gemini usado pela aplicação, para os benchmarks rodarem
+sem rede nem chave: criação, renovação e leitura de cachedContents e o generateContent (com ou sem
+streaming).
+
+Tokens de entrada: ~4 caracteres por token de texto; imagens em blocos de 258 tokens (como em
+conversion_utils.estimar_tokens_imagem); PDFs com 258 tokens por página mais o texto extraído. Cada
+chamada responde após uma latência base, o tempo de transferência do corpo na banda de envio indicada
+e um custo por mil tokens de entrada não cacheados (o pré-processamento do prompt). PDFs protegidos
+(com /Encrypt) são recusados com 400 INVALID_ARGUMENT, como faz o Gemini. GET /_estatisticas devolve
+requisições e bytes recebidos; POST /_perder_caches simula a perda dos caches no servidor.
+
+Em outro processo (para não misturar a CPU do substituto com a do cliente medido):
+    python benchmarks/api_substituta.py --latencia-base-ms 120 --ms-por-mil-tokens 40 --mbps 20
+Imprime a URL na primeira linha e atende até ser encerrado.
+"""
+import argparse
+import base64
+import datetime
+import http.server
+import io
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversion_utils import TOKENS_POR_BLOCO_IMAGEM, estimar_tokens_imagem  # noqa: E402
+
+MIN_TOKENS_CACHE = 1024  # Mínimo de tokens de um conteúdo em cache (Gemini 2.5 Flash)
+RESPOSTA = "Texto adaptado.\n# Justificativas:\nOk."
+
+
+def _tokens_imagem(dados):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(dados)) as img:
+        return estimar_tokens_imagem(*img.size)
+
+
+def _tokens_pdf(dados):
+    import fitz
+
+    with fitz.open(stream=dados, filetype="pdf") as doc:
+        return sum(TOKENS_POR_BLOCO_IMAGEM + len(page.get_text("text")) // 4 for page in doc)
+
+
+def _mime(dados):
+    # O google.genai envia `mime_type` e o google.generativeai, `mimeType`; a API aceita os dois
+    return dados.get("mimeType") or dados.get("mime_type")
+
+
+def _dados(dados):
+    # O google.genai codifica em base64 para URLs e sem o preenchimento final
+    texto = dados["data"]
+    return base64.urlsafe_b64decode(texto.replace("+", "-").replace("/", "_") + "=" * (-len(texto) % 4))
+
+
+def _tokens(conteudos):
+    total = 0
+    for conteudo in conteudos or []:
+        for parte in conteudo.get("parts", []):
+            if "text" in parte:
+                total += len(parte["text"]) // 4
+            elif "inlineData" in parte:
+                dados = _dados(parte["inlineData"])
+                if _mime(parte["inlineData"]) == "application/pdf":
+                    total += _tokens_pdf(dados)
+                else:
+                    total += _tokens_imagem(dados)
+            else:
+                total += TOKENS_POR_BLOCO_IMAGEM
+    return total
+
+
+def _pdf_protegido(conteudos):
+    for conteudo in conteudos or []:
+        for parte in conteudo.get("parts", []):
+            dados = parte.get("inlineData", {})
+            if _mime(dados) == "application/pdf" and b"/Encrypt" in _dados(dados):
+                return True
+    return False
+
+
+class ApiSubstituta(http.server.ThreadingHTTPServer):
+    """Servidor local com o subconjunto da API REST do Gemini usado pela aplicação."""
+
+    daemon_threads = True
+
+    def __init__(self, latencia_base_s, s_por_token, bytes_por_s=None):
+        super().__init__(("127.0.0.1", 0), _Tratador)
+        self.latencia_base_s = latencia_base_s
+        self.s_por_token = s_por_token
+        self.bytes_por_s = bytes_por_s
+        self.caches = {}
+        self.contador = itertools.count(1)
+        self.lock = threading.Lock()
+        self.estatisticas = {"requisicoes": 0, "bytes_recebidos": 0}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def perder_caches(self):
+        with self.lock:
+            self.caches.clear()
+
+
+def _candidato(texto, fim=None):
+    candidato = {"content": {"role": "model", "parts": [{"text": texto}]}, "index": 0}
+    if fim:
+        candidato["finishReason"] = fim
+    return candidato
+
+
+class _Tratador(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        dados = self.rfile.read(tamanho)
+        servidor = self.server
+        with servidor.lock:
+            servidor.estatisticas["requisicoes"] += 1
+            servidor.estatisticas["bytes_recebidos"] += tamanho
+        if servidor.bytes_por_s:
+            time.sleep(tamanho / servidor.bytes_por_s)
+        return json.loads(dados or b"{}")
+
+    def _erro(self, status, mensagem, estado):
+        self._responder(status, {"error": {"code": status, "message": mensagem, "status": estado}})
+
+    @staticmethod
+    def _expiracao(ttl):
+        segundos = float(str(ttl).rstrip("s"))
+        return (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=segundos)).isoformat()
+
+    def _cache_json(self, nome, cache):
+        return {
+            "name": nome, "model": cache["model"], "expireTime": cache["expireTime"],
+            "usageMetadata": {"totalTokenCount": cache["tokens"]},
+        }
+
+    def do_POST(self):
+        caminho = self.path.split("?")[0]
+        servidor = self.server
+        if caminho == "/_perder_caches":
+            servidor.perder_caches()
+            return self._responder(200, {})
+        corpo = self._corpo()
+        if caminho.endswith("/cachedContents"):
+            tokens = _tokens(corpo.get("contents")) + _tokens([corpo.get("systemInstruction") or {}])
+            if tokens < MIN_TOKENS_CACHE:
+                return self._erro(400, f"Cached content is too small. total_token_count={tokens}", "INVALID_ARGUMENT")
+            nome = f"cachedContents/{next(servidor.contador)}"
+            with servidor.lock:
+                servidor.caches[nome] = {
+                    "model": corpo["model"], "tokens": tokens, "expireTime": self._expiracao(corpo.get("ttl", "3600s")),
+                }
+                return self._responder(200, self._cache_json(nome, servidor.caches[nome]))
+
+        correspondencia = re.search(r"/models/([^/:]+):(generateContent|streamGenerateContent)$", caminho)
+        if not correspondencia:
+            return self._erro(404, f"Caminho desconhecido: {caminho}", "NOT_FOUND")
+        if _pdf_protegido(corpo.get("contents")):
+            return self._erro(400, "The document has no pages.", "INVALID_ARGUMENT")
+        em_cache = 0
+        if corpo.get("cachedContent"):
+            with servidor.lock:
+                cache = servidor.caches.get(corpo["cachedContent"])
+            if cache is None:
+                return self._erro(403, "CachedContent not found (or permission denied)", "PERMISSION_DENIED")
+            em_cache = cache["tokens"]
+        novos = _tokens(corpo.get("contents")) + _tokens([corpo.get("systemInstruction") or {}])
+        time.sleep(servidor.latencia_base_s + novos * servidor.s_por_token)
+        uso = {
+            "promptTokenCount": novos + em_cache, "cachedContentTokenCount": em_cache,
+            "candidatesTokenCount": 10, "totalTokenCount": novos + em_cache + 10,
+        }
+        if correspondencia.group(2) == "generateContent":
+            return self._responder(200, {"candidates": [_candidato(RESPOSTA, "STOP")], "usageMetadata": uso})
+        # Streaming (alt=sse): a resposta em dois pedaços, o segundo com o fim e o uso de tokens
+        metade = len(RESPOSTA) // 2
+        pedacos = [
+            {"candidates": [_candidato(RESPOSTA[:metade])]},
+            {"candidates": [_candidato(RESPOSTA[metade:], "STOP")], "usageMetadata": uso},
+        ]
+        dados = "".join(f"data: {json.dumps(pedaco)}\r\n\r\n" for pedaco in pedacos).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_PATCH(self):
+        nome = re.search(r"(cachedContents/[^?]+)", self.path).group(1)
+        corpo = self._corpo()
+        with self.server.lock:
+            cache = self.server.caches.get(nome)
+            if cache is None:
+                return self._erro(404, "CachedContent not found", "NOT_FOUND")
+            cache["expireTime"] = self._expiracao(corpo.get("ttl", "3600s"))
+            return self._responder(200, self._cache_json(nome, cache))
+
+    def do_GET(self):
+        if self.path == "/_estatisticas":
+            with self.server.lock:
+                return self._responder(200, dict(self.server.estatisticas))
+        nome = re.search(r"(cachedContents/[^?]+)", self.path)
+        with self.server.lock:
+            cache = self.server.caches.get(nome.group(1)) if nome else None
+        if cache is None:
+            return self._erro(404, "CachedContent not found", "NOT_FOUND")
+        self._responder(200, self._cache_json(nome.group(1), cache))
+
+
+def estatisticas(url):
+    """Requisições e bytes recebidos pelo substituto até agora."""
+    with urllib.request.urlopen(f"{url}/_estatisticas") as resposta:
+        return json.loads(resposta.read())
+
+
+def iniciar_processo(latencia_base_ms, ms_por_mil_tokens, mbps=0):
+    """Sobe o substituto em outro processo; retorna (processo, url)."""
+    processo = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--latencia-base-ms", str(latencia_base_ms),
+         "--ms-por-mil-tokens", str(ms_por_mil_tokens), "--mbps", str(mbps)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    return processo, processo.stdout.readline().strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia-base-ms", type=float, default=120, help="Latência fixa por chamada.")
+    parser.add_argument("--ms-por-mil-tokens", type=float, default=40, help="Custo de mil tokens de entrada não cacheados.")
+    parser.add_argument("--mbps", type=float, default=0, help="Banda de envio simulada (0: sem limite).")
+    args = parser.parse_args(argv)
+
+    api = ApiSubstituta(args.latencia_base_ms / 1000, args.ms_por_mil_tokens / 1e6, args.mbps * 1e6 / 8 or None)
+    print(api.url, flush=True)
+    api.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
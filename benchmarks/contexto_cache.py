@@ -0,0 +1,107 @@
+"""
+Mede o cache de contexto das instruções de sistema (context_cache) contra um substituto local da API
+do Gemini, sem rede nem chave: tokens de entrada cobrados sem desconto e latência por chamada, com a
+instrução inline e em cache, nas duas interfaces usadas pela aplicação (a do google.generativeai, sobre o
+cliente google.genai da chave, e a do google.genai).
+
+O substituto (api_substituta.py) implementa, em REST, a criação, renovação e leitura de cachedContents
+e o generateContent. Ele conta ~4 caracteres por token e responde após uma latência base mais um custo
+por mil tokens de entrada não cacheados (o pré-processamento do prompt), ambos configuráveis. Também
+simula a perda do cache no servidor, para exercitar a volta ao envio inline.
+
+Uso:
+    python benchmarks/contexto_cache.py
+    python benchmarks/contexto_cache.py --chamadas 50 --latencia-base-ms 150 --ms-por-mil-tokens 60
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import context_cache  # noqa: E402
+from api_substituta import ApiSubstituta  # noqa: E402
+from prompts import montar_prompt_usuario, system_instruction_text  # noqa: E402
+
+MODELO = "gemini-2.5-flash"
+
+QUESTOES = "\n".join(
+    f"Questão {i}. Leia o texto sobre o ciclo da água e explique, com suas palavras, o que acontece com a "
+    f"água dos rios quando a temperatura aumenta. Depois, assinale a alternativa correta.\n"
+    f"a) A água evapora.\nb) A água congela.\nc) A água desaparece.\nd) Nenhuma das anteriores."
+    for i in range(1, 6)
+)
+
+
+def _uso(resposta):
+    uso = resposta.usage_metadata
+    return uso.prompt_token_count - (uso.cached_content_token_count or 0), uso.cached_content_token_count or 0
+
+
+def _executar(gerar, chamadas, perder_em, api):
+    latencias, cobrados, em_cache = [], 0, 0
+    for i in range(chamadas):
+        if i == perder_em:
+            api.perder_caches()
+        inicio = time.perf_counter()
+        novos, cacheados = _uso(gerar())
+        latencias.append(time.perf_counter() - inicio)
+        cobrados += novos
+        em_cache += cacheados
+    return latencias, cobrados, em_cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chamadas", type=int, default=30, help="Chamadas por cenário (padrão: 30).")
+    parser.add_argument("--latencia-base-ms", type=float, default=120, help="Latência fixa do substituto.")
+    parser.add_argument("--ms-por-mil-tokens", type=float, default=40, help="Custo de mil tokens de entrada não cacheados.")
+    args = parser.parse_args(argv)
+
+    api = ApiSubstituta(args.latencia_base_ms / 1000, args.ms_por_mil_tokens / 1e6)
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+
+    from google import genai
+    from google.genai import types
+
+    chave = "chave-local"
+    cliente = genai.Client(api_key=chave, http_options=types.HttpOptions(base_url=api.url))
+    partes = [QUESTOES, montar_prompt_usuario("Dislexia", "")]
+
+    def chamar_antigo(model, conteudo):
+        return model.generate_content(conteudo)
+
+    def chamar_novo(conteudo, config):
+        return cliente.models.generate_content(model=MODELO, contents=conteudo, config=config)
+
+    cenarios = {
+        "google.generativeai": lambda: context_cache.gerar_com_instrucao(
+            chave, MODELO, system_instruction_text, partes, chamar_antigo, client=cliente),
+        "google.genai": lambda: context_cache.gerar_com_instrucao_genai(
+            cliente, chave, MODELO, system_instruction_text, partes, chamar_novo),
+    }
+
+    print(f"Instrução: {len(system_instruction_text)} caracteres; {args.chamadas} chamadas por cenário; "
+          f"o servidor perde os caches na metade do cenário com cache.\n")
+    print(f"{'Cenário':<34}{'Mediana':>10}{'p95':>10}{'Tokens cobrados':>18}{'Em cache':>11}")
+    for sdk, gerar in cenarios.items():
+        resultados = {}
+        for modo in ("inline", "cache"):
+            context_cache.HABILITADO = modo == "cache"
+            context_cache._registro = None
+            perder_em = args.chamadas // 2 if modo == "cache" else -1
+            resultados[modo] = _executar(gerar, args.chamadas, perder_em, api)
+            latencias, cobrados, em_cache = resultados[modo]
+            p95 = sorted(latencias)[int(0.95 * (len(latencias) - 1))]
+            print(f"{sdk + ' (' + modo + ')':<34}{statistics.median(latencias) * 1000:>7.0f} ms{p95 * 1000:>7.0f} ms"
+                  f"{cobrados:>18}{em_cache:>11}")
+        economia = 1 - resultados["cache"][1] / resultados["inline"][1]
+        print(f"  economia de tokens de entrada sem desconto: {economia:.0%}; registro: {context_cache.resumo()}\n")
+    api.shutdown()
+
+
+if __name__ == "__main__":
+    main()
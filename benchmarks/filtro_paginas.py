@@ -0,0 +1,89 @@
+"""
+Casos de regressão do filtro de páginas em branco e repetidas (conversion_utils.filtrar_paginas), com
+uma prova digitalizada sintética (cada página renderizada em 150 DPI e inserida como imagem):
+
+    questão 1 com outra conta e outro enunciado  -> enviada (nunca descartada)
+    questões renumeradas (6 a 10)               -> enviada
+    só o número no rodapé diferente             -> enviada
+    a mesma imagem de uma página anterior       -> descartada ("repete a página N")
+    verso em branco                             -> descartada ("página em branco")
+
+Mostra a decisão de cada página e o tempo do filtro; sai com código 1 se alguma decisão divergir.
+
+Uso:
+    python benchmarks/filtro_paginas.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import conversion_utils  # noqa: E402
+
+QUESTAO = "Questão {n}. Calcule {conta} e explique como você chegou ao resultado."
+
+
+def _pagina_digitalizada(doc, questoes, rodape, dpi=150):
+    import fitz
+
+    original = fitz.open()
+    pagina = original.new_page()
+    if questoes:
+        pagina.insert_textbox(fitz.Rect(50, 50, 545, 700), "\n\n".join(questoes), fontsize=12)
+        pagina.insert_text((280, 810), rodape, fontsize=10)
+    imagem = pagina.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("jpeg", jpg_quality=85)
+    nova = doc.new_page(width=pagina.rect.width, height=pagina.rect.height)
+    nova.insert_image(nova.rect, stream=imagem)
+    return imagem
+
+
+def _prova():
+    """PDF da prova e as decisões esperadas (modo e motivo, ou None quando a página é enviada)."""
+    import fitz
+
+    base = [QUESTAO.format(n=n, conta=f"{10 + n} + {30 + n}") for n in range(1, 6)]
+    alterada = ["Questão 1. Calcule 23 + 48 e explique."] + base[1:]
+    renumerada = [QUESTAO.format(n=n, conta=f"{5 + n} + {25 + n}") for n in range(6, 11)]
+
+    doc = fitz.open()
+    casos = []
+    imagem_base = _pagina_digitalizada(doc, base, "Página 1")
+    casos.append(("original", None))
+    _pagina_digitalizada(doc, alterada, "Página 1")
+    casos.append(("questão 1 com outro enunciado", None))
+    _pagina_digitalizada(doc, renumerada, "Página 1")
+    casos.append(("questões renumeradas", None))
+    _pagina_digitalizada(doc, base, "Página 4")
+    casos.append(("só o rodapé diferente", None))
+    copia = doc.new_page()
+    copia.insert_image(copia.rect, stream=imagem_base)
+    casos.append(("cópia exata da página 1", "repete a página 1"))
+    _pagina_digitalizada(doc, [], "")
+    casos.append(("verso em branco", "página em branco"))
+    return doc.tobytes(), casos
+
+
+def main():
+    pdf_bytes, casos = _prova()
+    inicio = time.perf_counter()
+    paginas = conversion_utils.converter_pdf_em_paginas(pdf_bytes, workers=1, adaptativo=False)
+    duracao = time.perf_counter() - inicio
+
+    falhas = 0
+    print(f"{'Página':<8}{'Caso':<34}{'Decisão':<34}{'Esperado'}")
+    for pagina, (caso, esperado) in zip(paginas, casos):
+        decisao = pagina["motivo"] if pagina["modo"] == "descartada" else None
+        if "parecida_com" in pagina:
+            rotulo = f"enviada (parecida com a {pagina['parecida_com']})"
+        else:
+            rotulo = decisao or "enviada"
+        ok = decisao == esperado
+        falhas += not ok
+        print(f"{pagina['pagina']:<8}{caso:<34}{rotulo:<34}{esperado or 'enviada'}{'' if ok else '  <-- DIVERGENTE'}")
+    print(f"\n{len(paginas)} página(s) convertidas e filtradas em {duracao:.2f} s; {falhas} divergência(s).")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
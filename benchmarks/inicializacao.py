@@ -0,0 +1,121 @@
+"""
+Relatório de inicialização das páginas da IncluIA em um worker frio, comparado a um orçamento.
+
+Cada medição roda em um interpretador novo, com o Streamlit já importado (como no servidor):
+- importações do topo do script, com o tempo de cada módulo (python -X importtime);
+- primeira tela: execução completa do script para uma sessão sem login (tela de login), com o AppTest.
+Também lista os SDKs pesados que foram carregados até a primeira tela (o esperado é nenhum). O
+aquecimento do servidor (aquecimento.py) fica desligado, pois carrega esses SDKs em segundo plano;
+com --com-aquecimento, mede a primeira tela disputando o processo com ele.
+Sai com código 1 se a primeira tela de alguma página passar do orçamento.
+
+Uso:
+    python benchmarks/inicializacao.py                              # orçamento de INCLUIA_ORCAMENTO_INICIO_S (1 s)
+    python benchmarks/inicializacao.py --orcamento 0.5 --repeticoes 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINAS = ["IncluIA.py", os.path.join("pages", "Gerador de Imagens.py")]
+ORCAMENTO_S = float(os.environ.get("INCLUIA_ORCAMENTO_INICIO_S", 1.0))
+
+# Módulos que só devem ser importados nos caminhos que os usam (geração, upload, login enviado)
+PESADOS = ["google.generativeai", "google.genai", "supabase", "httpx", "fitz", "PIL", "docx", "docx2pdf", "textstat"]
+
+MARCADOR = "-- inicio das importacoes --"
+
+# Executado em um processo novo; argumentos: modo ("importacoes" ou "tela") e caminho da página
+_FILHO = f"""
+import ast, json, sys, time
+sys.path.insert(0, {RAIZ!r})
+import streamlit
+from streamlit.testing.v1 import AppTest
+modo, pagina = sys.argv[1], sys.argv[2]
+sys.stderr.write({MARCADOR!r} + "\\n")
+sys.stderr.flush()
+inicio = time.perf_counter()
+if modo == "importacoes":
+    arvore = ast.parse(open(pagina, encoding="utf-8").read())
+    topo = [n for n in arvore.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    exec(compile(ast.Module(body=topo, type_ignores=[]), pagina, "exec"), {{}})
+else:
+    AppTest.from_file(pagina, default_timeout=60).run()
+duracao = time.perf_counter() - inicio
+pesados = [m for m in {PESADOS!r} if m in sys.modules]
+print(json.dumps({{"duracao": duracao, "pesados": pesados}}))
+"""
+
+
+def _executar(modo, pagina, importtime=False, aquecimento=False):
+    comando = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _FILHO, modo, pagina]
+    ambiente = dict(os.environ, INCLUIA_AQUECIMENTO="1" if aquecimento else "0")
+    proc = subprocess.run(comando, cwd=RAIZ, env=ambiente, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def _modulos_diretos(stderr):
+    """Tempo acumulado (s) de cada módulo importado diretamente pelo topo do script."""
+    tempos = {}
+    linhas = stderr.split(MARCADOR, 1)[-1].splitlines()
+    for linha in linhas:
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, acumulado, nome = linha.split("|", 2)
+        if not acumulado.strip().isdigit():
+            continue  # Cabeçalho
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        if nivel == 0:
+            tempos[nome.strip()] = int(acumulado) / 1e6
+    return tempos
+
+
+def medir_pagina(pagina, repeticoes, aquecimento=False):
+    importacoes, primeira_tela, por_modulo, pesados = [], [], {}, set()
+    for _ in range(repeticoes):
+        resultado, stderr = _executar("importacoes", pagina, importtime=True)
+        importacoes.append(resultado["duracao"])
+        for modulo, tempo in _modulos_diretos(stderr).items():
+            por_modulo.setdefault(modulo, []).append(tempo)
+        resultado, _ = _executar("tela", pagina, aquecimento=aquecimento)
+        primeira_tela.append(resultado["duracao"])
+        pesados.update(resultado["pesados"])
+    return {
+        "importacoes_s": statistics.median(importacoes),
+        "primeira_tela_s": statistics.median(primeira_tela),
+        "modulos": sorted(((m, statistics.median(t)) for m, t in por_modulo.items()), key=lambda x: -x[1]),
+        "pesados": sorted(pesados),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paginas", nargs="*", default=PAGINAS, help="Scripts a medir (padrão: as duas páginas).")
+    parser.add_argument("--orcamento", type=float, default=ORCAMENTO_S, help="Orçamento da primeira tela, em segundos.")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Processos novos por medição (mediana).")
+    parser.add_argument("--modulos", type=int, default=10, help="Módulos mais lentos listados por página.")
+    parser.add_argument("--com-aquecimento", action="store_true", help="Mantém o aquecimento do servidor ligado.")
+    args = parser.parse_args(argv)
+
+    dentro_do_orcamento = True
+    for pagina in args.paginas:
+        r = medir_pagina(pagina, args.repeticoes, args.com_aquecimento)
+        ok = r["primeira_tela_s"] <= args.orcamento
+        dentro_do_orcamento &= ok
+        print(f"{pagina}")
+        print(f"  Importações do topo:  {r['importacoes_s'] * 1000:8.1f} ms")
+        print(f"  Primeira tela:        {r['primeira_tela_s'] * 1000:8.1f} ms "
+              f"({'dentro' if ok else 'ACIMA'} do orçamento de {args.orcamento * 1000:.0f} ms)")
+        print(f"  SDKs pesados carregados: {', '.join(r['pesados']) or 'nenhum'}")
+        for modulo, tempo in r["modulos"][:args.modulos]:
+            print(f"    {modulo:<40}{tempo * 1000:8.1f} ms")
+        print()
+    return 0 if dentro_do_orcamento else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Compara o motor de legibilidade em português (legibilidade_pt) com o textstat.
+
+Mede o tempo das três métricas (Flesch, Flesch-Kincaid e SMOG) em avaliações de 10 mil palavras ou
+mais, com o cache de sílabas vazio (primeira avaliação) e já preenchido, e a taxa de acerto na
+contagem de sílabas de palavras com separação conhecida.
+
+Uso:
+    python benchmarks/legibilidade.py                      # corpus sintético
+    python benchmarks/legibilidade.py provas/*.txt         # avaliações próprias em texto
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import textstat  # noqa: E402
+
+import legibilidade_pt  # noqa: E402
+
+# Palavras com separação silábica conhecida (dicionário), incluindo ditongos, hiatos e encontros consonantais
+REFERENCIA_SILABAS = {
+    "avaliação": 5, "casa": 2, "carro": 2, "pássaro": 3, "queijo": 2, "guerra": 2, "poeta": 3, "saúde": 3,
+    "país": 2, "rainha": 3, "cair": 2, "juiz": 2, "pai": 1, "couro": 2, "fui": 1, "pão": 1, "mães": 1,
+    "leão": 2, "compreender": 4, "obstáculo": 4, "advogado": 4, "palavra": 3, "abelha": 3, "chuva": 2,
+    "ninho": 2, "excesso": 3, "nascer": 2, "questão": 2, "aguentar": 3, "psicologia": 5, "atleta": 3,
+    "transporte": 3, "instrução": 3, "dia": 2, "história": 4, "água": 2, "ruim": 2, "coelho": 3,
+    "leitura": 3, "adaptação": 4, "estudante": 4, "matemática": 5, "ciência": 4, "geografia": 5,
+    "caderno": 3, "ainda": 3, "muito": 2, "oito": 2, "caiu": 2, "iguais": 2, "Paraguai": 3, "ruído": 3,
+    "construir": 3, "gratuito": 3, "fotossíntese": 5, "interpretação": 5, "alternativa": 5, "resposta": 3,
+    "explique": 3, "calcule": 3, "energia": 4, "sociedade": 5, "equação": 3, "frações": 2,
+}
+
+SUJEITOS = [
+    "O estudante", "A professora", "A turma do sexto ano", "O cientista", "A população da cidade",
+    "O agricultor", "A personagem principal", "O governo", "A água dos rios", "O sistema solar",
+]
+VERBOS = [
+    "observou", "explicou", "descreveu", "comparou", "analisou", "identificou", "registrou",
+    "interpretou", "calculou", "transformou",
+]
+COMPLEMENTOS = [
+    "as mudanças no ciclo da água durante o ano", "a importância da fotossíntese para os seres vivos",
+    "os efeitos da industrialização na sociedade brasileira", "a relação entre frações e números decimais",
+    "as características do texto narrativo lido em sala", "a distribuição da população nas regiões do país",
+    "o movimento de rotação e de translação da Terra", "as consequências ambientais do desmatamento",
+    "a resolução de uma equação do primeiro grau", "as etapas do método científico",
+]
+COMANDOS = [
+    "Explique com suas palavras", "Justifique sua resposta", "Assinale a alternativa correta",
+    "Calcule o resultado e mostre os cálculos", "Leia o texto e responda",
+]
+
+
+def gerar_avaliacao(num_palavras, semente):
+    """Avaliação sintética com enunciados, textos de apoio e alternativas, com pelo menos `num_palavras`."""
+    rnd = random.Random(semente)
+    partes, total, questao = [], 0, 1
+    while total < num_palavras:
+        paragrafo = " ".join(
+            f"{rnd.choice(SUJEITOS)} {rnd.choice(VERBOS)} {rnd.choice(COMPLEMENTOS)}." for _ in range(rnd.randint(2, 5))
+        )
+        alternativas = "\n".join(f"{letra}) {rnd.choice(COMPLEMENTOS)}." for letra in "abcd")
+        bloco = f"Questão {questao}.\n{paragrafo}\n{rnd.choice(COMANDOS)}.\n{alternativas}\n"
+        partes.append(bloco)
+        total += len(bloco.split())
+        questao += 1
+    return "\n".join(partes)
+
+
+def medir(funcao, textos):
+    tempos = []
+    for texto in textos:
+        inicio = time.perf_counter()
+        funcao(texto)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), sum(tempos)
+
+
+def metricas_textstat(texto):
+    return textstat.flesch_reading_ease(texto), textstat.flesch_kincaid_grade(texto), textstat.smog_index(texto)
+
+
+def acerto_silabas(contar):
+    acertos = sum(1 for palavra, silabas in REFERENCIA_SILABAS.items() if contar(palavra) == silabas)
+    return acertos / len(REFERENCIA_SILABAS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("arquivos", nargs="*", help="Arquivos .txt com avaliações (padrão: corpus sintético).")
+    parser.add_argument("--palavras", type=int, default=12000, help="Palavras por avaliação sintética (padrão: 12000).")
+    parser.add_argument("--avaliacoes", type=int, default=5, help="Avaliações sintéticas (padrão: 5).")
+    args = parser.parse_args(argv)
+
+    if args.arquivos:
+        textos = [open(caminho, encoding="utf-8").read() for caminho in args.arquivos]
+    else:
+        textos = [gerar_avaliacao(args.palavras, semente) for semente in range(args.avaliacoes)]
+    palavras = [len(texto.split()) for texto in textos]
+    print(f"Corpus: {len(textos)} avaliação(ões), {min(palavras)}-{max(palavras)} palavras cada\n")
+
+    resultados = []
+    for idioma in ("en", "pt"):
+        textstat.set_lang(idioma)
+        mediana, total = medir(metricas_textstat, textos)
+        resultados.append((f"textstat ({idioma})", mediana, total))
+    textstat.set_lang("en")
+
+    legibilidade_pt.separar_silabas.cache_clear()
+    legibilidade_pt.contar_silabas.cache_clear()
+    mediana, total = medir(legibilidade_pt.indices_legibilidade, textos)
+    resultados.append(("legibilidade_pt (cache vazio)", mediana, total))
+    # Textos novos com o mesmo vocabulário: só o cache de sílabas é reaproveitado
+    mediana, total = medir(legibilidade_pt.indices_legibilidade, [texto + " " for texto in textos])
+    resultados.append(("legibilidade_pt (cache de sílabas)", mediana, total))
+
+    print(f"{'Motor':<36}{'Mediana/avaliação':>20}{'Total':>12}")
+    for nome, mediana, total in resultados:
+        print(f"{nome:<36}{mediana * 1000:>17.1f} ms{total * 1000:>9.1f} ms")
+
+    print("\nAcerto na contagem de sílabas "
+          f"({len(REFERENCIA_SILABAS)} palavras com separação conhecida):")
+    for idioma in ("en", "pt"):
+        textstat.set_lang(idioma)
+        print(f"  textstat ({idioma}):   {acerto_silabas(textstat.syllable_count):.0%}")
+    textstat.set_lang("en")
+    print(f"  legibilidade_pt: {acerto_silabas(legibilidade_pt.contar_silabas):.0%}")
+
+    exemplo = textos[0]
+    indices = legibilidade_pt.indices_legibilidade(exemplo)
+    textstat.set_lang("pt")
+    print(
+        f"\nPrimeira avaliação: Flesch {indices['flesch']:.1f} (textstat pt: {textstat.flesch_reading_ease(exemplo):.1f}), "
+        f"Flesch-Kincaid {indices['flesch_kincaid']:.1f} (textstat: {textstat.flesch_kincaid_grade(exemplo):.1f}), "
+        f"SMOG {indices['smog']:.1f} (textstat: {textstat.smog_index(exemplo):.1f})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Tempo de login por nome de usuário (auth_utils.entrar) contra um substituto local do Supabase.
+
+O substituto atende o /auth/v1/token, o /auth/v1/user, a RPC get_email_by_username e a Edge Function
+login-usuario. Cada requisição do servidor da IncluIA paga a latência de ida e volta indicada; dentro da
+função, a RPC e o /token pagam só a latência interna da infraestrutura do Supabase, e a primeira
+invocação paga uma partida a frio. Mede a mediana de cada caminho (um cliente novo por login, como uma
+sessão nova do Streamlit):
+- rpc: RPC get_email_by_username + sign_in_with_password (o caminho sem a função);
+- funcao: uma invocação da Edge Function, com a sessão montada a partir do /token repassado;
+- cache: e-mail já resolvido neste servidor, direto ao sign_in_with_password.
+Confere também que o login pela função instala a sessão no cliente sem consultar o /auth/v1/user.
+Sai com código 1 se a mediana da função não ficar abaixo da mediana da RPC, ou se a conferência falhar.
+
+Uso:
+    python benchmarks/login.py
+    python benchmarks/login.py --latencia-ms 120 --latencia-interna-ms 5 --partida-fria-ms 400 --logins 15
+"""
+import argparse
+import base64
+import collections
+import http.server
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth_utils  # noqa: E402
+import supabase_pool  # noqa: E402
+
+USUARIO, EMAIL, SENHA = "prof_maria", "maria@escola.br", "segredo123"
+FUNCAO = "login-usuario"
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(json.dumps(dados).encode()).rstrip(b"=").decode()
+
+
+def _resposta_token():
+    agora = int(time.time())
+    usuario = {
+        "id": "00000000-0000-0000-0000-000000000001", "aud": "authenticated", "role": "authenticated",
+        "email": EMAIL, "app_metadata": {}, "user_metadata": {}, "created_at": "2024-01-01T00:00:00Z",
+    }
+    token = ".".join([
+        _b64({"alg": "HS256", "typ": "JWT"}),
+        _b64({"sub": usuario["id"], "exp": agora + 3600, "role": "authenticated"}),
+        "assinatura",
+    ])
+    return {
+        "access_token": token, "refresh_token": "renovacao", "token_type": "bearer",
+        "expires_in": 3600, "expires_at": agora + 3600, "user": usuario,
+    }
+
+
+def criar_substituto(latencia_s, latencia_interna_s, partida_fria_s):
+    requisicoes = collections.Counter()
+    estado = {"funcao_fria": True}
+    trava = threading.Lock()
+
+    class Manipulador(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status, corpo):
+            dados = json.dumps(corpo).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def _corpo(self):
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(tamanho) or b"{}")
+
+        def do_GET(self):
+            caminho = urllib.parse.urlparse(self.path).path
+            with trava:
+                requisicoes[caminho] += 1
+            time.sleep(latencia_s)
+            if caminho == "/auth/v1/user":
+                return self._responder(200, _resposta_token()["user"])
+            self._responder(404, {"error": "não encontrado"})
+
+        def do_POST(self):
+            caminho = urllib.parse.urlparse(self.path).path
+            corpo = self._corpo()
+            with trava:
+                requisicoes[caminho] += 1
+                fria, estado["funcao_fria"] = estado["funcao_fria"], False
+            time.sleep(latencia_s)
+            if caminho == "/rest/v1/rpc/get_email_by_username":
+                return self._responder(200, EMAIL if corpo.get("p_username") == USUARIO else None)
+            if caminho == "/auth/v1/token":
+                if corpo.get("email") == EMAIL and corpo.get("password") == SENHA:
+                    return self._responder(200, _resposta_token())
+                return self._responder(400, {"error": "invalid_grant"})
+            if caminho == f"/functions/v1/{FUNCAO}":
+                time.sleep((partida_fria_s if fria else 0) + 2 * latencia_interna_s)  # RPC + /token internos
+                if corpo.get("username") != USUARIO:
+                    return self._responder(404, {"error": "Nome de usuário não encontrado."})
+                if corpo.get("password") != SENHA:
+                    return self._responder(400, {"error": "invalid_grant"})
+                return self._responder(200, _resposta_token())
+            self._responder(404, {"error": "não encontrado"})
+
+    servidor = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Manipulador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, requisicoes
+
+
+def medir(url, chave, logins, funcao_login=None, usar_cache=False):
+    tempos = []
+    for _ in range(logins):
+        if not usar_cache:
+            auth_utils._descartar_email(USUARIO)
+        cliente = supabase_pool.criar_cliente(url, chave)
+        inicio = time.perf_counter()
+        auth_utils.entrar(cliente, USUARIO, SENHA, funcao_login)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia-ms", type=float, default=80, help="Ida e volta servidor da IncluIA ↔ Supabase")
+    parser.add_argument("--latencia-interna-ms", type=float, default=5, help="Chamadas dentro da Edge Function")
+    parser.add_argument("--partida-fria-ms", type=float, default=300, help="Primeira invocação da Edge Function")
+    parser.add_argument("--logins", type=int, default=11)
+    args = parser.parse_args()
+
+    servidor, requisicoes = criar_substituto(
+        args.latencia_ms / 1000, args.latencia_interna_ms / 1000, args.partida_fria_ms / 1000
+    )
+    url, chave = f"http://127.0.0.1:{servidor.server_address[1]}", _b64({"role": "anon"})
+    try:
+        # A primeira invocação (partida a frio) entra na mediana da função como qualquer outro login
+        medianas = {
+            "funcao": medir(url, chave, args.logins, funcao_login=FUNCAO),
+            "rpc": medir(url, chave, args.logins),
+        }
+        medianas["cache"] = medir(url, chave, args.logins, usar_cache=True)
+
+        requisicoes.clear()
+        auth_utils._descartar_email(USUARIO)
+        cliente = supabase_pool.criar_cliente(url, chave)
+        resp = auth_utils.entrar(cliente, USUARIO, SENHA, FUNCAO)
+        sessao = cliente.auth.get_session()
+        conferencia = {
+            "sessao_instalada": sessao is not None and sessao.access_token == resp.session.access_token,
+            "consultas_user": requisicoes["/auth/v1/user"],
+            "requisicoes": sum(requisicoes.values()),
+        }
+    finally:
+        servidor.shutdown()
+
+    print(json.dumps({
+        "latencia_ms": args.latencia_ms,
+        "mediana_ms": {nome: round(valor * 1000, 1) for nome, valor in medianas.items()},
+        "conferencia_funcao": conferencia,
+    }, indent=2, ensure_ascii=False))
+
+    falhas = []
+    if medianas["funcao"] >= medianas["rpc"]:
+        falhas.append("a mediana do login pela Edge Function não ficou abaixo da mediana pela RPC")
+    if not conferencia["sessao_instalada"] or conferencia["consultas_user"] or conferencia["requisicoes"] != 1:
+        falhas.append("o login pela Edge Function não instalou a sessão em uma única requisição")
+    for falha in falhas:
+        print(f"FALHA: {falha}", file=sys.stderr)
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
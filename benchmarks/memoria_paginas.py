@@ -0,0 +1,143 @@
+"""
+Pico de memória da conversão das páginas de um PDF em imagens, medido com o tracemalloc (alocações
+do Python: bytes dos pixels copiados, buffers e imagens codificadas) e pelo pico de RSS do processo,
+cada modo em um interpretador novo:
+
+    anterior       PIL.Image.frombytes(pix.samples) + BytesIO por página, todas guardadas em uma lista
+    lista          conversion_utils.converter_pdf_em_paginas (em série), todas guardadas
+    gerador        conversion_utils.iterar_paginas_pdf, todas guardadas (como para uma única requisição)
+    gerador (uma)  conversion_utils.iterar_paginas_pdf, cada página descartada depois de usada
+
+Depois verifica o limite de memória por requisição: converte com --limite-mb e confere que a
+conversão para com MemoriaExcedida e que o pico do tracemalloc fica abaixo do limite (o pixmap
+em renderização é memória do MuPDF, fora do tracemalloc, mas entra na conta do limite).
+Sai com código 1 se o pico passar do limite.
+
+Uso:
+    python benchmarks/memoria_paginas.py
+    python benchmarks/memoria_paginas.py --paginas 40 --dpi 300 --limite-mb 64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+MODOS = ["anterior", "lista", "gerador", "gerador (uma)"]
+
+# Executado em um processo novo; argumentos: modo, caminho do PDF, DPI e limite em bytes (0: sem limite)
+_FILHO = f"""
+import io, json, resource, sys, time, tracemalloc
+sys.path.insert(0, {RAIZ!r})
+import fitz
+from PIL import Image
+import conversion_utils
+
+modo, caminho, dpi, limite = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+with open(caminho, "rb") as f:
+    pdf_bytes = f.read()
+conversion_utils.converter_pdf_em_paginas(pdf_bytes, dpi=72, workers=1, adaptativo=False, filtrar=False,
+                                          paginas_selecionadas=[1])  # Carrega os módulos fora da medição
+
+
+def anterior():
+    imagens = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), alpha=False)
+            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            saida = io.BytesIO()
+            img.save(saida, format="JPEG", quality=95)
+            imagens.append(saida.getvalue())
+    return imagens
+
+
+def iterar():
+    return conversion_utils.iterar_paginas_pdf(pdf_bytes, dpi=dpi, usar_camada_texto=False, adaptativo=False,
+                                               filtrar=False, limite_memoria=limite)
+
+
+rss_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+tracemalloc.start()
+inicio = time.perf_counter()
+paginas, erro = 0, None
+try:
+    if modo == "anterior":
+        paginas = len(anterior())
+    elif modo == "lista":
+        paginas = len(conversion_utils.converter_pdf_em_paginas(
+            pdf_bytes, dpi=dpi, usar_camada_texto=False, workers=1, adaptativo=False, filtrar=False,
+            limite_memoria=limite))
+    elif modo == "gerador":
+        paginas = len([pagina["imagem"] for pagina in iterar()])
+    else:
+        for pagina in iterar():
+            paginas += 1
+except conversion_utils.MemoriaExcedida as e:
+    erro = str(e)
+duracao = time.perf_counter() - inicio
+pico = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_inicial
+print(json.dumps({{"duracao": duracao, "pico": pico, "rss_kb": rss, "paginas": paginas, "erro": erro}}))
+"""
+
+
+def _prova_digitalizada(paginas):
+    import fitz
+
+    doc = fitz.open()
+    for numero in range(paginas):
+        original = fitz.open()
+        pagina = original.new_page()
+        texto = f"Questão {numero + 1}. " + "Leia o texto sobre o ciclo da água e explique o que acontece. " * 12
+        pagina.insert_textbox(fitz.Rect(50, 50, 545, 500), texto, fontsize=11)
+        pagina.draw_circle(fitz.Point(300, 650), 90, color=(0.1, 0.3, 0.7), fill=(0.6, 0.8, 1.0))
+        pixmap = pagina.get_pixmap(dpi=150)
+        digitalizada = doc.new_page(width=pagina.rect.width, height=pagina.rect.height)
+        digitalizada.insert_image(digitalizada.rect, stream=pixmap.tobytes("jpeg", jpg_quality=80))
+    return doc.tobytes(garbage=3, deflate=True)
+
+
+def _executar(modo, caminho, dpi, limite):
+    proc = subprocess.run(
+        [sys.executable, "-c", _FILHO, modo, caminho, str(dpi), str(limite)],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=20, help="Páginas da prova digitalizada (padrão: 20).")
+    parser.add_argument("--dpi", type=int, default=300, help="Resolução da renderização (padrão: 300).")
+    parser.add_argument("--limite-mb", type=float, default=32, help="Limite por requisição verificado no final (padrão: 32).")
+    args = parser.parse_args(argv)
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as arquivo:
+        arquivo.write(_prova_digitalizada(args.paginas))
+    try:
+        tamanho = os.path.getsize(arquivo.name)
+        print(f"Prova digitalizada: {args.paginas} página(s), {tamanho // 1024} KB; renderização em {args.dpi} DPI.\n")
+        print(f"{'Modo':<16}{'Tempo':>9}{'Pico tracemalloc':>19}{'Pico RSS':>11}")
+        for modo in MODOS:
+            r = _executar(modo, arquivo.name, args.dpi, 0)
+            print(f"{modo:<16}{r['duracao']:>7.2f} s{r['pico'] / 2**20:>16.1f} MB{r['rss_kb'] / 1024:>8.0f} MB")
+
+        limite = int(args.limite_mb * 1024 * 1024)
+        r = _executar("gerador", arquivo.name, args.dpi, limite)
+        dentro = r["pico"] <= limite
+        print(f"\nLimite de {args.limite_mb:g} MB por requisição: pico do tracemalloc {r['pico'] / 2**20:.1f} MB "
+              f"({'dentro' if dentro else 'ACIMA'} do limite).")
+        print(f"  {r['erro'] or 'conversão completa, ' + str(r['paginas']) + ' página(s)'}")
+        return 0 if dentro else 1
+    finally:
+        os.remove(arquivo.name)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
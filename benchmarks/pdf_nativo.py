@@ -0,0 +1,140 @@
+"""
+Compara o envio nativo do PDF ao Gemini (pdf_nativo) com a conversão das páginas usada até agora,
+contra o substituto local da API (api_substituta.py, em outro processo): latência de ponta a ponta
+(conversão + chamada), bytes enviados por requisição e CPU do servidor da aplicação (tempo de CPU
+deste processo, que faz a conversão e serializa a requisição).
+
+Modos:
+    nativo            PDF original inline; se a API recusar, as páginas são convertidas (como no app)
+    texto + imagens   páginas com texto digital como texto, as demais como imagem (padrão anterior)
+    imagens           todas as páginas como imagem
+
+Documentos sintéticos: prova digital com figuras, prova digitalizada (páginas só com imagem) e prova
+protegida por senha de proprietário, que a API recusa e faz o modo nativo voltar à conversão.
+O envio de PDFs grandes pela File API não é simulado (os documentos daqui vão inline).
+
+Uso:
+    python benchmarks/pdf_nativo.py
+    python benchmarks/pdf_nativo.py --repeticoes 5 --mbps 10 --paginas 12
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import context_cache  # noqa: E402
+import conversion_utils  # noqa: E402
+import pdf_nativo  # noqa: E402
+from api_substituta import estatisticas, iniciar_processo  # noqa: E402
+from prompts import montar_prompt_usuario  # noqa: E402
+
+MODELO = "gemini-2.5-flash"
+ENUNCIADO = (
+    "Questão {n}. Leia o texto sobre o ciclo da água e explique, com suas palavras, o que acontece com a água "
+    "dos rios quando a temperatura aumenta. Observe a figura e assinale a alternativa correta. "
+    "a) A água evapora. b) A água congela. c) A água desaparece. d) Nenhuma das anteriores."
+)
+
+
+def _prova_digital(paginas):
+    import fitz
+
+    doc = fitz.open()
+    for numero in range(paginas):
+        pagina = doc.new_page()
+        texto = "\n\n".join(ENUNCIADO.format(n=3 * numero + i + 1) for i in range(3))
+        pagina.insert_textbox(fitz.Rect(50, 50, 545, 500), texto, fontsize=11)
+        if numero % 2 == 0:
+            pagina.draw_circle(fitz.Point(300, 650), 90, color=(0.1, 0.3, 0.7), fill=(0.6, 0.8, 1.0))
+            pagina.draw_rect(fitz.Rect(120, 720, 480, 790), color=(0.3, 0.5, 0.1), fill=(0.5, 0.8, 0.3))
+    return doc
+
+
+def _prova_digitalizada(paginas):
+    import fitz
+
+    original = _prova_digital(paginas)
+    doc = fitz.open()
+    for pagina_original in original:
+        pixmap = pagina_original.get_pixmap(dpi=150, colorspace=fitz.csGRAY)
+        pagina = doc.new_page(width=pagina_original.rect.width, height=pagina_original.rect.height)
+        pagina.insert_image(pagina.rect, stream=pixmap.tobytes("jpeg", jpg_quality=80))
+    return doc.tobytes(garbage=3, deflate=True)
+
+
+def _prova_protegida(paginas):
+    import fitz
+
+    return _prova_digital(paginas).tobytes(
+        encryption=fitz.PDF_ENCRYPT_AES_256, owner_pw="escola", user_pw="", permissions=fitz.PDF_PERM_PRINT
+    )
+
+
+def _converter(pdf_bytes, usar_camada_texto):
+    paginas = conversion_utils.converter_pdf_em_paginas(pdf_bytes, usar_camada_texto=usar_camada_texto, workers=1)
+    return conversion_utils.paginas_para_partes(paginas)
+
+
+def _executar(modo, pdf_bytes, prompt, url, cliente):
+    def gerar(partes):
+        return context_cache.ModeloGenai(cliente, MODELO).generate_content(partes + [prompt])
+
+    antes = estatisticas(url)
+    inicio, cpu_inicio = time.perf_counter(), time.process_time()
+    if modo == "nativo":
+        pdf_nativo.gerar_com_pdf("chave-local", [pdf_nativo.parte_pdf(pdf_bytes)], gerar,
+                                 lambda pdf: _converter(pdf, usar_camada_texto=True), client=cliente)
+    else:
+        gerar(_converter(pdf_bytes, usar_camada_texto=modo == "texto + imagens"))
+    latencia, cpu = time.perf_counter() - inicio, time.process_time() - cpu_inicio
+    depois = estatisticas(url)
+    return latencia, cpu, depois["bytes_recebidos"] - antes["bytes_recebidos"], depois["requisicoes"] - antes["requisicoes"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por documento e modo (padrão: 3).")
+    parser.add_argument("--paginas", type=int, default=6, help="Páginas de cada prova (padrão: 6).")
+    parser.add_argument("--latencia-base-ms", type=float, default=120, help="Latência fixa do substituto.")
+    parser.add_argument("--ms-por-mil-tokens", type=float, default=40, help="Custo de mil tokens de entrada.")
+    parser.add_argument("--mbps", type=float, default=20, help="Banda de envio simulada até a API (padrão: 20).")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("pdf_nativo").setLevel(logging.ERROR)  # As recusas aparecem na coluna de chamadas
+    processo, url = iniciar_processo(args.latencia_base_ms, args.ms_por_mil_tokens, args.mbps)
+    try:
+        from google import genai
+        from google.genai import types
+
+        cliente = genai.Client(api_key="chave-local", http_options=types.HttpOptions(base_url=url))
+        prompt = montar_prompt_usuario("Dislexia", "")
+        documentos = {
+            "digital": _prova_digital(args.paginas).tobytes(),
+            "digitalizada": _prova_digitalizada(args.paginas),
+            "protegida": _prova_protegida(args.paginas),
+        }
+        _executar("nativo", documentos["digital"], prompt, url, cliente)  # Aquece o SDK, o PyMuPDF e a conexão
+
+        print(f"{args.paginas} página(s) por prova; {args.repeticoes} repetição(ões); banda de envio {args.mbps:g} Mbps.\n")
+        print(f"{'Documento':<14}{'Modo':<17}{'Latência':>10}{'CPU':>10}{'Enviado':>11}{'Chamadas':>10}")
+        for nome, pdf_bytes in documentos.items():
+            for modo in ("nativo", "texto + imagens", "imagens"):
+                resultados = [_executar(modo, pdf_bytes, prompt, url, cliente) for _ in range(args.repeticoes)]
+                latencia = statistics.median(r[0] for r in resultados)
+                cpu = statistics.median(r[1] for r in resultados)
+                enviado, chamadas = resultados[-1][2], resultados[-1][3]
+                print(f"{nome:<14}{modo:<17}{latencia * 1000:>7.0f} ms{cpu * 1000:>7.0f} ms"
+                      f"{enviado / 1024:>8.0f} KB{chamadas:>10}")
+            print()
+        print(f"pdf_nativo: {pdf_nativo.resumo()}")
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+if __name__ == "__main__":
+    main()
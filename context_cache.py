@@ -0,0 +1,207 @@
+import hashlib
+import itertools
+import os
+import threading
+import time
+
+# --- CACHE DE CONTEXTO DO GEMINI ---
+# As instruções de sistema (vários KB, iguais em todas as chamadas) são registradas no Gemini como
+# conteúdo em cache (context caching) uma vez por chave da API e modelo, com TTL, e cada chamada só
+# referencia o cache: o texto não é reenviado e os tokens em cache são cobrados com desconto. O registro
+# é renovado antes de expirar. Se o cache não puder ser criado (modelo sem suporte, instrução abaixo
+# do mínimo de tokens, cota) a instrução volta a ser enviada inline, como primeira parte do conteúdo,
+# e só há nova tentativa depois de ESPERA_APOS_FALHA_S. Se o cache sumir no servidor antes do previsto,
+# a chamada é repetida inline e o registro é descartado.
+# O cache e a geração usam sempre um cliente google.genai da própria chave do professor: o
+# google.generativeai só tem a chave global de `genai.configure`, que muda a cada sessão que a
+# configura, e um cache registrado para uma chave poderia ter sido criado (e cobrado) com outra.
+
+HABILITADO = os.environ.get("INCLUIA_CONTEXTO_CACHE", "1") != "0"
+TTL_S = float(os.environ.get("INCLUIA_CONTEXTO_CACHE_TTL_MIN", 60)) * 60
+MARGEM_RENOVACAO_S = 5 * 60      # Renova o TTL quando faltar menos que isso para expirar
+ESPERA_APOS_FALHA_S = float(os.environ.get("INCLUIA_CONTEXTO_CACHE_ESPERA_MIN", 30)) * 60
+MARCAS_CACHE_AUSENTE = ("CACHEDCONTENT", "CACHED_CONTENT", "CACHED CONTENT")
+
+_registro = None
+_registro_lock = threading.Lock()
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def erro_cache_ausente(erro):
+    """Indica se o erro da API se refere ao conteúdo em cache (expirado, removido ou de outro projeto)."""
+    texto = f"{type(erro).__name__} {erro}".upper()
+    return any(marca in texto for marca in MARCAS_CACHE_AUSENTE)
+
+
+class RegistroContexto:
+    """Conteúdos em cache no Gemini por (SDK, chave da API, modelo, instrução), com renovação automática."""
+
+    def __init__(self, ttl=TTL_S, margem=MARGEM_RENOVACAO_S, espera_falha=ESPERA_APOS_FALHA_S):
+        self.ttl = ttl
+        self.margem = margem
+        self.espera_falha = espera_falha
+        self._itens = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {"criacoes": 0, "renovacoes": 0, "reusos": 0, "falhas": 0, "inline": 0, "descartes": 0}
+
+    @staticmethod
+    def _id(sdk, chave_api, modelo, instrucao):
+        dados = "\x00".join((sdk, chave_api or "", modelo, hashlib.sha256(instrucao.encode("utf-8")).hexdigest()))
+        return hashlib.sha256(dados.encode("utf-8")).hexdigest()
+
+    def _contar(self, chave):
+        with self._lock:
+            self.estatisticas[chave] += 1
+
+    def obter(self, sdk, chave_api, modelo, instrucao, criar, renovar):
+        """
+        Retorna o objeto do conteúdo em cache, criando-o com `criar(ttl_s)` ou estendendo o TTL com
+        `renovar(objeto, ttl_s)` quando está perto de expirar. Retorna None (envio inline) se o cache
+        estiver desabilitado ou tiver falhado há pouco.
+        """
+        if not HABILITADO:
+            self._contar("inline")
+            return None
+        id_item = self._id(sdk, chave_api, modelo, instrucao)
+        with self._lock:
+            lock_item = self._locks.setdefault(id_item, threading.Lock())
+
+        # Um único registro por item, mesmo com várias sessões chamando ao mesmo tempo
+        with lock_item:
+            agora = time.monotonic()
+            item = self._itens.get(id_item)
+            if item and item.get("objeto") is not None and item["expira"] - agora > self.margem:
+                self._contar("reusos")
+                return item["objeto"]
+            if item and item.get("objeto") is None and agora - item["falha_em"] < self.espera_falha:
+                self._contar("inline")
+                return None
+
+            objeto = None
+            if item and item.get("objeto") is not None and item["expira"] - agora > 1:
+                try:
+                    renovar(item["objeto"], self.ttl)
+                    objeto = item["objeto"]
+                    self._contar("renovacoes")
+                except Exception:
+                    objeto = None  # Removido no servidor: cria de novo
+            if objeto is None:
+                try:
+                    objeto = criar(self.ttl)
+                    self._contar("criacoes")
+                except Exception:
+                    self._itens[id_item] = {"objeto": None, "falha_em": time.monotonic()}
+                    self._contar("falhas")
+                    self._contar("inline")
+                    return None
+            self._itens[id_item] = {"objeto": objeto, "expira": time.monotonic() + self.ttl}
+            return objeto
+
+    def descartar(self, sdk, chave_api, modelo, instrucao):
+        """Esquece o cache do item (ex: a API informou que ele não existe mais)."""
+        with self._lock:
+            self._itens.pop(self._id(sdk, chave_api, modelo, instrucao), None)
+            self.estatisticas["descartes"] += 1
+
+    def resumo(self):
+        with self._lock:
+            ativos = sum(1 for item in self._itens.values() if item.get("objeto") is not None)
+            return dict(self.estatisticas, ativos=ativos)
+
+
+def obter_registro():
+    """Retorna o registro do processo do servidor, compartilhado por todas as sessões."""
+    global _registro
+    with _registro_lock:
+        if _registro is None:
+            _registro = RegistroContexto()
+        return _registro
+
+
+def obter_cliente(chave_api):
+    """Cliente google.genai da chave, criado na primeira chamada e compartilhado pelas sessões que a usam."""
+    from google import genai
+
+    id_chave = hashlib.sha256((chave_api or "").encode("utf-8")).hexdigest()
+    with _clientes_lock:
+        cliente = _clientes.get(id_chave)
+        if cliente is None:
+            cliente = _clientes[id_chave] = genai.Client(api_key=chave_api)
+        return cliente
+
+
+def partes_genai(partes):
+    """Converte as partes no formato do google.generativeai (dicts {'mime_type', 'data'}) para o google.genai."""
+    from google.genai import types
+
+    return [
+        types.Part.from_bytes(data=parte["data"], mime_type=parte["mime_type"]) if isinstance(parte, dict) else parte
+        for parte in partes
+    ]
+
+
+class ModeloGenai:
+    """O `generate_content` do google.generativeai (com ou sem stream) sobre um cliente google.genai."""
+
+    def __init__(self, client, modelo, config=None):
+        self.client = client
+        self.modelo = modelo
+        self.config = config
+
+    def generate_content(self, contents, stream=False):
+        contents = partes_genai(contents)
+        if not stream:
+            return self.client.models.generate_content(model=self.modelo, contents=contents, config=self.config)
+        # O primeiro pedaço é lido já aqui, para que erros da API aconteçam dentro das retentativas
+        pedacos = iter(self.client.models.generate_content_stream(model=self.modelo, contents=contents, config=self.config))
+        primeiro = next(pedacos, None)
+        return (pedaco for pedaco in itertools.chain([primeiro] if primeiro else [], pedacos) if pedaco.text)
+
+
+def gerar_com_instrucao(chave_api, modelo, instrucao, partes, chamar, client=None):
+    """
+    Para as chamadas no formato do google.generativeai: chama `chamar(model, conteudo)` com um
+    ModeloGenai do cliente da chave (`client`, ou o de `obter_cliente`) e a instrução em cache ou inline.
+    """
+    client = client or obter_cliente(chave_api)
+    return gerar_com_instrucao_genai(
+        client, chave_api, modelo, instrucao, partes,
+        lambda conteudo, config: chamar(ModeloGenai(client, modelo, config), conteudo),
+    )
+
+
+def gerar_com_instrucao_genai(client, chave_api, modelo, instrucao, partes, chamar):
+    """
+    Para o SDK google.genai: chama `chamar(conteudo, config)` com a instrução em cache (config com
+    `cached_content`) ou inline (a instrução como primeira parte e config None) e retorna o resultado.
+    """
+    from google.genai import types
+
+    def criar(ttl_s):
+        return client.caches.create(
+            model=modelo,
+            config=types.CreateCachedContentConfig(
+                contents=[types.Content(role="user", parts=[types.Part.from_text(text=instrucao)])],
+                ttl=f"{int(ttl_s)}s",
+            ),
+        )
+
+    def renovar(cache, ttl_s):
+        client.caches.update(name=cache.name, config=types.UpdateCachedContentConfig(ttl=f"{int(ttl_s)}s"))
+
+    registro = obter_registro()
+    cache = registro.obter("genai", chave_api, modelo, instrucao, criar, renovar)
+    if cache is not None:
+        try:
+            return chamar(list(partes), types.GenerateContentConfig(cached_content=cache.name))
+        except Exception as e:
+            if not erro_cache_ausente(e):
+                raise
+            registro.descartar("genai", chave_api, modelo, instrucao)
+    return chamar([types.Part.from_text(text=instrucao)] + list(partes), None)
+
+
+def resumo():
+    return obter_registro().resumo()
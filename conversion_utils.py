@@ -0,0 +1,843 @@
+import hashlib
+import io
+import logging
+import math
+import os
+import threading
+
+# --- FUNÇÕES DE CONVERSÃO DE DOCUMENTOS ---
+# Funções puras (sem Streamlit) usadas pelas páginas para transformar PDFs em conteúdo para a IA.
+
+# Limiares da detecção de camada de texto
+MIN_CARACTERES_TEXTO = 80        # Abaixo disso a página é tratada como sem texto (ex: digitalizada)
+MIN_FRACAO_LEGIVEL = 0.9         # Fração mínima de caracteres legíveis para confiar na camada de texto
+MAX_FRACAO_FIGURAS = 0.15        # Acima disso as figuras são relevantes e a página é rasterizada
+ESPESSURA_MAX_LINHA = 2.0        # Desenhos mais finos que isso (bordas de tabela, sublinhados) são ignorados
+
+# Envio híbrido (texto + recortes das figuras) das páginas com camada de texto e figuras relevantes
+MAX_FRACAO_FIGURAS_MISTO = 0.7   # Acima disso a página é quase toda figura e vai inteira como imagem
+MIN_FRACAO_FIGURA = 0.02         # Figuras menores que isso (ícones, logotipos, marcadores) não são recortadas
+DISTANCIA_AGRUPAMENTO = 12.0     # Desenhos e imagens mais próximos que isso (em pontos) formam uma só figura
+MAX_CARACTERES_ROTULO = 60       # Blocos de texto curtos junto de uma figura (eixos, legendas) vão no recorte
+DISTANCIA_ROTULO = 30.0          # Distância máxima (em pontos) entre um rótulo e a figura
+DPI_MAX_FIGURA = 150             # Suficiente para gráficos e diagramas (o texto da página vai como texto)
+
+# Renderização paralela
+MIN_PAGINAS_PARALELO = 6         # Documentos menores são renderizados em série (o paralelismo não compensa)
+RENDER_WORKERS = int(os.environ.get("INCLUIA_RENDER_WORKERS", 0)) or min(os.cpu_count() or 1, 8)
+
+_pool_renderizacao = None
+_pool_lock = threading.Lock()
+
+# Codificação adaptativa das imagens de página
+ORCAMENTO_BYTES_REQUISICAO = 8 * 1024 * 1024   # Total de bytes de imagem por chamada à IA
+ORCAMENTO_TOKENS_REQUISICAO = 64_000           # Total de tokens de imagem por chamada à IA
+DPIS_CANDIDATOS = (300, 250, 200, 170, 150, 130, 110)
+DPI_MINIMO_LEGIVEL = 110         # Abaixo disso textos pequenos deixam de ser legíveis
+DPI_SONDA = 36                   # Resolução da renderização rápida usada para analisar a página
+QUALIDADE_JPEG_ADAPTATIVA = 85
+LIMIAR_BRANCO = 24               # Diferença mínima para o branco para um pixel contar como conteúdo
+MARGEM_RECORTE = 6.0             # Margem (em pontos) mantida ao redor do conteúdo recortado
+FRACAO_MIN_COLORIDA = 0.01       # Fração de pixels saturados a partir da qual a página é colorida
+MAX_CORES_PNG = 24               # Páginas com poucas cores (desenhos chapados) compactam melhor em PNG
+
+# Filtro de páginas em branco e repetidas (páginas enviadas como imagem). Só são descartadas as páginas
+# em branco e as cópias exatas (a mesma imagem codificada e o mesmo texto que uma anterior, ou seja, nada
+# de novo para a IA); as parecidas são apenas apontadas no relatório, pois a sonda não enxerga
+# diferenças de texto (ex: outra conta na questão).
+LIMIAR_TINTA = 64                # Diferença mínima para o tom do papel para um pixel contar como tinta
+MAX_FRACAO_TINTA_BRANCA = 0.0005 # Abaixo disso a página está em branco (ex: verso de folha digitalizada)
+LADO_HASH = 8                    # Hash de diferenças de 8x8 bits da página suavizada (disposição geral)
+MAX_DISTANCIA_HASH = 12          # Páginas com hashes mais distantes que isso nem são comparadas
+MAX_DESLOCAMENTO_PX = 4          # Deslocamento máximo (em pixels da sonda) entre duas digitalizações
+LADO_BLOCO_COMPARACAO = 12       # Blocos (em pixels da sonda) comparados entre páginas candidatas
+MAX_DIFERENCA_BLOCO = 45         # Maior diferença média (0-255) tolerada em um bloco de páginas parecidas
+
+# Memória por requisição: o arquivo, as páginas já convertidas e o pixmap da página em renderização (com
+# os pixels da assinatura do filtro)
+LIMITE_MEMORIA_REQUISICAO = int(float(os.environ.get("INCLUIA_MEMORIA_REQUISICAO_MB", 256)) * 1024 * 1024)
+
+# Miniaturas para a escolha das páginas enviadas
+DPI_MINIATURA = 30               # Uma página A4 fica com ~250x350 px (~10 KB)
+QUALIDADE_JPEG_MINIATURA = 60
+MINIATURAS_POR_LOTE = 12         # Miniaturas geradas (e exibidas) de cada vez
+
+# Contabilização de tokens de imagem do Gemini
+TOKENS_POR_BLOCO_IMAGEM = 258
+LADO_BLOCO_IMAGEM = 768
+LADO_MAX_IMAGEM_PEQUENA = 384
+
+logger = logging.getLogger(__name__)
+
+
+class MemoriaExcedida(Exception):
+    """A conversão do documento passaria do limite de memória da requisição."""
+
+
+def _memoria_excedida(limite, pagina):
+    return MemoriaExcedida(f"A conversão passaria do limite de memória da requisição ({limite // (1024 * 1024)} MB) na página {pagina}.")
+
+
+def _area(rect):
+    return max(rect.width, 0) * max(rect.height, 0)
+
+
+def _texto_legivel(texto):
+    """Verifica se a camada de texto não está corrompida (fontes sem mapeamento geram lixo)."""
+    legiveis = sum(1 for c in texto if c.isprintable() or c.isspace())
+    legiveis -= texto.count("�")
+    return legiveis / len(texto) >= MIN_FRACAO_LEGIVEL
+
+
+def extrair_texto_legivel(page):
+    """Texto da camada de texto da página, ou "" se ela não existir ou estiver ilegível."""
+    texto = page.get_text("text").strip()
+    if not texto or not _texto_legivel(texto):
+        return ""
+    return texto
+
+
+def analisar_pagina_pdf(page, hibrido=True):
+    """
+    Decide como enviar uma página à IA.
+    Retorna (modo, motivo, texto), onde modo é 'texto' se a página tem camada de texto
+    utilizável e poucas figuras, 'misto' (com `hibrido`) se tem camada de texto e figuras que valem um
+    recorte, ou 'imagem' se precisa ser rasterizada (com o texto legível, se houver).
+    """
+    import fitz
+
+    texto = page.get_text("text").strip()
+    if len(texto) < MIN_CARACTERES_TEXTO:
+        return "imagem", "sem camada de texto", ""
+    if not _texto_legivel(texto):
+        return "imagem", "camada de texto ilegível", ""
+
+    area_pagina = _area(page.rect) or 1.0
+    area_figuras = sum(_area(fitz.Rect(info["bbox"])) for info in page.get_image_info())
+    desenhos = page.get_drawings()
+    for desenho in desenhos:
+        rect = desenho["rect"]
+        if rect.width <= ESPESSURA_MAX_LINHA or rect.height <= ESPESSURA_MAX_LINHA:
+            continue
+        area_figuras += _area(rect)
+
+    fracao_figuras = min(area_figuras / area_pagina, 1.0)
+    recortaveis = False
+    if hibrido and MIN_FRACAO_FIGURA <= fracao_figuras <= MAX_FRACAO_FIGURAS_MISTO:
+        # Mesmo critério do recorte: só é misto se alguma figura, sozinha, vale um recorte
+        recortaveis = bool(_regioes_figuras(page, desenhos))
+        if recortaveis:
+            return "misto", f"texto e figuras ({fracao_figuras:.0%} da página)", texto
+    if fracao_figuras > MAX_FRACAO_FIGURAS:
+        # O texto legível segue junto (usado nas métricas de legibilidade), mas a página vai como imagem
+        return "imagem", f"figuras ocupam {fracao_figuras:.0%} da página", texto
+    if hibrido and fracao_figuras >= MIN_FRACAO_FIGURA and not recortaveis:
+        return "texto", "figuras pequenas demais para recortar", texto
+    return "texto", "camada de texto utilizável", texto
+
+
+def _expandir(rect, distancia):
+    import fitz
+
+    return fitz.Rect(rect.x0 - distancia, rect.y0 - distancia, rect.x1 + distancia, rect.y1 + distancia)
+
+
+def _unir_regioes(regioes, distancia):
+    """Une as regiões que se sobrepõem ou estão a menos de `distancia` pontos umas das outras."""
+    regioes = list(regioes)
+    unidas = True
+    while unidas:
+        unidas = False
+        for i in range(len(regioes)):
+            for j in range(i + 1, len(regioes)):
+                if _expandir(regioes[i], distancia).intersects(regioes[j]):
+                    regioes[i] = regioes[i] | regioes.pop(j)
+                    unidas = True
+                    break
+            if unidas:
+                break
+    return regioes
+
+
+def _rotulo(bloco, texto, regiao):
+    """Indica se o bloco é um rótulo da figura: texto curto, perto dela e alinhado com ela (eixos, legendas)."""
+    if len(texto) > MAX_CARACTERES_ROTULO:
+        return False
+    if not _expandir(regiao, DISTANCIA_ROTULO).intersects(bloco):
+        return False
+    tolerancia = DISTANCIA_AGRUPAMENTO
+    alinhado_x = regiao.x0 - tolerancia <= bloco.x0 and bloco.x1 <= regiao.x1 + tolerancia
+    alinhado_y = regiao.y0 - tolerancia <= bloco.y0 and bloco.y1 <= regiao.y1 + tolerancia
+    return alinhado_x or alinhado_y
+
+
+def _regioes_figuras(page, desenhos=None):
+    """
+    Regiões de figura da página (imagens e desenhos agrupados) com pelo menos MIN_FRACAO_FIGURA da
+    página cada uma; as menores (ícones, logotipos, marcadores) não são recortadas.
+    """
+    import fitz
+
+    area_minima = MIN_FRACAO_FIGURA * (_area(page.rect) or 1.0)
+    regioes = [fitz.Rect(info["bbox"]) & page.rect for info in page.get_image_info()]
+    desenhos = page.get_drawings() if desenhos is None else desenhos
+    if desenhos:
+        # Agrupa todos os desenhos (os eixos ligam as barras de um gráfico), mas grupos só de linhas
+        # finas (bordas de tabela, sublinhados) continuam como texto
+        formas = [
+            desenho["rect"] for desenho in desenhos
+            if desenho["rect"].width > ESPESSURA_MAX_LINHA and desenho["rect"].height > ESPESSURA_MAX_LINHA
+        ]
+        regioes += [
+            grupo for grupo in page.cluster_drawings(
+                drawings=desenhos, x_tolerance=DISTANCIA_AGRUPAMENTO, y_tolerance=DISTANCIA_AGRUPAMENTO
+            )
+            if any(grupo.contains(forma) for forma in formas)
+        ]
+    return [r for r in _unir_regioes(regioes, DISTANCIA_AGRUPAMENTO) if _area(r) >= area_minima]
+
+
+def segmentar_pagina(page):
+    """
+    Divide uma página com camada de texto em trechos de texto e regiões de figura (imagens e desenhos
+    agrupados, com os rótulos curtos ao redor), na ordem de leitura: de cima para baixo e, na mesma
+    altura, da esquerda para a direita. Retorna uma lista de ('texto', str) e ('figura', fitz.Rect).
+    """
+    import fitz
+
+    regioes = _regioes_figuras(page)
+
+    # Texto dentro de uma figura, ou rótulo curto encostado nela, faz parte do recorte
+    nucleos = [fitz.Rect(regiao) for regiao in regioes]
+    trechos = []
+    for x0, y0, x1, y1, texto, _numero, tipo in page.get_text("blocks", sort=True):
+        texto = texto.strip()
+        if tipo != 0 or not texto:
+            continue
+        bloco = fitz.Rect(x0, y0, x1, y1)
+        for i, nucleo in enumerate(nucleos):
+            # Compara com a figura original, para a região não crescer a cada rótulo absorvido
+            if _area(bloco & nucleo) >= 0.5 * (_area(bloco) or 1.0) or _rotulo(bloco, texto, nucleo):
+                regioes[i] = regioes[i] | bloco
+                break
+        else:
+            trechos.append((bloco, "texto", texto))
+    regioes = _unir_regioes(regioes, 0)
+
+    elementos = trechos + [(regiao, "figura", regiao & page.rect) for regiao in regioes]
+    elementos.sort(key=lambda elemento: (round(elemento[0].y0), elemento[0].x0))
+
+    segmentos = []
+    for _rect, tipo, conteudo in elementos:
+        if tipo == "texto" and segmentos and segmentos[-1][0] == "texto":
+            segmentos[-1] = ("texto", segmentos[-1][1] + "\n" + conteudo)
+        else:
+            segmentos.append((tipo, conteudo))
+    return segmentos
+
+
+def codificar_pixmap(pix, formato="JPEG", quality=QUALIDADE_JPEG_ADAPTATIVA):
+    """
+    Codifica um pixmap do PyMuPDF sem copiar os pixels: PNG pelo próprio MuPDF e JPEG pelo PIL lendo a
+    memória do pixmap (o codificador JPEG do MuPDF é várias vezes mais lento).
+    """
+    if formato == "PNG":
+        return pix.tobytes("png")
+    from PIL import Image
+
+    modo = "L" if pix.n == 1 else "RGB"
+    img = Image.frombuffer(modo, (pix.width, pix.height), pix.samples_mv, "raw", modo, pix.stride, 1)
+    saida = io.BytesIO()
+    img.save(saida, format="JPEG", quality=quality)
+    return saida.getvalue()
+
+
+def bytes_pixmap(page, dpi, componentes=3):
+    """Memória (em bytes) do pixmap de uma página inteira renderizada em `dpi`."""
+    zoom = dpi / 72.0
+    return math.ceil(page.rect.width * zoom) * math.ceil(page.rect.height * zoom) * componentes
+
+
+def bytes_conversao_pagina(page, dpi, filtrar=True):
+    """
+    Pico de memória da conversão de uma página: o pixmap em `dpi` e, com o filtro, os pixels em cinza
+    da sonda guardados na assinatura enquanto a página é codificada.
+    """
+    return bytes_pixmap(page, dpi) + (bytes_pixmap(page, DPI_SONDA, componentes=1) if filtrar else 0)
+
+
+def renderizar_pagina_jpeg(page, dpi=300, quality=95, regiao=None):
+    """Rasteriza uma página do PDF (ou só a `regiao` dela) e retorna os bytes JPEG."""
+    import fitz
+
+    zoom = dpi / 72.0
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False, clip=regiao)
+    return codificar_pixmap(pix, "JPEG", quality=quality)
+
+
+def estimar_tokens_imagem(largura, altura):
+    """Estima os tokens cobrados pelo Gemini por uma imagem (blocos de 768x768 pixels)."""
+    if largura <= LADO_MAX_IMAGEM_PEQUENA and altura <= LADO_MAX_IMAGEM_PEQUENA:
+        return TOKENS_POR_BLOCO_IMAGEM
+    blocos = math.ceil(largura / LADO_BLOCO_IMAGEM) * math.ceil(altura / LADO_BLOCO_IMAGEM)
+    return TOKENS_POR_BLOCO_IMAGEM * blocos
+
+
+def _codificar_pil(img, formato):
+    byte_arr = io.BytesIO()
+    if formato == "PNG":
+        img.save(byte_arr, format="PNG")
+    else:
+        img.save(byte_arr, format="JPEG", quality=QUALIDADE_JPEG_ADAPTATIVA)
+    return byte_arr.getvalue()
+
+
+def _sondar_pagina(page, regiao=None):
+    """
+    Renderiza a página (ou a `regiao` dela) em baixa resolução e decide o recorte das margens, se ela
+    pode ir em tons de cinza e o formato de imagem. Retorna (clip, cinza, formato, bytes_por_pixel).
+    """
+    import fitz
+    from PIL import Image, ImageChops
+
+    regiao = regiao or page.rect
+    pix = page.get_pixmap(dpi=DPI_SONDA, alpha=False, clip=regiao)
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+    # Recorte das margens em branco
+    fundo = Image.new("RGB", img.size, (255, 255, 255))
+    conteudo = ImageChops.difference(img, fundo).convert("L").point(lambda v: 255 if v > LIMIAR_BRANCO else 0)
+    bbox = conteudo.getbbox()
+    clip = regiao
+    if bbox:
+        escala = DPI_SONDA / 72.0
+        clip = fitz.Rect(
+            regiao.x0 + bbox[0] / escala - MARGEM_RECORTE, regiao.y0 + bbox[1] / escala - MARGEM_RECORTE,
+            regiao.x0 + bbox[2] / escala + MARGEM_RECORTE, regiao.y0 + bbox[3] / escala + MARGEM_RECORTE,
+        ) & regiao
+
+    # Cor: só mantém RGB se uma fração relevante dos pixels for saturada
+    saturacao = img.convert("HSV").getchannel("S").histogram()
+    cinza = sum(saturacao[40:]) / (img.width * img.height) < FRACAO_MIN_COLORIDA
+
+    amostra = img.convert("L") if cinza else img
+    formato = "PNG" if amostra.getcolors(maxcolors=MAX_CORES_PNG) else "JPEG"
+    bytes_por_pixel = len(_codificar_pil(amostra, formato)) / (amostra.width * amostra.height)
+    return clip, cinza, formato, bytes_por_pixel
+
+
+def codificar_pagina_adaptativa(page, orcamento_bytes, orcamento_tokens, dpi_max=300, dpi_min=DPI_MINIMO_LEGIVEL, regiao=None):
+    """
+    Rasteriza uma página (ou só a `regiao` dela) escolhendo resolução, cor e formato para caber no
+    orçamento de bytes e tokens, sem descer abaixo de `dpi_min` (legibilidade tem prioridade).
+    Retorna (bytes da imagem, mime_type, descrição da codificação).
+    """
+    import fitz
+
+    clip, cinza, formato, bytes_por_pixel = _sondar_pagina(page, regiao)
+
+    candidatos = [d for d in DPIS_CANDIDATOS if dpi_min <= d <= dpi_max] or [dpi_max]
+    inicio = len(candidatos) - 1
+    for i, dpi in enumerate(candidatos):
+        largura, altura = clip.width * dpi / 72.0, clip.height * dpi / 72.0
+        # A estimativa da sonda é pessimista: em alta resolução o texto compacta melhor
+        if estimar_tokens_imagem(largura, altura) <= orcamento_tokens and bytes_por_pixel * largura * altura <= orcamento_bytes:
+            inicio = i
+            break
+
+    # Renderiza na resolução estimada e desce mais um degrau se ainda estourar o orçamento
+    for dpi in candidatos[inicio:inicio + 2]:
+        zoom = dpi / 72.0
+        pix = page.get_pixmap(
+            matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False,
+            colorspace=fitz.csGRAY if cinza else fitz.csRGB,
+        )
+        dados = codificar_pixmap(pix, formato)
+        pix = None  # Libera os pixels antes de renderizar o próximo degrau
+        if len(dados) <= orcamento_bytes:
+            break
+
+    descricao = f"{dpi} DPI, {'cinza' if cinza else 'colorida'}, {formato}"
+    return dados, f"image/{formato.lower()}", descricao
+
+
+def assinatura_pagina(page):
+    """
+    Renderização da página em tons de cinza na resolução da sonda (normalizada e suavizada), com a
+    fração de tinta e o hash perceptual usados pelo filtro de páginas em branco e parecidas. As cópias
+    exatas são identificadas depois da codificação (ver _conteudo_enviado).
+    """
+    import fitz
+    from PIL import Image, ImageFilter, ImageOps
+
+    pix = page.get_pixmap(dpi=DPI_SONDA, colorspace=fitz.csGRAY, alpha=False)
+    img = Image.frombytes("L", [pix.width, pix.height], pix.samples)
+
+    # Tinta: pixels bem mais escuros que o papel (a mediana), para ignorar fundo acinzentado e ruído
+    histograma = img.histogram()
+    total = img.width * img.height
+    acumulado = 0
+    for papel, quantidade in enumerate(histograma):
+        acumulado += quantidade
+        if acumulado >= total / 2:
+            break
+    tinta = sum(histograma[:max(0, papel - LIMIAR_TINTA)]) / total
+
+    normalizada = ImageOps.autocontrast(img, cutoff=1).filter(ImageFilter.BoxBlur(1))
+    reduzida = normalizada.resize((LADO_HASH + 1, LADO_HASH), Image.BOX).tobytes()
+    hash_perceptual = 0
+    for y in range(LADO_HASH):
+        for x in range(LADO_HASH):
+            i = y * (LADO_HASH + 1) + x
+            hash_perceptual = hash_perceptual << 1 | (reduzida[i] > reduzida[i + 1])
+    return {"tinta": tinta, "hash": hash_perceptual, "tamanho": normalizada.size, "pixels": normalizada.tobytes()}
+
+
+def _conteudo_enviado(pagina):
+    """SHA-256 do que a página envia à IA (imagem codificada e texto): iguais, uma página nada acrescenta."""
+    conteudo = hashlib.sha256(pagina.get("imagem", b""))
+    conteudo.update((pagina.get("texto") or "").encode("utf-8"))
+    return conteudo.hexdigest()
+
+
+def _deslocamento(perfil_a, perfil_b, maximo):
+    """Deslocamento (em pixels) que melhor alinha dois perfis de intensidade."""
+    n = len(perfil_a)
+    return min(
+        range(-maximo, maximo + 1),
+        key=lambda d: sum(abs(perfil_a[i] - perfil_b[i - d]) for i in range(maximo, n - maximo)),
+    )
+
+
+def _paginas_parecidas(a, b):
+    """
+    Compara duas assinaturas: candidatas pelo hash perceptual e confirmadas bloco a bloco depois de
+    alinhadas (pelos perfis de linhas e colunas), para tolerar o deslocamento entre digitalizações.
+    Não distingue mudanças no texto (a sonda é de baixa resolução): serve só para avisar o professor.
+    """
+    from PIL import Image, ImageChops
+
+    if a["tamanho"] != b["tamanho"] or bin(a["hash"] ^ b["hash"]).count("1") > MAX_DISTANCIA_HASH:
+        return False
+    img_a = Image.frombytes("L", a["tamanho"], a["pixels"])
+    img_b = Image.frombytes("L", b["tamanho"], b["pixels"])
+    largura, altura = img_a.size
+    maximo = MAX_DESLOCAMENTO_PX
+    dy = _deslocamento(img_a.resize((1, altura), Image.BOX).tobytes(), img_b.resize((1, altura), Image.BOX).tobytes(), maximo)
+    dx = _deslocamento(img_a.resize((largura, 1), Image.BOX).tobytes(), img_b.resize((largura, 1), Image.BOX).tobytes(), maximo)
+
+    # O offset dá a volta na borda: a margem recortada descarta essas faixas
+    margem = (maximo + 1, maximo + 1, largura - maximo - 1, altura - maximo - 1)
+    referencia = img_a.crop(margem)
+    blocos = (referencia.width // LADO_BLOCO_COMPARACAO, referencia.height // LADO_BLOCO_COMPARACAO)
+    if min(blocos) < 1:
+        return False
+    for ajuste_y in (-1, 0, 1):
+        for ajuste_x in (-1, 0, 1):
+            alinhada = ImageChops.offset(img_b, dx + ajuste_x, dy + ajuste_y).crop(margem)
+            diferenca = ImageChops.difference(referencia, alinhada).resize(blocos, Image.BOX)
+            if max(diferenca.tobytes()) <= MAX_DIFERENCA_BLOCO:
+                return True
+    return False
+
+
+def filtrar_paginas(paginas):
+    """
+    Descarta as cópias exatas de páginas anteriores: páginas de imagem com a mesma imagem codificada
+    (e o mesmo texto) e páginas de texto com o mesmo texto. Páginas de imagem só parecidas com uma anterior continuam e recebem
+    'parecida_com' (o número da outra), para o professor conferir. Gera as páginas (de uma lista ou de
+    outro gerador) à medida que chegam; as descartadas continuam (para o relatório), com modo
+    'descartada' e o motivo, sem a imagem. Remove as assinaturas calculadas na conversão.
+    """
+    imagens, conteudos, textos = [], {}, {}
+    for pagina in paginas:
+        assinatura = pagina.pop("assinatura", None)
+        original = None
+        if assinatura is not None:
+            original = conteudos.setdefault(assinatura["conteudo"], pagina["pagina"])
+            if original == pagina["pagina"]:
+                original = None
+                parecida = next((numero for numero, outra in imagens if _paginas_parecidas(assinatura, outra)), None)
+                if parecida is not None:
+                    pagina["parecida_com"] = parecida
+                else:
+                    imagens.append((pagina["pagina"], assinatura))
+        elif pagina["modo"] == "texto":
+            original = textos.setdefault(pagina["texto"], pagina["pagina"])
+            if original == pagina["pagina"]:
+                original = None
+        if original is not None:
+            for campo in ("imagem", "mime_type", "codificacao", "bytes_referencia"):
+                pagina.pop(campo, None)
+            pagina["modo"], pagina["motivo"] = "descartada", f"repete a página {original}"
+        yield pagina
+
+
+def _codificar_figuras(page, regioes, dpi, orcamento_pagina):
+    """Recortes das figuras da página, dividindo entre elas o orçamento da página."""
+    dpi_figura = min(dpi, DPI_MAX_FIGURA)
+    figuras = []
+    for regiao in regioes:
+        if orcamento_pagina:
+            imagem, mime_type, codificacao = codificar_pagina_adaptativa(
+                page, orcamento_pagina["bytes"] / len(regioes), orcamento_pagina["tokens"] / len(regioes),
+                dpi_max=dpi_figura, regiao=regiao,
+            )
+        else:
+            imagem, mime_type = renderizar_pagina_jpeg(page, dpi=dpi_figura, regiao=regiao), "image/jpeg"
+            codificacao = f"{dpi_figura} DPI, colorida, JPEG"
+        figuras.append({"tipo": "figura", "imagem": imagem, "mime_type": mime_type, "codificacao": codificacao})
+    return figuras
+
+
+def _converter_pagina(page, dpi, usar_camada_texto, orcamento_pagina=None, medir_economia=False, hibrido=True, filtrar=True):
+    """Converte uma página do PDF no dict descrito em converter_pdf_em_paginas."""
+    if usar_camada_texto:
+        modo, motivo, texto = analisar_pagina_pdf(page, hibrido=hibrido)
+    else:
+        modo, motivo, texto = "imagem", "envio como texto desativado", extrair_texto_legivel(page)
+
+    pagina = {"pagina": page.number + 1, "modo": modo, "motivo": motivo}
+    if texto:
+        pagina["texto"] = texto
+    if modo == "misto":
+        segmentos = segmentar_pagina(page)
+        regioes = [conteudo for tipo, conteudo in segmentos if tipo == "figura"]
+        if not regioes:
+            # O classificador usa o mesmo critério do recorte; se ainda assim nada for recortado, a página
+            # vai inteira como imagem para que as figuras não se percam
+            modo = pagina["modo"] = "imagem"
+            pagina["motivo"] = "nenhuma figura recortável"
+    if filtrar and modo == "imagem":
+        # Páginas em branco saem antes da codificação; as repetidas, no filtro que compara com as anteriores
+        assinatura = assinatura_pagina(page)
+        if not texto and assinatura["tinta"] < MAX_FRACAO_TINTA_BRANCA:
+            pagina["modo"], pagina["motivo"] = "descartada", "página em branco"
+            return pagina
+    if modo == "misto":
+        figuras = iter(_codificar_figuras(page, regioes, dpi, orcamento_pagina))
+        pagina["segmentos"] = [
+            {"tipo": "texto", "texto": conteudo} if tipo == "texto" else next(figuras)
+            for tipo, conteudo in segmentos
+        ]
+        pagina["codificacao"] = "; ".join(s["codificacao"] for s in pagina["segmentos"] if s["tipo"] == "figura")
+        if medir_economia:
+            pagina["bytes_referencia"] = len(renderizar_pagina_jpeg(page, dpi=dpi))
+    elif modo == "imagem" and orcamento_pagina:
+        pagina["imagem"], pagina["mime_type"], pagina["codificacao"] = codificar_pagina_adaptativa(
+            page, orcamento_pagina["bytes"], orcamento_pagina["tokens"], dpi_max=dpi
+        )
+        if medir_economia:
+            pagina["bytes_referencia"] = len(renderizar_pagina_jpeg(page, dpi=dpi))
+    elif modo == "imagem":
+        pagina["imagem"] = renderizar_pagina_jpeg(page, dpi=dpi)
+        pagina["mime_type"] = "image/jpeg"
+        pagina["codificacao"] = f"{dpi} DPI, colorida, JPEG"
+    if filtrar and modo == "imagem":
+        assinatura["conteudo"] = _conteudo_enviado(pagina)
+        pagina["assinatura"] = assinatura
+    return pagina
+
+
+def _gerar_paginas(pdf_bytes, indices, dpi, usar_camada_texto, orcamento_pagina=None, medir_economia=False,
+                   hibrido=True, filtrar=True, limite_memoria=None):
+    """
+    Gera as páginas `indices` (a partir de 0) do PDF convertidas, uma a uma: só uma página fica renderizada
+    por vez. Com `limite_memoria`, levanta MemoriaExcedida antes de renderizar uma página que levaria o
+    arquivo, as páginas já geradas (que quem consome guarda até a requisição) e o pixmap acima do limite.
+    """
+    import fitz
+
+    usado = len(pdf_bytes)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page_num in indices:
+            page = doc.load_page(page_num)
+            if limite_memoria and usado + bytes_conversao_pagina(page, dpi, filtrar) > limite_memoria:
+                raise _memoria_excedida(limite_memoria, page_num + 1)
+            pagina = _converter_pagina(page, dpi, usar_camada_texto, orcamento_pagina, medir_economia, hibrido, filtrar)
+            usado += tamanho_pagina(pagina)
+            yield pagina
+
+
+def _converter_paginas(pdf_bytes, indices, *argumentos):
+    """Lista das páginas `indices` convertidas; executada dentro dos processos do pool."""
+    return list(_gerar_paginas(pdf_bytes, indices, *argumentos))
+
+
+def obter_pool_processos():
+    """Retorna o pool de processos (renderização e métricas), criado uma única vez por processo do servidor."""
+    global _pool_renderizacao
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    with _pool_lock:
+        if _pool_renderizacao is None:
+            # 'spawn' evita herdar as threads do servidor Streamlit via fork
+            _pool_renderizacao = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool_renderizacao
+
+
+def descartar_pool_processos():
+    global _pool_renderizacao
+    with _pool_lock:
+        if _pool_renderizacao is not None:
+            _pool_renderizacao.shutdown(wait=False, cancel_futures=True)
+            _pool_renderizacao = None
+
+
+def _dividir_intervalos(total, partes):
+    """Divide [0, total) em até `partes` intervalos contíguos de tamanho parecido."""
+    partes = max(1, min(partes, total))
+    tamanho, resto = divmod(total, partes)
+    intervalos, inicio = [], 0
+    for i in range(partes):
+        fim = inicio + tamanho + (1 if i < resto else 0)
+        intervalos.append((inicio, fim))
+        inicio = fim
+    return intervalos
+
+
+def bytes_imagens(pagina):
+    """Bytes de imagem enviados por uma página convertida (a página inteira ou os recortes das figuras)."""
+    if "imagem" in pagina:
+        return len(pagina["imagem"])
+    return sum(len(segmento["imagem"]) for segmento in pagina.get("segmentos", ()) if segmento["tipo"] == "figura")
+
+
+def tamanho_pagina(pagina):
+    """Memória aproximada, em bytes, de uma página convertida (imagens, texto e assinatura do filtro)."""
+    assinatura = pagina.get("assinatura")
+    return (
+        bytes_imagens(pagina) + len((pagina.get("texto") or "").encode("utf-8"))
+        + (len(assinatura["pixels"]) if assinatura else 0)
+    )
+
+
+def _registrar_economia(paginas):
+    """
+    Registra no log os bytes enviados de um documento e, em DEBUG, os economizados em relação à
+    renderização fixa (medidos renderizando de novo cada página, por isso só nesse nível de log).
+    """
+    enviados = sum(bytes_imagens(p) for p in paginas)
+    referencia = sum(p.get("bytes_referencia", 0) for p in paginas)
+    logger.info("Documento com %d página(s): %d KB de imagens enviados", len(paginas), enviados // 1024)
+    if referencia:
+        logger.debug(
+            "Economia do documento: %d KB (%.0f%%) em relação a JPEG fixo",
+            (referencia - enviados) // 1024, 100 * (1 - enviados / referencia),
+        )
+
+
+def _preparar_conversao(pdf_bytes, paginas_selecionadas, adaptativo, orcamento_bytes, orcamento_tokens):
+    """Índices (a partir de 0) das páginas a converter e a parte do orçamento da requisição de cada uma."""
+    import fitz
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        indices = list(range(len(doc)))
+    if paginas_selecionadas is not None:
+        indices = sorted({numero - 1 for numero in paginas_selecionadas if 1 <= numero <= len(indices)})
+    orcamento_pagina = None
+    if adaptativo and indices:
+        # Divisão conservadora: páginas enviadas como texto não consomem sua parte do orçamento
+        orcamento_pagina = {"bytes": orcamento_bytes / len(indices), "tokens": orcamento_tokens / len(indices)}
+    return indices, orcamento_pagina
+
+
+def iterar_paginas_pdf(pdf_bytes, dpi=300, usar_camada_texto=True, adaptativo=True,
+                       orcamento_bytes=ORCAMENTO_BYTES_REQUISICAO, orcamento_tokens=ORCAMENTO_TOKENS_REQUISICAO,
+                       hibrido=True, filtrar=True, paginas_selecionadas=None, limite_memoria=LIMITE_MEMORIA_REQUISICAO):
+    """
+    Versão em série e sob demanda de converter_pdf_em_paginas: gera as páginas uma a uma, sem manter
+    mais de uma página renderizada, e levanta MemoriaExcedida antes de passar de `limite_memoria` bytes
+    (o arquivo, as páginas já geradas e o pixmap da próxima; 0 desativa o limite).
+    """
+    indices, orcamento_pagina = _preparar_conversao(pdf_bytes, paginas_selecionadas, adaptativo, orcamento_bytes, orcamento_tokens)
+    paginas = _gerar_paginas(
+        pdf_bytes, indices, dpi, usar_camada_texto, orcamento_pagina, False, hibrido, filtrar, limite_memoria
+    )
+    return filtrar_paginas(paginas) if filtrar else paginas
+
+
+def _reserva_intervalo(pdf_bytes, indices, dpi, orcamento_pagina, filtrar=True):
+    """
+    Memória estimada de um intervalo em andamento no pool: o pico da maior página (cada worker
+    converte uma por vez; ver bytes_conversao_pagina) e as imagens codificadas (a parte do orçamento
+    de cada página ou, sem orçamento, um JPEG de ~1/8 do pixmap).
+    """
+    import fitz
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        paginas = [doc.load_page(indice) for indice in indices]
+        picos = [bytes_conversao_pagina(page, dpi, filtrar) for page in paginas]
+        pixmaps = [bytes_pixmap(page, dpi) for page in paginas]
+    saida = sum(orcamento_pagina["bytes"] for _ in indices) if orcamento_pagina else sum(pixmaps) // 8
+    return max(picos) + saida
+
+
+def _converter_em_paralelo(pdf_bytes, indices, intervalos, argumentos, limite_memoria):
+    """
+    Converte os intervalos no pool de processos, em ordem. Com `limite_memoria`, um intervalo só é
+    enviado ao pool se a memória já usada mais a reservada para os intervalos em andamento couber no
+    limite; senão espera os anteriores terminarem (e levanta MemoriaExcedida se nem sozinho couber).
+    """
+    import collections
+
+    dpi, orcamento_pagina, filtrar = argumentos[0], argumentos[2], argumentos[5]
+    pool = obter_pool_processos()
+    paginas, usado, em_andamento = [], len(pdf_bytes), collections.deque()
+
+    def receber():
+        nonlocal usado
+        futuro, _ = em_andamento.popleft()
+        lote = futuro.result()
+        paginas.extend(lote)
+        usado += sum(tamanho_pagina(pagina) for pagina in lote)
+        if limite_memoria and usado > limite_memoria:
+            raise _memoria_excedida(limite_memoria, lote[-1]["pagina"])
+
+    try:
+        for inicio, fim in intervalos:
+            reserva = _reserva_intervalo(pdf_bytes, indices[inicio:fim], dpi, orcamento_pagina, filtrar) if limite_memoria else 0
+            while limite_memoria and em_andamento and usado + sum(r for _, r in em_andamento) + reserva > limite_memoria:
+                receber()
+            if limite_memoria and usado + reserva > limite_memoria:
+                raise _memoria_excedida(limite_memoria, indices[inicio] + 1)
+            em_andamento.append((pool.submit(_converter_paginas, pdf_bytes, indices[inicio:fim], *argumentos), reserva))
+        while em_andamento:
+            receber()
+    finally:
+        for futuro, _ in em_andamento:
+            futuro.cancel()
+    return paginas
+
+
+def converter_pdf_em_paginas(pdf_bytes, dpi=300, usar_camada_texto=True, workers=None, adaptativo=True,
+                             orcamento_bytes=ORCAMENTO_BYTES_REQUISICAO, orcamento_tokens=ORCAMENTO_TOKENS_REQUISICAO,
+                             hibrido=True, filtrar=True, paginas_selecionadas=None, limite_memoria=LIMITE_MEMORIA_REQUISICAO):
+    """
+    Converte bytes de um PDF em uma lista de páginas (uma por página do documento, em ordem), ou só das
+    `paginas_selecionadas` (números a partir de 1), sem renderizar as demais.
+    Cada página é um dict com 'pagina', 'modo' ('texto', 'misto', 'imagem' ou 'descartada'), 'motivo', 'texto'
+    (a camada de texto legível, se houver) e, no modo imagem, 'imagem' (bytes), 'mime_type' e 'codificacao'.
+    Com `hibrido`, as páginas com texto e figuras vão no modo misto: 'segmentos' com o texto e os
+    recortes das figuras ('imagem', 'mime_type', 'codificacao') na ordem de leitura.
+    Com `filtrar`, as páginas em branco e as repetidas são descartadas (não vão para a IA).
+    Com `adaptativo`, o orçamento de bytes e tokens da requisição é dividido entre as páginas
+    e cada uma é codificada com a resolução (até `dpi`), cor e formato que cabem na sua parte.
+    Documentos grandes são divididos em intervalos de páginas renderizados em paralelo
+    por um pool de processos; `workers` (padrão: RENDER_WORKERS) define o paralelismo
+    desejado e 1 força a renderização em série. Levanta MemoriaExcedida se as páginas convertidas
+    passarem de `limite_memoria` bytes (ver iterar_paginas_pdf).
+    """
+    workers = RENDER_WORKERS if workers is None else workers
+    indices, orcamento_pagina = _preparar_conversao(pdf_bytes, paginas_selecionadas, adaptativo, orcamento_bytes, orcamento_tokens)
+    total_paginas = len(indices)
+    if not total_paginas:
+        return []
+
+    medir_economia = adaptativo and logger.isEnabledFor(logging.DEBUG)
+    argumentos = (dpi, usar_camada_texto, orcamento_pagina, medir_economia, hibrido, filtrar)
+
+    if workers <= 1 or total_paginas < MIN_PAGINAS_PARALELO:
+        paginas = list(_gerar_paginas(pdf_bytes, indices, *argumentos, limite_memoria))
+    else:
+        from concurrent.futures.process import BrokenProcessPool
+
+        # Mais intervalos que workers para equilibrar páginas pesadas e leves
+        intervalos = _dividir_intervalos(total_paginas, workers * 2)
+        try:
+            paginas = _converter_em_paralelo(pdf_bytes, indices, intervalos, argumentos, limite_memoria)
+        except BrokenProcessPool:
+            # Um worker morreu (ex: falta de memória): recria o pool na próxima chamada e converte em série
+            descartar_pool_processos()
+            paginas = list(_gerar_paginas(pdf_bytes, indices, *argumentos, limite_memoria))
+
+    if filtrar:
+        paginas = list(filtrar_paginas(paginas))
+    if adaptativo:
+        _registrar_economia(paginas)
+    return paginas
+
+
+def paginas_para_partes(paginas):
+    """Transforma as páginas convertidas em partes de conteúdo para o google.generativeai."""
+    partes = []
+    for pagina in paginas:
+        if pagina["modo"] == "descartada":
+            continue
+        if pagina["modo"] == "texto":
+            partes.append(f"[Página {pagina['pagina']} do arquivo]\n{pagina['texto']}")
+        elif pagina["modo"] == "misto":
+            cabecalho = f"[Página {pagina['pagina']} do arquivo]"
+            for segmento in pagina["segmentos"]:
+                if segmento["tipo"] == "texto":
+                    partes.append(f"{cabecalho}\n{segmento['texto']}" if cabecalho else segmento["texto"])
+                else:
+                    if cabecalho:
+                        partes.append(cabecalho)
+                    partes.append({'mime_type': segmento["mime_type"], 'data': segmento["imagem"]})
+                cabecalho = None
+        else:
+            partes.append({'mime_type': pagina["mime_type"], 'data': pagina["imagem"]})
+    return partes
+
+
+def extrair_paginas_texto(pdf_bytes, paginas_selecionadas=None):
+    """Texto legível de cada página, sem renderizar (para o relatório de legibilidade do envio nativo)."""
+    import fitz
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return [
+            {"pagina": numero, "texto": extrair_texto_legivel(page)}
+            for numero, page in enumerate(doc, start=1)
+            if paginas_selecionadas is None or numero in paginas_selecionadas
+        ]
+
+
+def contar_paginas_pdf(pdf_bytes):
+    """Número de páginas do PDF (sem renderizar nenhuma)."""
+    import fitz
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return len(doc)
+
+
+def contar_paginas_docx(docx_bytes):
+    """Número de páginas que o editor registrou nas propriedades do DOCX (docProps/app.xml), ou None."""
+    import re
+    import zipfile
+
+    try:
+        with zipfile.ZipFile(io.BytesIO(docx_bytes)) as arquivo:
+            propriedades = arquivo.read("docProps/app.xml").decode("utf-8", "ignore")
+    except (KeyError, zipfile.BadZipFile):
+        return None
+    paginas = re.search(r"<Pages>(\d+)</Pages>", propriedades)
+    return int(paginas.group(1)) if paginas else None
+
+
+def gerar_miniaturas(pdf_bytes, numeros, dpi=DPI_MINIATURA):
+    """Miniaturas JPEG das páginas `numeros` (a partir de 1), codificadas direto do pixmap em baixa resolução."""
+    import fitz
+
+    miniaturas = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for numero in numeros:
+            pix = doc.load_page(numero - 1).get_pixmap(dpi=dpi, alpha=False)
+            miniaturas.append({
+                "pagina": numero, "imagem": codificar_pixmap(pix, "JPEG", quality=QUALIDADE_JPEG_MINIATURA),
+                "mime_type": "image/jpeg",
+            })
+    return miniaturas
+
+
+def recortar_pdf(pdf_bytes, paginas_selecionadas):
+    """PDF só com as `paginas_selecionadas` (números a partir de 1), para o envio nativo de um trecho do arquivo."""
+    import fitz
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        doc.select([numero - 1 for numero in paginas_selecionadas])
+        return doc.tobytes(garbage=3, deflate=True)
@@ -0,0 +1,156 @@
+import collections
+import functools
+import re
+
+# --- LEGIBILIDADE EM PORTUGUÊS ---
+# Separação silábica por regras do português, com cache por palavra, e índices de legibilidade
+# calibrados para o português, calculados a partir de uma única passada pelo texto:
+# - Flesch (Martins et al., 1996): 248,835 - 1,015 x palavras/frase - 84,6 x sílabas/palavra
+# - Flesch-Kincaid (Martins et al., 1996): 0,36 x palavras/frase + 10,4 x sílabas/palavra - 18
+# - SMOG: fórmula original, contando como polissílabas as palavras de 4 ou mais sílabas,
+#   como na gramática portuguesa (o original em inglês conta 3 ou mais)
+# - Variedade lexical: palavras distintas / palavras, separando o texto original só por espaços (com
+#   maiúsculas e pontuação), como a aplicação sempre calculou
+
+MIN_SILABAS_POLISSILABA = 4
+MIN_PALAVRAS_FRASE = 3          # Fragmentos como "Questão 1." ou "a)" não contam como frase
+MIN_FRASES_SMOG = 3
+
+VOGAIS = set("aeiouáéíóúâêôãõàüy")
+SEMIVOGAIS = set("iuü")
+DITONGOS_NASAIS = {"ão", "ãe", "õe", "ãi"}
+ENCONTROS_INSEPARAVEIS = {
+    "pr", "br", "tr", "dr", "cr", "gr", "fr", "vr", "pl", "bl", "cl", "gl", "fl", "tl", "ch", "lh", "nh",
+    "gu", "qu",  # O "u" semivogal de gu/qu fica entre os núcleos: á-gua, a-guen-tar
+}
+
+_FIM_FRASE = re.compile(r"[.!?…]+|\n[ \t]*\n")
+_SEPARADORES = str.maketrans({c: " " for c in '0123456789,;:()[]{}"“”«»/\\|*+=<>%$#@&_~^`´–—•·°ºª§'})
+_PARTES_PALAVRA = re.compile(r"[-'’]")
+
+
+def _nucleos(palavra):
+    """Lista de (início, fim) dos núcleos vocálicos da palavra (em minúsculas)."""
+    nucleos = []
+    i, n = 0, len(palavra)
+    while i < n:
+        if palavra[i] not in VOGAIS:
+            i += 1
+            continue
+        # "u" de "gu"/"qu" antes de vogal é semivogal do ataque: quei-jo, guer-ra, a-guen-te
+        if palavra[i] in "uü" and i > 0 and palavra[i - 1] in "gq" and i + 1 < n and palavra[i + 1] in VOGAIS:
+            i += 1
+            continue
+        inicio = i
+        i += 1
+        # Um núcleo tem no máximo duas vogais (ca-iu, sa-iu); tritongos só aparecem depois de gu/qu
+        if i < n and palavra[i] in VOGAIS and _mesmo_nucleo(palavra, i):
+            i += 1
+        nucleos.append((inicio, i))
+    return nucleos
+
+
+def _mesmo_nucleo(palavra, i):
+    """Indica se a vogal em `i` forma ditongo com a anterior (senão há hiato)."""
+    anterior, atual = palavra[i - 1], palavra[i]
+    if anterior + atual in DITONGOS_NASAIS:
+        return True
+    if atual not in SEMIVOGAIS:
+        return False  # forte + forte (po-e-ta) e fraca + forte (di-a, ti-o) são hiatos
+    # Vogal + semivogal é ditongo (pai, cou-ro, fui), exceto antes de "nh" ou de r, l, m, n, z
+    # que fecham a sílaba: ra-i-nha, ca-ir, ju-iz, ru-im, a-in-da
+    resto = palavra[i + 1:]
+    if resto.startswith("nh"):
+        return False
+    if resto[:1] in ("r", "l", "m", "n", "z") and (len(resto) == 1 or resto[1] not in VOGAIS and resto[1] != "h"):
+        return False
+    return anterior != atual  # xi-i-ta
+
+
+def _dividir_consoantes(grupo):
+    """Quantas consoantes entre dois núcleos ficam na sílaba anterior."""
+    if len(grupo) <= 1:
+        return 0
+    if grupo[-2:] in ENCONTROS_INSEPARAVEIS:
+        return len(grupo) - 2
+    return len(grupo) - 1
+
+
+@functools.lru_cache(maxsize=65536)
+def separar_silabas(palavra):
+    """Separa uma palavra em sílabas (ex: "avaliação" -> ("a", "va", "li", "a", "ção"))."""
+    minuscula = palavra.lower()
+    nucleos = _nucleos(minuscula)
+    if len(nucleos) <= 1:
+        return (palavra,)
+
+    silabas = []
+    inicio = 0
+    for (_, fim), (proximo, _) in zip(nucleos, nucleos[1:]):
+        corte = fim + _dividir_consoantes(minuscula[fim:proximo])
+        silabas.append(palavra[inicio:corte])
+        inicio = corte
+    silabas.append(palavra[inicio:])
+    return tuple(silabas)
+
+
+@functools.lru_cache(maxsize=65536)
+def contar_silabas(palavra):
+    """Número de sílabas (mínimo 1, inclusive para siglas e palavras sem vogal)."""
+    return sum(len(separar_silabas(parte)) for parte in _PARTES_PALAVRA.split(palavra) if parte) or 1
+
+
+def segmentar(texto):
+    """
+    Uma passada pelo texto: retorna as contagens de palavras, frases, sílabas e polissílabas
+    e o número de palavras distintas (sem diferenciar maiúsculas), além dos tokens do texto original
+    separado só por espaços e dos distintos entre eles (base da variedade lexical e do mínimo de palavras).
+    """
+    brutos = texto.split()
+    ocorrencias = collections.Counter()
+    frases = 0
+    for frase in _FIM_FRASE.split(texto.lower().translate(_SEPARADORES)):
+        tokens = frase.split()
+        frases += len(tokens) >= MIN_PALAVRAS_FRASE
+        ocorrencias.update(tokens)
+
+    # As sílabas são contadas uma vez por palavra distinta
+    palavras = silabas = polissilabas = distintas = 0
+    for token, vezes in ocorrencias.items():
+        palavra = token.strip("-'’")
+        if not any(c.isalpha() for c in palavra):
+            continue
+        n = contar_silabas(palavra)
+        palavras += vezes
+        silabas += n * vezes
+        polissilabas += vezes if n >= MIN_SILABAS_POLISSILABA else 0
+        distintas += 1
+    return {
+        "palavras": palavras,
+        "frases": max(1, frases),
+        "silabas": silabas,
+        "polissilabas": polissilabas,
+        "palavras_distintas": distintas,
+        "tokens": len(brutos),
+        "tokens_distintos": len(set(brutos)),
+    }
+
+
+def indices_legibilidade(texto):
+    """Flesch, Flesch-Kincaid e SMOG para o português e a variedade lexical, com as contagens usadas."""
+    c = segmentar(texto)
+    variedade_lexical = c["tokens_distintos"] / c["tokens"] if c["tokens"] else 0.0
+    if not c["palavras"]:
+        return dict(c, flesch=0.0, flesch_kincaid=0.0, smog=0.0, variedade_lexical=variedade_lexical)
+    palavras_por_frase = c["palavras"] / c["frases"]
+    silabas_por_palavra = c["silabas"] / c["palavras"]
+    smog = 0.0
+    if c["frases"] >= MIN_FRASES_SMOG:
+        smog = 1.043 * (30 * c["polissilabas"] / c["frases"]) ** 0.5 + 3.1291
+    return dict(
+        c,
+        flesch=248.835 - 1.015 * palavras_por_frase - 84.6 * silabas_por_palavra,
+        flesch_kincaid=0.36 * palavras_por_frase + 10.4 * silabas_por_palavra - 18,
+        smog=smog,
+        variedade_lexical=variedade_lexical,
+    )
@@ -0,0 +1,354 @@
+import atexit
+import logging
+import os
+import pathlib
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+# --- POOL DE CONVERSORES LIBREOFFICE ---
+# Mantém processos headless do LibreOffice vivos entre uploads, cada um com seu próprio perfil,
+# para que conversões concorrentes não disputem o mesmo perfil nem paguem a inicialização a cada arquivo.
+# Com o módulo `uno` disponível (pacotes python3-uno e libreoffice-script-provider-python, em packages.txt),
+# cada conversor é um soffice persistente controlado via socket. Sem ele (p.ex. um Python diferente do Python
+# do sistema, como no devcontainer), cada conversor reaproveita um perfil já inicializado e executa
+# `--convert-to` isolado; o servidor registra um aviso uma única vez, já que cada upload paga a inicialização.
+
+TIMEOUT_CONVERSAO = 60           # Mesmo limite da conversão original por subprocess
+TIMEOUT_FILA = 60                # Espera máxima por um conversor livre
+TIMEOUT_INICIALIZACAO = 30
+NUM_CONVERSORES = int(os.environ.get("INCLUIA_LIBREOFFICE_WORKERS", 2))
+
+_pool = None
+_pool_lock = threading.Lock()
+_aviso_sem_uno_emitido = False
+
+logger = logging.getLogger(__name__)
+
+
+class ErroConversao(Exception):
+    """Falha do LibreOffice ao converter o documento (saída do processo em `detalhes`)."""
+
+    def __init__(self, mensagem, detalhes=""):
+        super().__init__(mensagem)
+        self.detalhes = detalhes
+
+
+class TempoEsgotadoConversao(ErroConversao):
+    """A conversão ou a espera por um conversor livre excedeu o tempo limite."""
+
+
+def _executavel_libreoffice():
+    return shutil.which("soffice") or shutil.which("libreoffice") or "libreoffice"
+
+
+def _uno_disponivel():
+    """Indica se o módulo `uno` pode ser importado; sem ele, avisa (uma vez) que o pool usará `--convert-to`."""
+    global _aviso_sem_uno_emitido
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError as e:
+        with _pool_lock:
+            if not _aviso_sem_uno_emitido:
+                _aviso_sem_uno_emitido = True
+                logger.warning(
+                    "Módulo `uno` do LibreOffice indisponível neste Python (%s): os DOCX serão convertidos "
+                    "com `soffice --convert-to`, pagando a inicialização do LibreOffice a cada arquivo.",
+                    e,
+                )
+        return False
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _encerrar_processo(processo):
+    """Mata o processo e seus filhos (o soffice inicia o soffice.bin em segundo plano)."""
+    if processo is None or processo.poll() is not None:
+        return
+    try:
+        os.killpg(processo.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    processo.wait()
+
+
+def _executar_libreoffice(argumentos, timeout):
+    """Executa o LibreOffice em um grupo de processos próprio e retorna (código de saída, stderr)."""
+    try:
+        processo = subprocess.Popen(
+            [_executavel_libreoffice(), "--headless", *argumentos],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+    except OSError as e:
+        raise ErroConversao("Não foi possível executar o LibreOffice.", str(e)) from e
+    try:
+        _, stderr = processo.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _encerrar_processo(processo)
+        raise TempoEsgotadoConversao("A conversão do documento demorou muito e foi interrompida.")
+    return processo.returncode, stderr.decode('utf-8', 'ignore')
+
+
+def _executar_com_limite(funcao, timeout):
+    """
+    Executa `funcao` em uma thread auxiliar e espera no máximo `timeout` segundos.
+    Retorna (concluiu, erro): chamadas UNO não têm tempo limite próprio, e um soffice travado
+    prenderia quem as fez; a thread presa é liberada quando o processo é derrubado.
+    """
+    resultado = {}
+
+    def executar():
+        try:
+            funcao()
+        except Exception as e:
+            resultado["erro"] = e
+
+    tarefa = threading.Thread(target=executar, daemon=True)
+    tarefa.start()
+    tarefa.join(timeout)
+    return not tarefa.is_alive(), resultado.get("erro")
+
+
+def _propriedade(nome, valor):
+    from com.sun.star.beans import PropertyValue
+
+    prop = PropertyValue()
+    prop.Name, prop.Value = nome, valor
+    return prop
+
+
+class ConversorLibreOffice:
+    """Um conversor do pool: perfil isolado e, se houver UNO, um soffice headless persistente."""
+
+    def __init__(self, indice, usar_uno=None):
+        self.indice = indice
+        self.usar_uno = _uno_disponivel() if usar_uno is None else usar_uno
+        self.perfil = tempfile.mkdtemp(prefix=f"incluia-lo-{indice}-")
+        self.processo = None
+        self.iniciado = False
+        self._desktop = None
+
+    @property
+    def _argumento_perfil(self):
+        return f"-env:UserInstallation={pathlib.Path(self.perfil).as_uri()}"
+
+    def iniciar(self):
+        """Inicia o conversor. Sem UNO, apenas cria o perfil (a primeira execução é a mais lenta)."""
+        if not self.usar_uno:
+            _executar_libreoffice([self._argumento_perfil, "--terminate_after_init"], TIMEOUT_INICIALIZACAO)
+            self.iniciado = True
+            return
+        porta = _porta_livre()
+        try:
+            self.processo = subprocess.Popen(
+                [
+                    _executavel_libreoffice(), "--headless", "--invisible", "--nologo", "--norestore",
+                    "--nodefault", self._argumento_perfil,
+                    f"--accept=socket,host=127.0.0.1,port={porta};urp;StarOffice.ComponentContext",
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        except OSError as e:
+            raise ErroConversao("Não foi possível executar o LibreOffice.", str(e)) from e
+        self._desktop = self._conectar(porta)
+        self.iniciado = True
+
+    def _conectar(self, porta):
+        import uno
+
+        local = uno.getComponentContext()
+        resolvedor = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        limite = time.monotonic() + TIMEOUT_INICIALIZACAO
+        while True:
+            try:
+                contexto = resolvedor.resolve(f"uno:socket,host=127.0.0.1,port={porta};urp;StarOffice.ComponentContext")
+                return contexto.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", contexto)
+            except Exception:
+                if self.processo.poll() is not None or time.monotonic() > limite:
+                    _encerrar_processo(self.processo)
+                    raise ErroConversao("Não foi possível iniciar o LibreOffice em modo servidor.")
+                time.sleep(0.25)
+
+    def saudavel(self, timeout=TIMEOUT_CONVERSAO):
+        """
+        Verificação de saúde feita antes de cada conversão. Com UNO, o soffice precisa estar vivo e
+        responder dentro de `timeout`; um soffice travado conta como doente e é reiniciado pelo pool.
+        """
+        if not self.iniciado or not os.path.isdir(self.perfil):
+            return False
+        if not self.usar_uno:
+            return True
+        if self.processo is None or self.processo.poll() is not None:
+            return False
+        concluiu, erro = _executar_com_limite(self._desktop.getComponents, timeout)
+        return concluiu and erro is None
+
+    def reiniciar(self):
+        self.encerrar(remover_perfil=False)
+        os.makedirs(self.perfil, exist_ok=True)
+        self.iniciar()
+
+    def encerrar(self, remover_perfil=True):
+        _encerrar_processo(self.processo)
+        self.processo = None
+        self._desktop = None
+        self.iniciado = False
+        if remover_perfil:
+            shutil.rmtree(self.perfil, ignore_errors=True)
+
+    def converter(self, docx_path, pasta_saida, timeout=TIMEOUT_CONVERSAO):
+        """Converte o DOCX em PDF dentro de `pasta_saida` e retorna o caminho do PDF."""
+        pdf_path = os.path.join(pasta_saida, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+        if self.usar_uno:
+            self._converter_uno(docx_path, pdf_path, timeout)
+        else:
+            self._converter_subprocess(docx_path, pasta_saida, timeout)
+
+        if not os.path.exists(pdf_path):
+            raise ErroConversao("O arquivo PDF não foi encontrado após a execução do LibreOffice.")
+        return pdf_path
+
+    def _converter_uno(self, docx_path, pdf_path, timeout):
+        import uno
+
+        def executar():
+            doc = self._desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(docx_path), "_blank", 0, (_propriedade("Hidden", True),)
+            )
+            try:
+                doc.storeToURL(uno.systemPathToFileUrl(pdf_path), (_propriedade("FilterName", "writer_pdf_Export"),))
+            finally:
+                doc.close(True)
+
+        concluiu, erro = _executar_com_limite(executar, timeout)
+        if not concluiu:
+            # Travou: derruba o soffice (o que também libera a thread); se não subir de novo
+            # agora, a verificação de saúde da próxima conversão tenta outra vez
+            try:
+                self.reiniciar()
+            except Exception:
+                self.encerrar(remover_perfil=False)
+            raise TempoEsgotadoConversao("A conversão do documento demorou muito e foi interrompida.")
+        if erro is not None:
+            raise ErroConversao("O LibreOffice não conseguiu converter o documento.", str(erro))
+
+    def _converter_subprocess(self, docx_path, pasta_saida, timeout):
+        codigo, stderr = _executar_libreoffice(
+            [self._argumento_perfil, "--convert-to", "pdf", "--outdir", pasta_saida, docx_path], timeout
+        )
+        if codigo != 0:
+            raise ErroConversao("O LibreOffice não conseguiu converter o documento.", stderr)
+
+
+class PoolLibreOffice:
+    """Fila de conversores LibreOffice compartilhada por todas as sessões do servidor."""
+
+    def __init__(self, tamanho=NUM_CONVERSORES, usar_uno=None):
+        self._conversores = [ConversorLibreOffice(i, usar_uno=usar_uno) for i in range(max(1, tamanho))]
+        self._livres = queue.Queue()
+        for conversor in self._conversores:
+            self._livres.put(conversor)
+        self._lock = threading.Lock()
+        self.estatisticas = {"conversoes": 0, "falhas": 0, "reinicios": 0, "espera_fila_s": 0.0}
+
+    def _contar(self, chave, valor=1):
+        with self._lock:
+            self.estatisticas[chave] += valor
+
+    def iniciar(self):
+        """
+        Inicia em paralelo os conversores livres ainda não iniciados (usado no aquecimento do servidor).
+        Cada um sai da fila enquanto inicia, de modo que uma conversão simultânea espera por ele em vez
+        de reiniciá-lo. Levanta o primeiro erro de inicialização, se houver.
+        """
+        erros = []
+
+        def iniciar_e_devolver(conversor):
+            try:
+                conversor.iniciar()
+            except Exception as e:
+                erros.append(e)
+            finally:
+                self._livres.put(conversor)
+
+        livres = []
+        while True:
+            try:
+                livres.append(self._livres.get_nowait())
+            except queue.Empty:
+                break
+        tarefas = []
+        for conversor in livres:
+            if conversor.iniciado:
+                self._livres.put(conversor)
+            else:
+                tarefas.append(threading.Thread(target=iniciar_e_devolver, args=(conversor,), daemon=True))
+        for tarefa in tarefas:
+            tarefa.start()
+        for tarefa in tarefas:
+            tarefa.join()
+        if erros:
+            raise erros[0]
+
+    def converter_docx_em_pdf(self, docx_bytes, timeout=TIMEOUT_CONVERSAO):
+        """Converte bytes de DOCX em bytes de PDF usando o próximo conversor livre."""
+        inicio_espera = time.monotonic()
+        try:
+            conversor = self._livres.get(timeout=TIMEOUT_FILA)
+        except queue.Empty:
+            raise TempoEsgotadoConversao("Todos os conversores de documentos estão ocupados. Tente novamente.")
+        self._contar("espera_fila_s", time.monotonic() - inicio_espera)
+
+        try:
+            if not conversor.saudavel(timeout=timeout):
+                if conversor.iniciado:
+                    self._contar("reinicios")
+                conversor.reiniciar()
+
+            with tempfile.TemporaryDirectory(prefix="incluia-docx-") as pasta:
+                docx_path = os.path.join(pasta, "documento.docx")
+                with open(docx_path, "wb") as f_docx:
+                    f_docx.write(docx_bytes)
+                pdf_path = conversor.converter(docx_path, pasta, timeout=timeout)
+                with open(pdf_path, "rb") as f_pdf:
+                    pdf_bytes = f_pdf.read()
+            self._contar("conversoes")
+            return pdf_bytes
+        except ErroConversao:
+            self._contar("falhas")
+            raise
+        finally:
+            self._livres.put(conversor)
+
+    def encerrar(self):
+        for conversor in self._conversores:
+            conversor.encerrar()
+
+
+def obter_pool():
+    """Retorna o pool do processo do servidor, criando-o na primeira chamada."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolLibreOffice()
+            atexit.register(_pool.encerrar)
+        return _pool
+
+
+def converter_docx_em_pdf(docx_bytes, timeout=TIMEOUT_CONVERSAO):
+    """Atalho para converter um DOCX usando o pool compartilhado."""
+    return obter_pool().converter_docx_em_pdf(docx_bytes, timeout=timeout)
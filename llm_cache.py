@@ -0,0 +1,165 @@
+import contextlib
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# --- CACHE DE RESPOSTAS DA IA ---
+# Adaptações idênticas (mesmo modelo, instrução de sistema, conteúdo enviado e prompt) são comuns
+# na rede de escolas. As respostas ficam em um SQLite local e, opcionalmente, em uma tabela do
+# Supabase para serem compartilhadas entre instâncias do servidor.
+
+CAMINHO_SQLITE = os.environ.get(
+    "INCLUIA_CACHE_RESPOSTAS_DB", os.path.join(tempfile.gettempdir(), "incluia_respostas.sqlite3")
+)
+TTL_SEGUNDOS = float(os.environ.get("INCLUIA_CACHE_RESPOSTAS_TTL_H", 24 * 7)) * 3600
+MAX_MB_SQLITE = int(os.environ.get("INCLUIA_CACHE_RESPOSTAS_MB", 64))
+
+_cache_local = None
+_cache_local_lock = threading.Lock()
+
+
+def _hash_parte(parte):
+    """Hash do conteúdo de uma parte enviada à IA (texto, dict {'mime_type', 'data'} ou bytes)."""
+    h = hashlib.sha256()
+    if isinstance(parte, dict):
+        h.update(str(parte.get("mime_type", "")).encode("utf-8"))
+        dados = parte.get("data", b"")
+        h.update(dados if isinstance(dados, bytes) else str(dados).encode("utf-8"))
+    elif isinstance(parte, bytes):
+        h.update(parte)
+    else:
+        h.update(str(parte).encode("utf-8"))
+    return h.hexdigest()
+
+
+def chave_resposta(modelo, system_instruction, partes_usuario, prompt):
+    """Chave do cache: modelo + hash da instrução de sistema + hash de cada parte + prompt formatado."""
+    h = hashlib.sha256()
+    for componente in (modelo, _hash_parte(system_instruction), *map(_hash_parte, partes_usuario), _hash_parte(prompt)):
+        h.update(componente.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class CacheRespostasSQLite:
+    """Armazenamento local das respostas, com TTL e descarte das menos acessadas acima do limite de tamanho."""
+
+    def __init__(self, caminho=CAMINHO_SQLITE, ttl=TTL_SEGUNDOS, max_bytes=MAX_MB_SQLITE * 1024 * 1024):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._conectar() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                " chave TEXT PRIMARY KEY, modelo TEXT, resposta TEXT,"
+                " criado_em REAL, acessado_em REAL, tamanho INTEGER)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (acessado_em)")
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        """Conexão de uma operação: confirma (ou desfaz) a transação e fecha a conexão ao sair."""
+        with contextlib.closing(sqlite3.connect(self.caminho, timeout=10)) as con, con:
+            yield con
+
+    def obter(self, chave):
+        agora = time.time()
+        with self._lock, self._conectar() as con:
+            linha = con.execute(
+                "SELECT resposta FROM respostas WHERE chave = ? AND criado_em > ?", (chave, agora - self.ttl)
+            ).fetchone()
+            if linha:
+                con.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (agora, chave))
+                return linha[0]
+        return None
+
+    def guardar(self, chave, modelo, resposta):
+        agora = time.time()
+        with self._lock, self._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?)",
+                (chave, modelo, resposta, agora, agora, len(resposta.encode("utf-8"))),
+            )
+            self._limitar(con, agora)
+
+    def _limitar(self, con, agora):
+        con.execute("DELETE FROM respostas WHERE criado_em <= ?", (agora - self.ttl,))
+        total = con.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excedente = total - self.max_bytes
+        removidas = []
+        for chave, tamanho in con.execute("SELECT chave, tamanho FROM respostas ORDER BY acessado_em"):
+            if excedente <= 0:
+                break
+            removidas.append((chave,))
+            excedente -= tamanho
+        con.executemany("DELETE FROM respostas WHERE chave = ?", removidas)
+
+
+class CacheRespostasSupabase:
+    """
+    Persistência das respostas em uma tabela do Supabase, compartilhada entre servidores.
+    A tabela precisa das colunas: chave (text, chave primária), modelo (text), resposta (text) e criado_em (float8).
+    """
+
+    def __init__(self, cliente, tabela, ttl=TTL_SEGUNDOS):
+        self.cliente = cliente
+        self.tabela = tabela
+        self.ttl = ttl
+
+    def obter(self, chave):
+        res = self.cliente.table(self.tabela).select('resposta, criado_em').eq('chave', chave).limit(1).execute()
+        if res.data and res.data[0]['criado_em'] > time.time() - self.ttl:
+            return res.data[0]['resposta']
+        return None
+
+    def guardar(self, chave, modelo, resposta):
+        self.cliente.table(self.tabela).upsert({
+            'chave': chave,
+            'modelo': modelo,
+            'resposta': resposta,
+            'criado_em': time.time(),
+        }).execute()
+
+
+class CacheRespostas:
+    """Consulta o cache local e depois o remoto (se configurado), gravando nos dois."""
+
+    def __init__(self, local, remoto=None):
+        self.local = local
+        self.remoto = remoto
+
+    def obter(self, chave):
+        resposta = self.local.obter(chave)
+        if resposta is not None or self.remoto is None:
+            return resposta
+        try:
+            resposta = self.remoto.obter(chave)
+        except Exception:
+            return None  # O cache remoto é opcional: uma falha nele não impede a adaptação
+        if resposta is not None:
+            self.local.guardar(chave, "", resposta)
+        return resposta
+
+    def guardar(self, chave, modelo, resposta):
+        self.local.guardar(chave, modelo, resposta)
+        if self.remoto is not None:
+            try:
+                self.remoto.guardar(chave, modelo, resposta)
+            except Exception:
+                pass
+
+
+def obter_cache_respostas(cliente_supabase=None, tabela_supabase=None):
+    """Retorna o cache de respostas; o SQLite local é único por processo do servidor."""
+    global _cache_local
+    with _cache_local_lock:
+        if _cache_local is None:
+            _cache_local = CacheRespostasSQLite()
+    remoto = CacheRespostasSupabase(cliente_supabase, tabela_supabase) if cliente_supabase and tabela_supabase else None
+    return CacheRespostas(_cache_local, remoto)
@@ -0,0 +1,249 @@
+import hashlib
+import os
+import random
+import threading
+import time
+
+import api_key_cache
+import context_cache
+import llm_cache
+import pdf_nativo
+
+# --- FUNÇÕES AUXILIARES DAS CHAMADAS À IA ---
+
+MARCADOR_JUSTIFICATIVAS = "# Justificativas:"
+
+# Limites por chave da API (padrão: plano gratuito do Gemini 2.5 Flash)
+LIMITE_RPM = float(os.environ.get("INCLUIA_LIMITE_RPM", 10))
+LIMITE_TPM = float(os.environ.get("INCLUIA_LIMITE_TPM", 250_000))
+
+# Retentativas de erros transitórios
+MAX_TENTATIVAS = 5
+ESPERA_BASE_S = 1.0
+ESPERA_MAX_S = 20.0
+PRAZO_TOTAL_S = 60.0             # Tempo máximo somando fila, chamadas e esperas entre tentativas
+CODIGOS_TRANSITORIOS = (429, 500, 503, 504)
+ESTADOS_TRANSITORIOS = ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL")
+
+TOKENS_ESTIMADOS_IMAGEM = 1548   # Página A4 em resolução de leitura: cerca de 6 blocos de 258 tokens
+TOKENS_ESTIMADOS_PAGINA_PDF = 560  # PDF nativo: 258 tokens da imagem da página mais o texto extraído
+
+_limitadores = {}
+_limitadores_lock = threading.Lock()
+_metricas = {"chamadas": 0, "retentativas": 0, "falhas": 0, "espera_fila_s": 0.0, "espera_retentativas_s": 0.0}
+_metricas_lock = threading.Lock()
+
+
+class LimiteTaxaExcedido(Exception):
+    """A fila da chave da API não libera a chamada dentro do prazo."""
+
+
+class BaldeTokens:
+    """
+    Balde de tokens que aceita dívida: cada reserva é descontada na hora e devolve quanto tempo
+    o chamador deve esperar, o que atende as chamadas na ordem em que chegaram.
+    """
+
+    def __init__(self, capacidade, taxa_por_segundo):
+        self.capacidade = capacidade
+        self.taxa = taxa_por_segundo
+        self.disponivel = capacidade
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar(self, quantidade):
+        with self._lock:
+            agora = time.monotonic()
+            self.disponivel = min(self.capacidade, self.disponivel + (agora - self._atualizado) * self.taxa)
+            self._atualizado = agora
+            self.disponivel -= min(quantidade, self.capacidade)
+            return max(0.0, -self.disponivel / self.taxa)
+
+    def devolver(self, quantidade):
+        with self._lock:
+            self.disponivel = min(self.capacidade, self.disponivel + min(quantidade, self.capacidade))
+
+
+class LimitadorChave:
+    """Limites de requisições e de tokens por minuto de uma chave da API."""
+
+    def __init__(self, rpm=LIMITE_RPM, tpm=LIMITE_TPM):
+        self.requisicoes = BaldeTokens(rpm, rpm / 60.0)
+        self.tokens = BaldeTokens(tpm, tpm / 60.0)
+
+    def reservar(self, tokens):
+        return max(self.requisicoes.reservar(1), self.tokens.reservar(tokens))
+
+    def devolver(self, tokens):
+        self.requisicoes.devolver(1)
+        self.tokens.devolver(tokens)
+
+
+def _id_chave(chave_api):
+    return hashlib.sha256((chave_api or "").encode("utf-8")).hexdigest()
+
+
+def definir_limites(chave_api, rpm=LIMITE_RPM, tpm=LIMITE_TPM):
+    """Define os limites de uma chave (ex: chaves de planos pagos ou o --rpm da adaptação em lote)."""
+    with _limitadores_lock:
+        _limitadores[_id_chave(chave_api)] = LimitadorChave(rpm, tpm)
+
+
+def obter_limitador(chave_api):
+    with _limitadores_lock:
+        return _limitadores.setdefault(_id_chave(chave_api), LimitadorChave())
+
+
+def _registrar(**valores):
+    with _metricas_lock:
+        for chave, valor in valores.items():
+            _metricas[chave] += valor
+
+
+def metricas():
+    """Contadores do processo: chamadas, retentativas, falhas e tempo esperado na fila e entre tentativas."""
+    with _metricas_lock:
+        return dict(_metricas)
+
+
+def erro_transitorio(erro):
+    """
+    Indica se vale repetir a chamada: erro da API com código ou estado transitório, ou falha de conexão
+    (as do google.genai chegam como httpx.TransportError: conexão recusada ou caída, tempo esgotado, protocolo).
+    """
+    import httpx
+
+    if isinstance(erro, (ConnectionError, TimeoutError, httpx.TransportError)):
+        return True
+    return (api_key_cache.codigo_erro_api(erro) in CODIGOS_TRANSITORIOS
+            or api_key_cache.estado_erro_api(erro) in ESTADOS_TRANSITORIOS)
+
+
+def estimar_tokens(partes):
+    """Estimativa grosseira dos tokens de entrada (4 caracteres por token; imagens e páginas de PDF com custo fixo)."""
+    total = 0
+    for parte in partes:
+        texto = parte if isinstance(parte, str) else getattr(parte, "text", None)
+        if isinstance(texto, str):  # Texto puro ou Part de texto do google.genai
+            total += len(texto) // 4
+            continue
+        pdf_bytes = pdf_nativo.dados_pdf(parte)
+        if pdf_bytes is not None:
+            total += TOKENS_ESTIMADOS_PAGINA_PDF * pdf_nativo.contar_paginas(pdf_bytes)
+        else:
+            total += TOKENS_ESTIMADOS_IMAGEM
+    return total
+
+
+def chamar_com_limites(chave_api, funcao, *args, tokens_estimados=0, prazo=PRAZO_TOTAL_S, estatisticas=None, **kwargs):
+    """
+    Executa `funcao(*args, **kwargs)` (uma chamada à API do Gemini) respeitando os limites da chave
+    e repetindo erros transitórios com espera exponencial aleatória até `prazo` segundos.
+    Se `estatisticas` for um dict, recebe a espera na fila e o número de retentativas desta chamada.
+    """
+    limitador = obter_limitador(chave_api)
+    limite = time.monotonic() + prazo
+    if estatisticas is not None:
+        estatisticas.update(espera_fila_s=0.0, retentativas=0)
+    tentativa = 0
+    while True:
+        espera = limitador.reservar(tokens_estimados)
+        if time.monotonic() + espera > limite:
+            limitador.devolver(tokens_estimados)
+            _registrar(falhas=1)
+            raise LimiteTaxaExcedido("Muitas requisições com esta chave da API. Tente novamente em instantes.")
+        if espera:
+            time.sleep(espera)
+        _registrar(espera_fila_s=espera)
+        if estatisticas is not None:
+            estatisticas["espera_fila_s"] += espera
+
+        try:
+            resultado = funcao(*args, **kwargs)
+            _registrar(chamadas=1)
+            return resultado
+        except Exception as e:
+            if api_key_cache.chave_erro_invalida(e):
+                api_key_cache.invalidar_chave_api(chave_api)  # Próximos logins voltam a pedir a chave
+            tentativa += 1
+            atraso = random.uniform(0, min(ESPERA_MAX_S, ESPERA_BASE_S * 2 ** tentativa))
+            if not erro_transitorio(e) or tentativa >= MAX_TENTATIVAS or time.monotonic() + atraso > limite:
+                _registrar(chamadas=1, falhas=1)
+                raise
+            _registrar(chamadas=1, retentativas=1, espera_retentativas_s=atraso)
+            if estatisticas is not None:
+                estatisticas["retentativas"] += 1
+            time.sleep(atraso)
+
+
+def dividir_resposta(texto):
+    """Separa a resposta da IA em (texto adaptado, justificativas); justificativas é None sem o marcador."""
+    if MARCADOR_JUSTIFICATIVAS in texto:
+        adaptado, justificativas = texto.split(MARCADOR_JUSTIFICATIVAS, 1)
+        return adaptado.strip(), justificativas.strip()
+    return texto.strip(), None
+
+
+class DivisorResposta:
+    """
+    Acumula os pedaços de uma resposta recebida em streaming e separa, à medida que chegam,
+    o texto adaptado das justificativas (o marcador pode chegar quebrado entre dois pedaços).
+    """
+
+    def __init__(self, marcador=MARCADOR_JUSTIFICATIVAS):
+        self.marcador = marcador
+        self.texto = ""
+
+    def adicionar(self, pedaco):
+        self.texto += pedaco
+
+    def _inicio_marcador_pendente(self):
+        """Posição de um possível início do marcador no fim do texto, ainda incompleto."""
+        for tamanho in range(min(len(self.marcador) - 1, len(self.texto)), 0, -1):
+            if self.texto.endswith(self.marcador[:tamanho]):
+                return len(self.texto) - tamanho
+        return len(self.texto)
+
+    @property
+    def adaptado_completo(self):
+        """Indica se o marcador já chegou, ou seja, se a seção adaptada terminou."""
+        return self.marcador in self.texto
+
+    @property
+    def adaptado(self):
+        if self.adaptado_completo:
+            return self.texto.split(self.marcador, 1)[0].strip()
+        return self.texto[:self._inicio_marcador_pendente()]
+
+    @property
+    def justificativas(self):
+        if self.adaptado_completo:
+            return self.texto.split(self.marcador, 1)[1].lstrip()
+        return None
+
+
+def gerar_resposta(chave_api, modelo, system_instruction, partes_usuario, prompt, cache_respostas=None,
+                   ignorar_cache=False, rasterizar_pdf=None):
+    """
+    Gera a resposta completa da IA para a instrução de sistema, as partes do usuário e o prompt,
+    consultando e alimentando o cache de respostas quando informado. Não usa o Streamlit.
+    PDFs nas partes vão nativamente; se o Gemini os recusar, são trocados por `rasterizar_pdf(pdf_bytes)`.
+    """
+    chave_cache = llm_cache.chave_resposta(modelo, system_instruction, partes_usuario, prompt)
+    resposta = None
+    if cache_respostas is not None and not ignorar_cache:
+        resposta = cache_respostas.obter(chave_cache)
+    if resposta is None:
+        def chamar(model, conteudo):
+            return chamar_com_limites(chave_api, model.generate_content, conteudo, tokens_estimados=estimar_tokens(conteudo))
+
+        response = pdf_nativo.gerar_com_pdf(
+            chave_api,
+            partes_usuario,
+            lambda partes: context_cache.gerar_com_instrucao(chave_api, modelo, system_instruction, partes + [prompt], chamar),
+            rasterizar_pdf,
+        )
+        resposta = response.text.strip()
+        if resposta and cache_respostas is not None:
+            cache_respostas.guardar(chave_cache, modelo, resposta)
+    return resposta
@@ -0,0 +1,210 @@
+import collections
+import hashlib
+import re
+import threading
+
+import legibilidade_pt
+
+# --- MÉTRICAS DE LEGIBILIDADE ---
+# Índices calibrados para o português (legibilidade_pt), calculados com uma única segmentação do
+# texto compartilhada pelas quatro métricas. Os resultados ficam em um cache LRU pelo hash do texto:
+# exibir de novo o mesmo texto em um rerun não recalcula nada.
+
+MIN_PALAVRAS = 20
+MAX_ITENS_CACHE = 256
+MIN_PAGINAS_PARALELO = 40       # Abaixo disso as métricas por página são calculadas em série
+
+# Início de questão no começo de uma linha: "Questão 3", "QUESTÃO 03", "Exercício 2", "3)", "3.", "03 -"
+_INICIO_QUESTAO = re.compile(
+    r"^\s*(?:(?:quest[ãa]o|exerc[íi]cio|atividade)\s*(?:n[º°o]\.?\s*)?(\d{1,3})\b|(\d{1,3})\s*([).\-–:])(?:\s|$))",
+    re.IGNORECASE,
+)
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+_estatisticas = {"acertos": 0, "falhas": 0}
+
+
+def descrever_facilidade_leitura(valor):
+    """Interpretação de Facilidade de Leitura (Flesch Reading-Ease)."""
+    if valor >= 90:
+        return "Muito fácil 🟢"
+    elif 70 <= valor < 90:
+        return "Fácil 🟢"
+    elif 50 <= valor < 70:
+        return "Médio 🟡"
+    return "Difícil 🔴"
+
+
+def descrever_serie_aprox(valor):
+    """Interpretação de Série Aproximada (Flesch-Kincaid Grade Level)."""
+    if valor < 6:
+        return "Fundamental I 🟢"
+    elif valor < 9:
+        return "Fundamental II 🟢"
+    elif valor <= 12:
+        return "Ensino Médio 🟡"
+    return "Ensino Superior 🔴"
+
+
+def descrever_nivel_escolar(valor):
+    """Interpretação de Nível Escolar (SMOG Index)."""
+    if valor < 9:
+        return "Fundamental 🟢"
+    elif valor <= 12:
+        return "Ensino Médio 🟡"
+    return "Ensino Superior 🔴"
+
+
+def descrever_variedade_lexical(valor):
+    """Interpretação de Variedade Lexical."""
+    if valor > 0.7:
+        return "Alta 🟡"
+    elif 0.5 <= valor <= 0.7:
+        return "Média 🟢"
+    return "Baixa 🟢"
+
+
+def _calcular_metricas(texto):
+    if not texto or not texto.strip():
+        return "Texto inválido para análise de legibilidade."
+
+    indices = legibilidade_pt.indices_legibilidade(texto)
+    if indices["tokens"] < MIN_PALAVRAS:
+        return "Texto muito curto para análise de legibilidade (mínimo 20 palavras)."
+
+    facilidade_leitura = round(indices["flesch"], 2)
+    serie_aprox = round(indices["flesch_kincaid"], 2)
+    nivel_escolar = round(indices["smog"], 2)
+    variedade_lexical = round(indices["variedade_lexical"], 2)
+
+    return {
+        "facilidade_leitura_val": facilidade_leitura,
+        "facilidade_leitura_desc": descrever_facilidade_leitura(facilidade_leitura),
+        "serie_aprox_val": serie_aprox,
+        "serie_aprox_desc": descrever_serie_aprox(serie_aprox),
+        "nivel_escolar_val": nivel_escolar,
+        "nivel_escolar_desc": descrever_nivel_escolar(nivel_escolar),
+        "variedade_lexical_val": variedade_lexical,
+        "variedade_lexical_desc": descrever_variedade_lexical(variedade_lexical),
+    }
+
+
+def _chave(texto):
+    return hashlib.sha256((texto or "").encode("utf-8")).digest()
+
+
+def _guardar(chave, resultado):
+    with _cache_lock:
+        _cache[chave] = resultado
+        _cache.move_to_end(chave)
+        while len(_cache) > MAX_ITENS_CACHE:
+            _cache.popitem(last=False)
+
+
+def metricas_NLP(texto):
+    """
+    Métricas de legibilidade do texto (dict com valores e descrições) ou a mensagem explicando
+    por que não foram calculadas. Resultados guardados por hash do texto.
+    """
+    chave = _chave(texto)
+    with _cache_lock:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            _estatisticas["acertos"] += 1
+            return _cache[chave]
+        _estatisticas["falhas"] += 1
+
+    resultado = _calcular_metricas(texto)
+    _guardar(chave, resultado)
+    return resultado
+
+
+def _metricas_lote(textos):
+    """Executada nos processos do pool: métricas de um lote de textos."""
+    return [_calcular_metricas(texto) for texto in textos]
+
+
+def metricas_por_pagina(paginas, workers=None):
+    """
+    Gera (número da página, texto, métricas) em ordem para uma lista de (número, texto).
+    Documentos grandes têm os lotes de páginas calculados em paralelo no pool de processos da conversão;
+    cada lote é entregue assim que fica pronto, para a tabela ser preenchida aos poucos.
+    """
+    import conversion_utils
+    from concurrent.futures.process import BrokenProcessPool
+
+    paginas = list(paginas)
+    workers = conversion_utils.RENDER_WORKERS if workers is None else workers
+    pendentes = [i for i, (_, texto) in enumerate(paginas) if _chave(texto) not in _cache]
+    lote_da_pagina = {}
+    if workers > 1 and len(pendentes) >= MIN_PAGINAS_PARALELO:
+        try:
+            pool = conversion_utils.obter_pool_processos()
+            for inicio, fim in conversion_utils._dividir_intervalos(len(pendentes), workers * 2):
+                indices = pendentes[inicio:fim]
+                futuro = pool.submit(_metricas_lote, [paginas[i][1] for i in indices])
+                for i in indices:
+                    lote_da_pagina[i] = (futuro, indices)
+        except BrokenProcessPool:
+            conversion_utils.descartar_pool_processos()
+            lote_da_pagina = {}
+
+    for i, (numero, texto) in enumerate(paginas):
+        if i in lote_da_pagina:
+            futuro, indices = lote_da_pagina[i]
+            try:
+                for j, resultado in zip(indices, futuro.result()):
+                    _guardar(_chave(paginas[j][1]), resultado)
+                    lote_da_pagina.pop(j, None)
+            except BrokenProcessPool:
+                # Um worker morreu: o restante é calculado em série
+                conversion_utils.descartar_pool_processos()
+                lote_da_pagina = {}
+        # Páginas calculadas no pool (ou em análises anteriores) saem do cache; as demais são calculadas aqui
+        yield numero, texto, metricas_NLP(texto)
+
+
+def segmentar_questoes(paginas):
+    """
+    Agrupa o texto de uma sequência de (número da página, texto) em questões, à medida que as
+    páginas chegam. Gera dicts com 'questao', 'paginas' (ex: "3" ou "3–4") e 'texto'.
+    Uma questão só começa com um cabeçalho explícito ("Questão 3") de número maior que o da atual
+    ou, em textos sem cabeçalhos, com o número solto seguinte ("3)", "3.") no mesmo formato da
+    numeração das questões; os demais números são itens dentro do enunciado.
+    """
+    rotulo, linhas, primeira, ultima = "Texto inicial", [], None, None
+    ultimo_numero, com_cabecalhos, delimitador = 0, False, None
+    for numero_pagina, texto in paginas:
+        for linha in texto.splitlines():
+            inicio = _INICIO_QUESTAO.match(linha)
+            if inicio:
+                numero = int(inicio.group(1) or inicio.group(2))
+                if inicio.group(1):
+                    com_cabecalhos = True
+                    nova = numero > ultimo_numero
+                else:
+                    nova = (not com_cabecalhos and numero == ultimo_numero + 1
+                            and delimitador in (None, inicio.group(3)))
+                if nova:
+                    if any(l.strip() for l in linhas):
+                        yield _questao(rotulo, linhas, primeira, ultima)
+                    rotulo, linhas, primeira = f"Questão {numero}", [], None
+                    ultimo_numero = numero
+                    if not inicio.group(1):
+                        delimitador = inicio.group(3)
+            primeira = numero_pagina if primeira is None else primeira
+            ultima = numero_pagina
+            linhas.append(linha)
+    if any(l.strip() for l in linhas):
+        yield _questao(rotulo, linhas, primeira, ultima)
+
+
+def _questao(rotulo, linhas, primeira, ultima):
+    paginas = str(primeira) if primeira == ultima else f"{primeira}–{ultima}"
+    return {"questao": rotulo, "paginas": paginas, "texto": "\n".join(linhas).strip()}
+
+
+def resumo_cache():
+    with _cache_lock:
+        return dict(_estatisticas, itens=len(_cache))
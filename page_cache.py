@@ -0,0 +1,150 @@
+import collections
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+import conversion_utils
+
+# --- CACHE DE PÁGINAS CONVERTIDAS ---
+# Cache endereçado por conteúdo (SHA-256 do arquivo enviado + parâmetros da conversão),
+# compartilhado pelas páginas da aplicação. Fica em memória com descarte LRU e, se
+# INCLUIA_CACHE_PAGINAS_DIR estiver definido, transborda para um diretório com tamanho limitado.
+
+MAX_MB_MEMORIA = int(os.environ.get("INCLUIA_CACHE_PAGINAS_MB", 128))
+MAX_MB_DISCO = int(os.environ.get("INCLUIA_CACHE_PAGINAS_DISCO_MB", 1024))
+PASTA_DISCO = os.environ.get("INCLUIA_CACHE_PAGINAS_DIR") or None
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def tamanho_paginas(paginas):
+    """Tamanho aproximado, em bytes, de uma lista de páginas convertidas."""
+    return sum(conversion_utils.tamanho_pagina(pagina) for pagina in paginas)
+
+
+def chave_conversao(dados, parametros):
+    """Chave do cache: hash dos bytes enviados combinado com os parâmetros da conversão."""
+    h = hashlib.sha256(dados)
+    h.update(json.dumps(parametros, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class CachePaginas:
+    """Cache LRU em memória de páginas convertidas, com armazenamento opcional em disco."""
+
+    def __init__(self, max_bytes_memoria=MAX_MB_MEMORIA * 1024 * 1024, pasta_disco=PASTA_DISCO,
+                 max_bytes_disco=MAX_MB_DISCO * 1024 * 1024):
+        self.max_bytes_memoria = max_bytes_memoria
+        self.pasta_disco = pasta_disco
+        self.max_bytes_disco = max_bytes_disco
+        self._itens = collections.OrderedDict()
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        self.estatisticas = {"acertos_memoria": 0, "acertos_disco": 0, "falhas": 0, "descartes": 0}
+        if self.pasta_disco:
+            os.makedirs(self.pasta_disco, exist_ok=True)
+
+    def _caminho_disco(self, chave):
+        return os.path.join(self.pasta_disco, f"{chave}.pkl")
+
+    def obter(self, chave):
+        """Retorna as páginas guardadas para `chave` ou None."""
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.estatisticas["acertos_memoria"] += 1
+                return self._itens[chave]
+
+        paginas = self._ler_disco(chave)
+        with self._lock:
+            if paginas is None:
+                self.estatisticas["falhas"] += 1
+                return None
+            self.estatisticas["acertos_disco"] += 1
+        self._guardar_memoria(chave, paginas)
+        return paginas
+
+    def guardar(self, chave, paginas):
+        self._guardar_memoria(chave, paginas)
+        self._gravar_disco(chave, paginas)
+
+    def _guardar_memoria(self, chave, paginas):
+        tamanho = tamanho_paginas(paginas)
+        if tamanho > self.max_bytes_memoria:
+            return
+        with self._lock:
+            if chave in self._itens:
+                self._bytes_memoria -= tamanho_paginas(self._itens.pop(chave))
+            self._itens[chave] = paginas
+            self._bytes_memoria += tamanho
+            while self._bytes_memoria > self.max_bytes_memoria:
+                _, removidas = self._itens.popitem(last=False)
+                self._bytes_memoria -= tamanho_paginas(removidas)
+                self.estatisticas["descartes"] += 1
+
+    def _ler_disco(self, chave):
+        if not self.pasta_disco:
+            return None
+        caminho = self._caminho_disco(chave)
+        try:
+            with open(caminho, "rb") as f:
+                paginas = pickle.load(f)
+            os.utime(caminho)  # Marca como usado recentemente para o descarte do disco
+            return paginas
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _gravar_disco(self, chave, paginas):
+        if not self.pasta_disco:
+            return
+        try:
+            with tempfile.NamedTemporaryFile(dir=self.pasta_disco, suffix=".tmp", delete=False) as tmp:
+                pickle.dump(paginas, tmp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp.name, self._caminho_disco(chave))
+            self._limitar_disco()
+        except OSError:
+            pass
+
+    def _limitar_disco(self):
+        """Remove os arquivos menos usados até o diretório caber em `max_bytes_disco`."""
+        arquivos = []
+        for entrada in os.scandir(self.pasta_disco):
+            if entrada.name.endswith(".pkl"):
+                info = entrada.stat()
+                arquivos.append((info.st_mtime, info.st_size, entrada.path))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.max_bytes_disco:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+
+    def obter_ou_converter(self, dados, parametros, converter):
+        """Retorna as páginas do cache ou executa `converter()` e guarda o resultado (se não vazio)."""
+        chave = chave_conversao(dados, parametros)
+        paginas = self.obter(chave)
+        if paginas is None:
+            paginas = converter()
+            if paginas:
+                self.guardar(chave, paginas)
+        return paginas
+
+    def resumo(self):
+        with self._lock:
+            return dict(self.estatisticas, itens_memoria=len(self._itens), mb_memoria=round(self._bytes_memoria / 1024 / 1024, 1))
+
+
+def obter_cache():
+    """Retorna o cache do processo do servidor, compartilhado por todas as sessões e páginas."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CachePaginas()
+        return _cache
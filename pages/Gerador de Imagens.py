@@ -1,13 +1,14 @@
 import streamlit as st
 import os
-from google import genai
-from google.genai import types
 import io
 import tempfile
-import fitz  # PyMuPDF
-from docx import Document
-from docx2pdf import convert
+import aquecimento
+import context_cache
 from auth_utils import authenticate_user
+import conversion_utils
+import llm_utils
+import page_cache
+import pdf_nativo
 
 # --- Configurações Iniciais da Página ---
 st.set_page_config(
@@ -33,6 +34,9 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+# --- AQUECIMENTO DO SERVIDOR (uma vez por processo, em segundo plano) ---
+aquecimento.iniciar()
+
 # --- Autenticação e Configuração da API ---
 if not authenticate_user():
     st.stop()
@@ -44,36 +48,35 @@ try:
         st.error("Chave da API não encontrada no perfil após a autenticação. Tente fazer logout e login novamente.")
         st.stop()
 
-    client = genai.Client(api_key=api_key_from_profile)
-
     modelo_texto_avancado = 'gemini-2.5-flash'
     modelo_gerador_imagem = 'gemini-2.0-flash-exp-image-generation'
     
 except Exception as e:
-    st.error(f"Erro ao inicializar o cliente Gemini. Detalhe: {e}")
+    st.error(f"Erro ao ler a chave da API do perfil. Detalhe: {e}")
     st.stop()
-    
+
+
+def criar_cliente_gemini(chave_api):
+    """Cria o cliente do Gemini; o SDK só é importado quando há uma geração a fazer."""
+    from google import genai
+    return genai.Client(api_key=chave_api)
+
 
 # Funções de conversão de arquivo (mantidas)
-def convert_pdf_bytes_to_image_bytes_pymupdf(pdf_bytes):
-    image_bytes_list = []
+def convert_pdf_bytes_to_pages_pymupdf(pdf_bytes):
+    paginas = []
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype='pdf')
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(dpi=150)
-            img_bytes = pix.tobytes('jpeg')
-            image_bytes_list.append(img_bytes)
-        doc.close()
+        paginas = conversion_utils.converter_pdf_em_paginas(pdf_bytes, dpi=150, usar_camada_texto=False)
     except Exception as e:
         st.error(f'Erro ao converter PDF para imagem: {e}')
-    return image_bytes_list
+    return paginas
 
-def convert_docx_bytes_to_image_bytes_with_pymupdf(docx_bytes):
-    image_bytes_list = []
+def convert_docx_bytes_to_pages_with_pymupdf(docx_bytes):
+    paginas = []
     temp_docx_file = None
     temp_pdf_file = None
     try:
+        from docx2pdf import convert
         with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp_docx:
             tmp_docx.write(docx_bytes)
             temp_docx_file = tmp_docx.name
@@ -87,7 +90,7 @@ def convert_docx_bytes_to_image_bytes_with_pymupdf(docx_bytes):
         if os.path.exists(temp_pdf_file):
             with open(temp_pdf_file, 'rb') as f_pdf:
                 pdf_bytes_converted = f_pdf.read()
-            image_bytes_list = convert_pdf_bytes_to_image_bytes_pymupdf(pdf_bytes_converted)
+            paginas = convert_pdf_bytes_to_pages_pymupdf(pdf_bytes_converted)
         else:
             st.warning('Arquivo PDF temporário não foi criado do DOCX.')
     except Exception as e:
@@ -95,7 +98,12 @@ def convert_docx_bytes_to_image_bytes_with_pymupdf(docx_bytes):
     finally:
         if temp_docx_file and os.path.exists(temp_docx_file): os.remove(temp_docx_file)
         if temp_pdf_file and os.path.exists(temp_pdf_file): os.remove(temp_pdf_file)
-    return image_bytes_list
+    return paginas
+
+def partes_das_paginas(paginas):
+    from google.genai import types
+    # Páginas em branco ou repetidas (descartadas na conversão) não têm imagem
+    return [types.Part.from_bytes(data=pagina['imagem'], mime_type=pagina['mime_type']) for pagina in paginas if 'imagem' in pagina]
 
 def adicionar_sugestao(sugestao):
     texto_atual = st.session_state['instrucoes_adicionais']
@@ -123,6 +131,12 @@ campo_upload = st.file_uploader(
     label='Ou faça upload (PDF, Word, JPEG, PNG):', 
     type=['pdf', 'docx', 'jpeg', 'png']
 )
+st.toggle(
+    'Enviar o PDF original para a IA, sem converter as páginas em imagens',
+    value=pdf_nativo.HABILITADO,
+    key='envio_pdf_nativo',
+    help='Se a IA recusar o arquivo, as páginas são convertidas como antes.'
+)
 
 adversidades = [
     'Não especificado',
@@ -225,6 +239,13 @@ if 'image_justification' not in st.session_state: st.session_state.image_justifi
 
 # --- LÓGICA DE GERAÇÃO ---
 if btn_gerar_imagem:
+    try:
+        from google.genai import types
+        client = criar_cliente_gemini(api_key_from_profile)
+    except Exception as e:
+        st.error(f"Erro ao inicializar o cliente Gemini. Detalhe: {e}")
+        st.stop()
+
     st.session_state.generated_image = None
     st.session_state.image_description = 'Gerando...'
     st.session_state.image_justification = 'Gerando...'
@@ -235,16 +256,21 @@ if btn_gerar_imagem:
     if campo_upload is not None:
         file_bytes = campo_upload.read()
         file_type = campo_upload.type
+        parametros_conversao = {'tipo': file_type, 'dpi': 150, 'usar_camada_texto': False, 'adaptativo': True, 'filtrar': True}
+        cache_paginas = page_cache.obter_cache()
         with st.spinner(f'Processando {campo_upload.name}...'):
-            if file_type == 'application/pdf':
-                img_list = convert_pdf_bytes_to_image_bytes_pymupdf(file_bytes)
-                for img_bytes in img_list: input_parts_for_text_model.append(types.Part.from_bytes(data=img_bytes, mime_type='image/jpeg'))
+            if file_type == 'application/pdf' and st.session_state.envio_pdf_nativo:
+                input_parts_for_text_model.append(types.Part.from_bytes(data=file_bytes, mime_type=pdf_nativo.MIME_PDF))
+            elif file_type == 'application/pdf':
+                paginas = cache_paginas.obter_ou_converter(file_bytes, parametros_conversao, lambda: convert_pdf_bytes_to_pages_pymupdf(file_bytes))
+                input_parts_for_text_model.extend(partes_das_paginas(paginas))
             elif file_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-                img_list = convert_docx_bytes_to_image_bytes_with_pymupdf(file_bytes)
-                if img_list:
-                    for img_bytes in img_list: input_parts_for_text_model.append(types.Part.from_bytes(data=img_bytes, mime_type='image/jpeg'))
+                paginas = cache_paginas.obter_ou_converter(file_bytes, parametros_conversao, lambda: convert_docx_bytes_to_pages_with_pymupdf(file_bytes))
+                if paginas:
+                    input_parts_for_text_model.extend(partes_das_paginas(paginas))
                 elif not original_text_from_input_field:
                     try:
+                        from docx import Document
                         doc = Document(io.BytesIO(file_bytes))
                         extracted_text = '\n'.join([p.text for p in doc.paragraphs])
                         if extracted_text.strip():
@@ -272,16 +298,30 @@ if btn_gerar_imagem:
                     nee_type_short=selected_nee_info['short_name'],
                     instrucoes_adicionais_val=instrucoes_adicionais_valor or 'Nenhuma.'
                 )
-                final_contents_text = [
-                    types.Part.from_text(text=system_instruction_text_image_prompt_generator),
-                    types.Part.from_text(text=user_prompt_str)
-                ]
-                final_contents_text.extend(input_parts_for_text_model)
-                
-                response_text_ia = client.models.generate_content(
-                    model=modelo_texto_avancado,
-                    contents=final_contents_text,
-                    config=None
+                partes_texto = [types.Part.from_text(text=user_prompt_str)] + input_parts_for_text_model
+
+                def chamar_modelo_texto(conteudo, config):
+                    return llm_utils.chamar_com_limites(
+                        api_key_from_profile, client.models.generate_content,
+                        tokens_estimados=llm_utils.estimar_tokens(conteudo),
+                        model=modelo_texto_avancado,
+                        contents=conteudo,
+                        config=config
+                    )
+
+                def rasterizar_pdf(pdf_bytes):
+                    paginas = cache_paginas.obter_ou_converter(pdf_bytes, parametros_conversao, lambda: convert_pdf_bytes_to_pages_pymupdf(pdf_bytes))
+                    return partes_das_paginas(paginas)
+
+                # A instrução de sistema vai pelo cache de contexto do Gemini (ou inline, se indisponível) e o PDF
+                # original vai nativamente (convertido em páginas, se a IA recusá-lo)
+                response_text_ia = pdf_nativo.gerar_com_pdf(
+                    api_key_from_profile, partes_texto,
+                    lambda partes: context_cache.gerar_com_instrucao_genai(
+                        client, api_key_from_profile, modelo_texto_avancado,
+                        system_instruction_text_image_prompt_generator, partes, chamar_modelo_texto
+                    ),
+                    rasterizar_pdf, client=client
                 )
                 
                 text_output = ''
@@ -330,7 +370,9 @@ if btn_gerar_imagem:
                                 )
                                 image_gen_contents = image_prompt_from_ia
 
-                                response_image_ia = client.models.generate_content(
+                                response_image_ia = llm_utils.chamar_com_limites(
+                                    api_key_from_profile, client.models.generate_content,
+                                    tokens_estimados=llm_utils.estimar_tokens([image_gen_contents]),
                                     model=modelo_gerador_imagem,
                                     contents=image_gen_contents,
                                     config=image_gen_config
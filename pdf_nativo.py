@@ -0,0 +1,186 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+
+import api_key_cache
+import context_cache
+
+# --- ENVIO NATIVO DE PDFs AO GEMINI ---
+# O Gemini aceita partes application/pdf: o PDF original vai inline (até LIMITE_INLINE_BYTES) ou pela
+# File API (documentos maiores, até LIMITE_ARQUIVO_BYTES), sem renderizar as páginas com o PyMuPDF.
+# As partes continuam sendo o dict {'mime_type', 'data'} (ou types.Part, no google.genai), então o
+# cache de respostas usa o conteúdo do PDF; a troca pelo arquivo enviado acontece só na chamada.
+# O envio à File API usa sempre um cliente google.genai da chave do professor, a mesma que indexa o
+# arquivo enviado (no google.generativeai ele iria com a última chave configurada no processo).
+# Se o Gemini recusar o documento (protegido, corrompido, acima dos limites) ou o envio do arquivo
+# falhar, a chamada é repetida com esse documento convertido em páginas, como antes.
+
+MIME_PDF = "application/pdf"
+# Opcional (INCLUIA_PDF_NATIVO=1 liga o envio nativo por padrão): a conversão das páginas envia texto onde
+# há camada de texto, respeita o orçamento de bytes/tokens e descarta páginas em branco e repetidas
+HABILITADO = os.environ.get("INCLUIA_PDF_NATIVO", "0") == "1"
+LIMITE_INLINE_BYTES = int(float(os.environ.get("INCLUIA_PDF_INLINE_MAX_MB", 14)) * 1024 * 1024)
+LIMITE_ARQUIVO_BYTES = 50 * 1024 * 1024      # Máximo de um PDF na File API
+TTL_ARQUIVO_S = 47 * 3600                    # A File API apaga os arquivos após 48 h
+TIMEOUT_PROCESSAMENTO_S = 60
+MAX_ARQUIVOS_CACHE = 64
+ESTADOS_DOCUMENTO_RECUSADO = ("INVALID_ARGUMENT", "FAILED_PRECONDITION")
+MARCAS_DOCUMENTO_RECUSADO = ("DOCUMENT", "PDF", "PAGES", "MIME", "PAYLOAD", "FILE")
+
+_PAGINA = re.compile(rb"/Type\s*/Page(?!s)")
+
+logger = logging.getLogger(__name__)
+
+_arquivos = {}
+_arquivos_lock = threading.Lock()
+_estatisticas = {"inline": 0, "arquivos_enviados": 0, "arquivos_reaproveitados": 0, "rasterizados": 0}
+
+
+class DocumentoGrandeDemais(Exception):
+    """O PDF passa do limite da File API e só pode ser enviado convertido em páginas."""
+
+
+def _contar(chave, valor=1):
+    with _arquivos_lock:
+        _estatisticas[chave] += valor
+
+
+def parte_pdf(pdf_bytes):
+    """Parte do google.generativeai com o PDF original."""
+    return {"mime_type": MIME_PDF, "data": pdf_bytes}
+
+
+def dados_pdf(parte):
+    """Bytes do PDF se a parte for um PDF inline (dict do google.generativeai ou Part do google.genai)."""
+    if isinstance(parte, dict):
+        return parte.get("data") if parte.get("mime_type") == MIME_PDF else None
+    dados = getattr(parte, "inline_data", None)
+    return dados.data if dados is not None and dados.mime_type == MIME_PDF else None
+
+
+def contar_paginas(pdf_bytes):
+    """Número aproximado de páginas, sem abrir o documento (mínimo 1)."""
+    return max(1, len(_PAGINA.findall(pdf_bytes)))
+
+
+def falha_documento(erro):
+    """
+    Indica se o erro da API é uma recusa do documento: 413 (corpo grande demais) ou INVALID_ARGUMENT /
+    FAILED_PRECONDITION com uma mensagem sobre o documento. Rede, cota, chave e demais erros sobem.
+    """
+    if api_key_cache.chave_erro_invalida(erro):
+        return False
+    if api_key_cache.codigo_erro_api(erro) == 413:
+        return True
+    if api_key_cache.estado_erro_api(erro) not in ESTADOS_DOCUMENTO_RECUSADO:
+        return False
+    mensagem = str(getattr(erro, "message", None) or erro).upper()
+    return any(marca in mensagem for marca in MARCAS_DOCUMENTO_RECUSADO)
+
+
+def _arquivo_em_cache(id_arquivo):
+    with _arquivos_lock:
+        item = _arquivos.get(id_arquivo)
+        if item is not None and time.monotonic() - item[1] < TTL_ARQUIVO_S:
+            _estatisticas["arquivos_reaproveitados"] += 1
+            return item[0]
+        _arquivos.pop(id_arquivo, None)
+        return None
+
+
+def _guardar_arquivo(id_arquivo, parte):
+    with _arquivos_lock:
+        _arquivos[id_arquivo] = (parte, time.monotonic())
+        _estatisticas["arquivos_enviados"] += 1
+        while len(_arquivos) > MAX_ARQUIVOS_CACHE:
+            del _arquivos[min(_arquivos, key=lambda chave: _arquivos[chave][1])]
+
+
+def _aguardar_processamento(arquivo, consultar):
+    limite = time.monotonic() + TIMEOUT_PROCESSAMENTO_S
+    while str(getattr(arquivo.state, "name", arquivo.state)) == "PROCESSING":
+        if time.monotonic() > limite:
+            raise TimeoutError("O Gemini não terminou de processar o PDF enviado.")
+        time.sleep(1)
+        arquivo = consultar(arquivo.name)
+    return arquivo
+
+
+def _enviar_genai(client, pdf_bytes):
+    import io
+    from google.genai import types
+
+    arquivo = client.files.upload(file=io.BytesIO(pdf_bytes), config=types.UploadFileConfig(mime_type=MIME_PDF))
+    arquivo = _aguardar_processamento(arquivo, lambda nome: client.files.get(name=nome))
+    return types.Part.from_uri(file_uri=arquivo.uri, mime_type=MIME_PDF)
+
+
+def _preparar(chave_api, partes, client=None):
+    """
+    As partes prontas para o envio: PDFs grandes trocados pelo arquivo enviado à File API pelo `client`
+    (ou pelo cliente da chave, de context_cache.obter_cliente).
+    """
+    preparadas = []
+    for parte in partes:
+        pdf_bytes = dados_pdf(parte)
+        if pdf_bytes is None:
+            preparadas.append(parte)
+            continue
+        if len(pdf_bytes) <= LIMITE_INLINE_BYTES:
+            _contar("inline")
+            preparadas.append(parte)
+            continue
+        if len(pdf_bytes) > LIMITE_ARQUIVO_BYTES:
+            raise DocumentoGrandeDemais(f"PDF de {len(pdf_bytes) // (1024 * 1024)} MB")
+        id_arquivo = hashlib.sha256(b"\0".join(((chave_api or "").encode("utf-8"), pdf_bytes))).hexdigest()
+        enviado = _arquivo_em_cache(id_arquivo)
+        if enviado is None:
+            enviado = _enviar_genai(client or context_cache.obter_cliente(chave_api), pdf_bytes)
+            _guardar_arquivo(id_arquivo, enviado)
+        preparadas.append(enviado)
+    return preparadas
+
+
+def _rasterizar(partes, rasterizar):
+    """As partes com cada PDF trocado pelas partes de suas páginas convertidas."""
+    resultado = []
+    for parte in partes:
+        pdf_bytes = dados_pdf(parte)
+        resultado.extend([parte] if pdf_bytes is None else rasterizar(pdf_bytes))
+    return resultado
+
+
+def gerar_com_pdf(chave_api, partes, gerar, rasterizar=None, client=None):
+    """
+    Chama `gerar(partes)` com os PDFs enviados nativamente (pela File API com `client`, se informado).
+    Se o envio falhar ou o Gemini recusar o documento, chama `gerar` de novo com cada PDF trocado por
+    `rasterizar(pdf_bytes)` (lista de partes das páginas convertidas); sem `rasterizar`, o erro sobe.
+    """
+    partes = list(partes)
+    if not any(dados_pdf(parte) is not None for parte in partes):
+        return gerar(partes)
+
+    try:
+        preparadas = _preparar(chave_api, partes, client)
+    except Exception as e:
+        if rasterizar is None:
+            raise
+        logger.warning("Envio nativo do PDF falhou (%s: %s); usando as páginas convertidas.", type(e).__name__, e)
+    else:
+        try:
+            return gerar(preparadas)
+        except Exception as e:
+            if rasterizar is None or not falha_documento(e):
+                raise
+            logger.warning("O Gemini recusou o PDF (%s: %s); usando as páginas convertidas.", type(e).__name__, e)
+    _contar("rasterizados")
+    return gerar(_rasterizar(partes, rasterizar))
+
+
+def resumo():
+    """PDFs enviados inline, arquivos enviados e reaproveitados na File API e documentos rasterizados."""
+    with _arquivos_lock:
+        return dict(_estatisticas, arquivos_em_cache=len(_arquivos))
@@ -0,0 +1,38 @@
+// Login por nome de usuário em uma única chamada do servidor da IncluIA (ver auth_utils.entrar).
+// Resolve o e-mail pela RPC get_email_by_username e autentica no GoTrue dentro da infraestrutura do
+// Supabase, devolvendo a mesma resposta do /auth/v1/token (sessão com access_token, refresh_token e user).
+//
+// Publicação: supabase functions deploy login-usuario --no-verify-jwt
+// Depois, configure `funcao_login_usuario = "login-usuario"` nos secrets do Streamlit.
+
+import { createClient } from "jsr:@supabase/supabase-js@2";
+
+const SUPABASE_URL = Deno.env.get("SUPABASE_URL")!;
+const ANON_KEY = Deno.env.get("SUPABASE_ANON_KEY")!;
+const admin = createClient(SUPABASE_URL, Deno.env.get("SUPABASE_SERVICE_ROLE_KEY")!);
+
+function json(corpo: unknown, status: number) {
+  return new Response(JSON.stringify(corpo), { status, headers: { "Content-Type": "application/json" } });
+}
+
+Deno.serve(async (req) => {
+  const { username, password } = await req.json().catch(() => ({}));
+  if (!username || !password) {
+    return json({ error: "Informe o nome de usuário e a senha." }, 400);
+  }
+
+  const { data: email, error } = await admin.rpc("get_email_by_username", { p_username: username });
+  if (error || !email) {
+    return json({ error: "Nome de usuário não encontrado." }, 404);
+  }
+
+  const resposta = await fetch(`${SUPABASE_URL}/auth/v1/token?grant_type=password`, {
+    method: "POST",
+    headers: { apikey: ANON_KEY, "Content-Type": "application/json" },
+    body: JSON.stringify({ email, password }),
+  });
+  return new Response(await resposta.text(), {
+    status: resposta.status,
+    headers: { "Content-Type": "application/json" },
+  });
+});
@@ -0,0 +1,105 @@
+import atexit
+import logging
+import os
+import threading
+
+# --- CONEXÕES HTTP COMPARTILHADAS COM O SUPABASE ---
+# Cada sessão continua com o seu próprio cliente Supabase (e, portanto, com o seu próprio login e
+# cabeçalhos de autenticação), mas todos usam o mesmo httpx.Client do processo do servidor: um único
+# pool de conexões keep-alive com tamanho limitado, em vez de um pool por professor conectado.
+# httpx e supabase só são importados na criação do primeiro cliente.
+
+MAX_CONEXOES = int(os.environ.get("INCLUIA_SUPABASE_MAX_CONEXOES", 20))
+MAX_CONEXOES_OCIOSAS = int(os.environ.get("INCLUIA_SUPABASE_CONEXOES_OCIOSAS", 10))
+KEEPALIVE_S = float(os.environ.get("INCLUIA_SUPABASE_KEEPALIVE_S", 30))
+TIMEOUT_S = 30.0
+
+logger = logging.getLogger(__name__)
+
+_http = None
+_http_lock = threading.Lock()
+_estatisticas = {"clientes": 0, "requisicoes": 0, "conexoes_abertas": 0}
+_estatisticas_lock = threading.Lock()
+
+
+def _contar(chave, valor=1):
+    with _estatisticas_lock:
+        _estatisticas[chave] += valor
+
+
+def _rastrear_conexao(evento, _info):
+    # Só conexões novas passam pelo connect_tcp; as reaproveitadas do pool não geram esse evento
+    if evento == "connection.connect_tcp.complete":
+        _contar("conexoes_abertas")
+
+
+def _ao_enviar(request):
+    _contar("requisicoes")
+    request.extensions["trace"] = _rastrear_conexao
+
+
+def obter_http():
+    """Retorna o httpx.Client compartilhado pelo processo do servidor, criando-o na primeira chamada."""
+    global _http
+    with _http_lock:
+        if _http is None:
+            import httpx
+            _http = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONEXOES,
+                    max_keepalive_connections=MAX_CONEXOES_OCIOSAS,
+                    keepalive_expiry=KEEPALIVE_S,
+                ),
+                timeout=TIMEOUT_S,
+                follow_redirects=True,
+                event_hooks={"request": [_ao_enviar]},
+            )
+            atexit.register(_encerrar)
+        return _http
+
+
+def criar_cliente(url, key):
+    """Cria um cliente Supabase para uma sessão, com autenticação própria e transporte compartilhado."""
+    from supabase import ClientOptions, create_client
+    _contar("clientes")
+    return create_client(url, key, options=ClientOptions(httpx_client=obter_http()))
+
+
+def aquecer(url, key, conexoes=2):
+    """
+    Importa o SDK e abre `conexoes` conexões keep-alive (requisições simultâneas ao endpoint de saúde
+    do Auth), para que os primeiros logins não paguem a resolução de DNS e o handshake TLS.
+    """
+    import supabase  # noqa: F401  (a importação é a parte mais lenta do primeiro create_client)
+
+    http = obter_http()
+    erros = []
+
+    def abrir():
+        try:
+            http.get(f"{url.rstrip('/')}/auth/v1/health", headers={"apikey": key})
+        except Exception as e:
+            erros.append(e)
+
+    tarefas = [threading.Thread(target=abrir, daemon=True) for _ in range(max(1, min(conexoes, MAX_CONEXOES_OCIOSAS)))]
+    for tarefa in tarefas:
+        tarefa.start()
+    for tarefa in tarefas:
+        tarefa.join()
+    if erros:
+        raise erros[0]
+
+
+def resumo():
+    """Clientes criados, requisições, conexões abertas e fração de requisições em conexões reaproveitadas."""
+    with _estatisticas_lock:
+        dados = dict(_estatisticas)
+    requisicoes = dados["requisicoes"]
+    dados["taxa_reuso"] = round(1 - dados["conexoes_abertas"] / requisicoes, 3) if requisicoes else 0.0
+    return dados
+
+
+def _encerrar():
+    logger.info("Conexões com o Supabase: %s", resumo())
+    if _http is not None:
+        _http.close()